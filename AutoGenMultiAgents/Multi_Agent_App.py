@@ -1,8 +1,9 @@
 import streamlit as st
 from streamlit_extras.stylable_container import stylable_container
 import demographics_dict as dd
-import json
-import os
+import io
+import time
+from persona_store import ATTRIBUTES, get_persona_store
 
 
 st.set_page_config(page_title="Virtual Focus Group", page_icon=":tada:", layout="wide")
@@ -24,23 +25,81 @@ with stylable_container(
 
 
 
-def save_personas(personas):
-    persona_data = {}
-    for i, persona in enumerate(personas):
-        persona_name = f"Persona {i + 1}"
-        persona_data[persona_name] = persona
-    current_dir = os.path.dirname(__file__)
-    file_path = os.path.join(current_dir, 'docs', 'personas.json')
-    with open(file_path, 'w', encoding='utf-8') as file:
-        json.dump(persona_data, file, indent=4)
+PAGE_SIZE = 50
+
+
+def save_personas(personas, panel_name):
+    # personas are added to the library and saved as a panel; earlier personas and panels are kept
+    store = get_persona_store()
+    store.save_panel(panel_name, store.add_many(personas))
+    st.session_state.panel = panel_name
+
+
+def persona_library():
+    store = get_persona_store()
+    st.subheader("Persona Library")
+    with st.expander("Generate synthetic personas"):
+        count = st.number_input("Number of personas", min_value=1, max_value=100000, value=1000, step=1000)
+        balanced = st.checkbox("Equal numbers of men and women")
+        if st.button("Generate"):
+            # numpy is only needed to generate; importing it here keeps it off the page's start-up path
+            from persona_generator import PopulationModel, add_to_store
+
+            quotas = {"Gender": {"female": 0.5, "male": 0.5}} if balanced else None
+            with st.spinner("Generating personas..."):
+                add_to_store(PopulationModel().sample(count, quotas=quotas), store)
+            st.success(f"Added {count} synthetic personas to the library.")
+    filter_columns = st.columns(5)
+    filters = {}
+    for i, (key, (_, allowed)) in enumerate(ATTRIBUTES.items()):
+        with filter_columns[i % 5]:
+            filters[key] = st.multiselect(key, allowed, key=f"filter_{key}")
+    with filter_columns[len(ATTRIBUTES) % 5]:
+        filters["Hobbies"] = st.multiselect("Hobbies (all of)", dd.hobbies, key="filter_hobbies")
+
+    total = store.count(filters)
+    pages = max(1, -(-total // PAGE_SIZE))
+    page = st.number_input(f"Page (of {pages}, {total} personas)", min_value=1, max_value=pages, value=1, step=1)
+    rows = store.query(filters, limit=PAGE_SIZE, offset=(page - 1) * PAGE_SIZE)
+    table = [{**row, "Hobbies": ", ".join(row["Hobbies"])} for row in rows]
+    selection = st.dataframe(table, hide_index=True, use_container_width=True, on_select="rerun", selection_mode="multi-row")
+    selected = [rows[i]["id"] for i in selection.selection.rows]
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        panel_name = st.text_input("Panel name", key="library_panel_name")
+        if st.button("Save selection as panel", disabled=not (selected and panel_name)):
+            store.save_panel(panel_name, selected)
+            st.session_state.panel = panel_name
+            st.success(f"Panel '{panel_name}' saved with {len(selected)} personas.")
+    with col2:
+        uploaded = st.file_uploader("Import personas (CSV, JSONL or JSON)", type=["csv", "jsonl", "json"])
+        if uploaded is not None and st.button("Import"):
+            try:
+                result = store.import_file(uploaded, fmt=uploaded.name.rsplit(".", 1)[-1])
+            except ValueError as ex:
+                # a .json document that is not valid JSON, or not a list of personas
+                st.error(f"Could not import {uploaded.name}: {ex}")
+                result = None
+            if result is not None:
+                st.success(f"Imported {result.imported} personas.")
+            if result is not None and result.rejected:
+                st.warning(f"Skipped {result.rejected} invalid rows, e.g. " + "; ".join(f"line {line}: {error}" for line, error in result.errors[:3]))
+    with col3:
+        fmt = st.radio("Export format", ["jsonl", "csv"], horizontal=True)
+        if st.button("Prepare export of the filtered personas"):
+            exported = io.StringIO()
+            store.export(exported, fmt, filters)
+            st.download_button("Download", exported.getvalue(), file_name=f"personas.{fmt}")
+
+
 
-    
 def main():
     col1, col2, col3, col4 = st.columns([.5, 1, .5, .5])
     with col1:
         num_personas = st.slider("Number of Personas to Create: ", min_value=1, max_value=5, step=1, value=1)
     with col2:
-        st.empty()
+        panel_name = st.text_input("Panel name:", value=time.strftime("Panel %Y-%m-%d %H:%M"), key="panel_name")
     with stylable_container(
     key="interior_container",
     css_styles="""
@@ -109,11 +168,14 @@ def main():
             """,
     ):
             if st.button("Submit Personas", key=f"submit_{persona_id}"):
-                save_personas(personas)
-                st.success(f"Personas {persona_id - 2} - {num_personas} saved successfully!")
+                try:
+                    save_personas(personas, panel_name)
+                    st.success(f"Personas 1 - {num_personas} saved to the library as panel '{panel_name}'!")
+                except ValueError as ex:
+                    st.error(f"Personas not saved: {ex}")
     with col4:
         with stylable_container(
-        key="green_button",
+        key="green_button_launch",
         css_styles="""
             button {
                 background-color: teal;
@@ -127,5 +189,7 @@ def main():
             if launch_focus_group:
                 st.switch_page("pages/1 Run_Virtual_Focus_Group.py")
 
+    persona_library()
+
 if __name__ == "__main__":
     main()
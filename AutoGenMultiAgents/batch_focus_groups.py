@@ -0,0 +1,177 @@
+"""Run many focus-group sessions without Streamlit.
+
+Every product description is discussed by every panel; the sessions run in a process pool and each one writes
+its transcript and analysis to the output directory. Sessions whose analysis already exists are skipped, so an
+interrupted batch can be resumed by running the same command again.
+
+    python batch_focus_groups.py --products products.txt --panel-size 4 --panels 10 --workers 8
+    python batch_focus_groups.py --products products.txt --panel "Diverse panel of 8 (3f2a1c)"
+
+products.txt holds one product description per line (or a .json list of descriptions).
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_PERSONAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'docs', 'personas.json')
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'docs', 'batch')
+
+
+def load_products(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.json'):
+            return json.load(f)
+        return [line.strip() for line in f if line.strip()]
+
+
+def make_panels(personas, panel_size, panels, seed):
+    """`panels` random panels of `panel_size` personas each; all personas form a single panel when panel_size is 0."""
+    names = list(personas)
+    if not panel_size or panel_size >= len(names):
+        return [names]
+    rng = random.Random(seed)
+    return [rng.sample(names, panel_size) for _ in range(panels)]
+
+
+def session_id(product, panel):
+    return hashlib.sha256(json.dumps([product, sorted(panel)]).encode('utf-8')).hexdigest()[:16]
+
+
+def _init_worker():
+    load_dotenv()
+
+
+def run_session(job):
+    """Run one focus-group session and its analysis in a worker process. Returns a summary of the session."""
+    from focus_group import build_focus_group, run_focus_group
+    from transcript_analysis import TranscriptAnalyzer
+    from transcript_store import TranscriptStore
+    from shared.azure_clients import azure_config, get_openai_client
+    from shared.completion_cache import get_completion_cache
+
+    start = time.perf_counter()
+    summary = {"session_id": job["session_id"], "product": job["product_index"], "panel": job["panel"]}
+    try:
+        llm_config = {
+            "config_list": [azure_config(os.getenv("GPT_4o_mini_Model_Name"), priority="batch")],
+            "cache": get_completion_cache("batch"),
+        }
+        personas = job["personas"]
+        manager = build_focus_group(
+            personas, llm_config, max_round=job["max_round"], silent=True,
+            memory_window=job["memory_window"], memory_token_budget=job["memory_token_budget"],
+            saturation_threshold=job["saturation_threshold"],
+        )
+        transcript = TranscriptStore(job["session_id"], directory=os.path.join(job["output"], 'transcripts'))
+        transcript.clear()
+        run_focus_group(manager, job["product"], transcript=transcript, speaking_mode=job["speaking_mode"], silent=True)
+        transcript.flush()
+        summary["messages"] = len(transcript)
+        summary["tokens"] = transcript.total_tokens()
+        summary["saved_turns"] = manager.groupchat.saturation.saved_turns
+
+        if job["analyze"]:
+            analyzer = TranscriptAnalyzer(
+                get_openai_client(priority="batch"), model=job["analysis_model"], cache=get_completion_cache("batch_analysis")
+            )
+            analysis = analyzer.analyze(transcript.iter_records())
+            with open(os.path.join(job["output"], 'analysis', f'{job["session_id"]}.md'), 'w', encoding='utf-8') as f:
+                f.write(analysis)
+            summary["analysis_seconds"] = analyzer.timings.get("total", 0.0)
+    except Exception as ex:
+        summary["error"] = f"{type(ex).__name__}: {ex}"
+    summary["seconds"] = time.perf_counter() - start
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run product x panel focus-group sessions in parallel.")
+    parser.add_argument("--products", required=True, help="text file with one product description per line, or a .json list")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--personas", default=DEFAULT_PERSONAS, help="personas.json to draw panels from")
+    source.add_argument("--panel", help="panel of the persona library to draw panels from, e.g. one created in the app")
+    parser.add_argument("--panel-size", type=int, default=0, help="personas per panel (0: every persona in one panel)")
+    parser.add_argument("--panels", type=int, default=1, help="number of random panels per product")
+    parser.add_argument("--seed", type=int, default=0, help="seed for drawing the panels")
+    parser.add_argument("--speaking-mode", choices=["random", "round"], default="round")
+    parser.add_argument("--max-round", type=int, default=10)
+    parser.add_argument("--memory-window", type=int, help="messages sent verbatim each turn; older ones are summarized")
+    parser.add_argument("--memory-token-budget", type=int, help="history tokens sent per reply")
+    parser.add_argument("--saturation-threshold", type=float, help="wrap up once persona messages stay below this novelty (e.g. 0.3)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="sessions run at the same time")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="directory for transcripts/, analysis/ and summary.jsonl")
+    parser.add_argument("--analysis-model", default="gpt-4o-mini")
+    parser.add_argument("--no-analysis", action="store_true", help="only write the transcripts")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    products = load_products(args.products)
+    if args.panel:
+        from persona_store import get_persona_store
+
+        store = get_persona_store()
+        if args.panel not in store.panels():
+            parser.error(f"no panel {args.panel!r} in the persona library")
+        personas = store.load_panel(args.panel)
+    else:
+        with open(args.personas, 'r') as f:
+            personas = json.load(f)
+    panels = make_panels(personas, args.panel_size, args.panels, args.seed)
+    os.makedirs(os.path.join(args.output, 'transcripts'), exist_ok=True)
+    os.makedirs(os.path.join(args.output, 'analysis'), exist_ok=True)
+
+    jobs = []
+    for product_index, product in enumerate(products):
+        for panel in panels:
+            job_id = session_id(product, panel)
+            if not args.no_analysis and os.path.exists(os.path.join(args.output, 'analysis', f'{job_id}.md')):
+                continue
+            jobs.append({
+                "session_id": job_id,
+                "product_index": product_index,
+                "product": product,
+                "panel": panel,
+                # only the panel's members: each job is pickled to a worker, and a library can hold 100k personas
+                "personas": {name: personas[name] for name in panel},
+                "speaking_mode": args.speaking_mode,
+                "max_round": args.max_round,
+                "memory_window": args.memory_window,
+                "memory_token_budget": args.memory_token_budget,
+                "saturation_threshold": args.saturation_threshold,
+                "output": args.output,
+                "analyze": not args.no_analysis,
+                "analysis_model": args.analysis_model,
+            })
+    print(f"{len(jobs)} session(s) to run, {len(products) * len(panels) - len(jobs)} already done")
+
+    start = time.perf_counter()
+    failed = 0
+    # spawn: the Azure credential and HTTP pool start threads, which must not be forked
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=context, initializer=_init_worker) as pool, \
+            open(os.path.join(args.output, 'summary.jsonl'), 'a', encoding='utf-8') as summary_file:
+        futures = [pool.submit(run_session, job) for job in jobs]
+        for done, future in enumerate(as_completed(futures), 1):
+            summary = future.result()
+            summary_file.write(json.dumps(summary) + "\n")
+            summary_file.flush()
+            failed += "error" in summary
+            status = summary.get("error", f"{summary.get('messages', 0)} messages")
+            print(f"[{done}/{len(jobs)}] {summary['session_id']} {summary['seconds']:.1f}s {status}")
+    print(f"finished in {time.perf_counter() - start:.1f}s, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+import functools
+import threading
+
+import autogen
+
+from transcript_store import count_tokens
+
+SUMMARY_PROMPT = """You keep the running summary of a focus group discussion.
+Update the summary with the new messages below. Keep who said what, the opinions and concerns each participant raised,
+the questions asked and any agreement or disagreement. Do not drop points from the current summary unless a new message
+replaces them. Reply with the updated summary only, in at most {max_words} words.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}"""
+
+# Per-message overhead of the chat format (role, name, separators), in tokens
+MESSAGE_OVERHEAD = 4
+
+
+def message_tokens(message):
+    content = message.get("content")
+    return MESSAGE_OVERHEAD + (count_tokens(content) if isinstance(content, str) else 0)
+
+
+def message_text(message):
+    return f"{message.get('name') or message.get('role')}: {message.get('content') or ''}"
+
+
+class _AgentMemory:
+    # where one agent's history stands: its first `covered` messages are folded into `summary`
+    def __init__(self):
+        self.summary = ""
+        self.covered = 0
+        self.lock = threading.Lock()
+
+
+class ConversationMemory:
+    """Bounded history for the agents of one group chat: a rolling window plus an incrementally updated summary.
+
+    Installed as a "process_all_messages_before_reply" hook, so it only changes what is sent to the model; the
+    agents' own histories stay complete. Each reply sees the summary followed by the last `groupchat.memory_window`
+    messages verbatim, with older verbatim messages dropped first if they would exceed
+    `groupchat.memory_token_budget`. Messages leaving the window are folded into the summary with one LLM call.
+    Every agent keeps its own cursor and summary, since in round mode each persona receives a round's messages in
+    a different order (its own reply first). Summary updates are shared between agents whose histories agree, so in
+    sequential mode the summary is still extended once per turn rather than rewritten for every agent.
+    With memory_window and memory_token_budget both None, the full history is sent, as before.
+    """
+
+    def __init__(self, groupchat, llm_config, summary_tokens=400, max_shared=256):
+        self.groupchat = groupchat
+        self.summary_tokens = summary_tokens
+        self.max_shared = max_shared
+        self._llm_config = llm_config
+        self._client = None
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._agents = {}
+            # (summary, texts of the messages folded into it) -> updated summary
+            self._shared = {}
+            self.summary_calls = 0
+
+    def install(self, *agents):
+        for agent in agents:
+            agent.register_hook("process_all_messages_before_reply", functools.partial(self.transform, agent=agent.name))
+
+    def transform(self, messages, agent=None):
+        window = self.groupchat.memory_window
+        budget = self.groupchat.memory_token_budget
+        if window is None and budget is None:
+            return messages
+
+        with self._lock:
+            memory = self._agents.setdefault(agent, _AgentMemory())
+        with memory.lock:
+            if len(messages) < memory.covered:
+                # a new conversation started on the same agents
+                memory.summary, memory.covered = "", 0
+            start = memory.covered if window is None else max(memory.covered, len(messages) - window)
+            if budget is not None:
+                # the summary may grow to summary_tokens; the rest of the budget is for verbatim messages
+                tokens = [message_tokens(message) for message in messages[start:]]
+                total = self.summary_tokens + sum(tokens)
+                while total > budget and start < len(messages) - 1:
+                    total -= tokens.pop(0)
+                    start += 1
+            if start > memory.covered:
+                memory.summary = self._update(memory.summary, messages[memory.covered:start])
+                memory.covered = start
+            summary = memory.summary
+
+        if not summary:
+            return messages[start:]
+        return [{"role": "system", "content": f"Summary of the discussion so far:\n{summary}"}] + messages[start:]
+
+    def _update(self, summary, new_messages):
+        texts = tuple(message_text(message) for message in new_messages)
+        key = (summary, texts)
+        with self._lock:
+            if key in self._shared:
+                return self._shared[key]
+        updated = self._summarize(summary, texts)
+        with self._lock:
+            if len(self._shared) >= self.max_shared:
+                self._shared.pop(next(iter(self._shared)))
+            self._shared[key] = updated
+            self.summary_calls += 1
+        return updated
+
+    def _summarize(self, summary, texts):
+        if self._client is None:
+            # not streamed: the summary is internal and must not show up in the chat. autogen merges top-level
+            # llm_config keys into every config_list entry, where they override arguments to create()
+            self._client = autogen.OpenAIWrapper(**{**self._llm_config, "stream": False})
+        prompt = SUMMARY_PROMPT.format(
+            max_words=int(self.summary_tokens * 0.75),
+            summary=summary or "(none yet)",
+            messages="\n".join(texts),
+        )
+        response = self._client.create(messages=[{"role": "user", "content": prompt}])
+        return self._client.extract_text_or_completion_object(response)[0]
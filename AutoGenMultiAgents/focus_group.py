@@ -0,0 +1,254 @@
+import random
+import re
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Literal, Optional, Union
+
+import autogen
+from autogen import Agent, AssistantAgent, UserProxyAgent
+
+import persona_handler as ph
+from conversation_memory import ConversationMemory
+from saturation import SaturationDetector
+
+
+class FocusGroupManager(autogen.GroupChatManager):
+    """Group chat manager for a virtual focus group, independent of any UI.
+
+    Every message received from a participant is appended to `transcript` (a TranscriptStore) when one is set,
+    and scored by the group chat's SaturationDetector, which can end the session early.
+    """
+
+    def __init__(self, groupchat, transcript=None, **kwargs):
+        super().__init__(groupchat=groupchat, **kwargs)
+        self.transcript = transcript
+        # Registered after GroupChatManager.run_chat so it is tried first; it hands back to run_chat outside "round" mode.
+        self.register_reply(Agent, FocusGroupManager.run_round_chat, config=groupchat, reset_config=autogen.GroupChat.reset)
+
+    def _broadcast(self, groupchat, message, speaker):
+        self._last_speaker = speaker
+        groupchat.append(message, speaker)
+        # broadcast the message to all agents except the speaker
+        for agent in groupchat.agents:
+            if agent != speaker:
+                self.send(message, agent, request_reply=False, silent=True)
+
+    def run_round_chat(self, messages=None, sender=None, config=None):
+        """Run the group chat in "round" mode: every persona answers each moderator turn in parallel.
+
+        The answers are generated concurrently, then sent and appended to the history in panel order,
+        so a round costs roughly one LLM latency instead of one per persona.
+        """
+        # register_reply stored a copy of the group chat as config; read the live one so mode changes apply
+        groupchat = self.groupchat
+        if groupchat.speaking_mode != "round":
+            return False, None
+        if messages is None:
+            messages = self._oai_messages[sender]
+        silent = getattr(self, "_silent", False)
+        if self.client_cache is not None:
+            for a in groupchat.agents:
+                a.previous_cache = a.client_cache
+                a.client_cache = self.client_cache
+
+        turns = 0
+        pending = [(sender, messages[-1])]
+        with ThreadPoolExecutor(max_workers=groupchat.max_workers or len(groupchat.panel)) as pool:
+            while pending:
+                for speaker, message in pending:
+                    self._broadcast(groupchat, message, speaker)
+                    turns += 1
+                    if self._is_termination_msg(message) or turns >= groupchat.max_round or self._saturated(groupchat):
+                        pending = []
+                        break
+                else:
+                    if speaker in groupchat.panel:
+                        speakers = [groupchat.moderator]
+                        replies = [groupchat.moderator.generate_reply(sender=self)]
+                    else:
+                        # every persona answers the same question; map() keeps the panel order
+                        speakers = groupchat.panel
+                        replies = list(pool.map(lambda agent: agent.generate_reply(sender=self), speakers))
+                    pending = []
+                    for speaker, reply in zip(speakers, replies):
+                        if reply is None:
+                            continue
+                        speaker.send(reply, self, request_reply=False, silent=silent)
+                        pending.append((speaker, self.last_message(speaker)))
+
+        if self.client_cache is not None:
+            for a in groupchat.agents:
+                a.client_cache = a.previous_cache
+                a.previous_cache = None
+        return True, None
+
+    def _process_received_message(self, message, sender, silent):
+        content = message.get('content') if isinstance(message, dict) else message
+        if isinstance(content, str) and content.strip():
+            if self.transcript is not None:
+                self.transcript.append(sender.name, content)
+            self._score(sender, content)
+        return super()._process_received_message(message, sender, silent)
+
+    def _score(self, sender, content):
+        detector = self.groupchat.saturation
+        if detector is None:
+            return
+        if sender in self.groupchat.panel:
+            detector.score(content)
+        else:
+            if sender == self.groupchat.moderator and detector.saturated:
+                # the moderator's first message after saturation is the wrap-up
+                detector.wrapped_up = True
+            detector.observe(content)
+
+    def _saturated(self, groupchat):
+        return groupchat.saturation is not None and groupchat.saturation.done
+
+
+@dataclass
+class CustomGroupChat(autogen.GroupChat):
+    # "random": one speaker per turn via custom_speaker_selection_func.
+    # "round": after each moderator turn, all personas answer in parallel (see FocusGroupManager.run_round_chat).
+    speaking_mode: Literal["random", "round"] = "random"
+    max_workers: Optional[int] = None
+    moderator: Optional[Agent] = None
+    panel: List[Agent] = field(default_factory=list)
+    # Bounded memory (see ConversationMemory): the last memory_window messages are sent verbatim and older ones as a
+    # running summary, within memory_token_budget tokens per reply. Both None sends the full history every turn.
+    memory_window: Optional[int] = None
+    memory_token_budget: Optional[int] = None
+    memory: Optional[ConversationMemory] = None
+    # Ends the session once the personas stop adding new opinions; SaturationDetector.threshold None disables it.
+    saturation: Optional[SaturationDetector] = None
+
+    def reset(self):
+        super().reset()
+        if self.memory is not None:
+            self.memory.reset()
+        if self.saturation is not None:
+            self.saturation.reset()
+
+    @staticmethod
+    def custom_speaker_selection_func(last_speaker: Agent, groupchat: autogen.GroupChat) -> Union[Agent, Literal['auto', 'manual', 'random', 'round_robin'], None]:
+
+        detector = groupchat.saturation
+        if detector is not None and detector.done:
+            # returning None ends the chat
+            return None
+        if detector is not None and detector.saturated:
+            return groupchat.moderator
+        if last_speaker == groupchat.moderator:
+            return random.choice(groupchat.panel)
+        else:
+            return random.choice([groupchat.moderator] + groupchat.panel)
+    select_speaker_message_template = """You are in a focus group. The following roles are available:
+                {roles}.
+                Read the following conversation.
+                Then select the next role from {agentlist} to play. Only return the role."""
+
+
+# The API rejects message names outside this pattern, and autogen sends each agent's name as the message name
+_INVALID_NAME_CHARACTERS = re.compile(r"[^a-zA-Z0-9_-]+")
+MAX_NAME_LENGTH = 64
+
+
+def agent_names(names, reserved=("Moderator", "Admin")):
+    """API-safe, unique agent names for persona names, in order: "Isabella Müller" becomes "Isabella_Muller", and
+    a repeated name gets a numeric suffix ("Isabella_Muller_2")."""
+    taken, result = set(reserved), []
+    for name in names:
+        ascii_name = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode("ascii")
+        base = _INVALID_NAME_CHARACTERS.sub("_", ascii_name).strip("_")[:MAX_NAME_LENGTH] or "Participant"
+        candidate, n = base, 1
+        while candidate in taken:
+            n += 1
+            suffix = f"_{n}"
+            candidate = base[:MAX_NAME_LENGTH - len(suffix)] + suffix
+        taken.add(candidate)
+        result.append(candidate)
+    return result
+
+
+def build_focus_group(personas, llm_config, manager_class=FocusGroupManager, max_round=10, speaking_mode="random", silent=False,
+                      memory_window=None, memory_token_budget=None, saturation_threshold=None):
+    """Build the persona agents, moderator, admin, group chat and manager. Returns the manager.
+
+    With silent=True the manager does not print the messages of the chat. memory_window and memory_token_budget
+    bound the history sent to the model on each turn (see CustomGroupChat); they can also be changed later.
+    saturation_threshold sets the novelty below which the session wraps up early (see SaturationDetector).
+    """
+    personas_agents = []
+    prompts = ph.compile_persona_prompts(personas)
+    names = agent_names(persona_data['Name'] for persona_data in personas.values())
+    for (key, persona_data), persona_name in zip(personas.items(), names):
+        persona_agent = AssistantAgent(
+            name=persona_name,
+            system_message=prompts[key].system_message,
+            llm_config=llm_config,
+            human_input_mode="NEVER",
+            description=f"A virtual focus group participant named {persona_name}. They do not know anything about the product beyond what they are told. They should be called on to give opinions.",
+        )
+        personas_agents.append(persona_agent)
+
+    moderator_agent = AssistantAgent(
+        name="Moderator",
+        system_message='''
+    You keep the conversation flowing between group members.
+    Do not reply more than once before another group member speaks again.
+    You can answer group members questions, but you do not offer additional information.
+    Do not offer opinions about the topic or user_input, only moderate the conversation.
+    Do not say thank you or the end.''',
+        default_auto_reply="Reply `TERMINATE` if the task is done.",
+        llm_config=llm_config,
+        description="A Focus Group moderator.",
+        is_termination_msg=lambda x: True if "TERMINATE" in x.get("content") else False,
+        human_input_mode="NEVER",
+    )
+
+    user_proxy = UserProxyAgent(
+        name="Admin",
+        human_input_mode= "NEVER",
+        system_message="Human Admin for the Focus Group.",
+        max_consecutive_auto_reply=5,
+        default_auto_reply="Reply `TERMINATE` if the task is done.",
+        is_termination_msg=lambda x: True if "TERMINATE" in x.get("content") else False,
+        code_execution_config={"use_docker":False}
+    )
+
+    groupchat = CustomGroupChat(
+        agents=[user_proxy, moderator_agent] + personas_agents,
+        messages=[],
+        speaker_selection_method=CustomGroupChat.custom_speaker_selection_func,
+        max_round=max_round,
+        select_speaker_message_template=CustomGroupChat.select_speaker_message_template,
+        speaking_mode=speaking_mode,
+        moderator=moderator_agent,
+        panel=personas_agents,
+        memory_window=memory_window,
+        memory_token_budget=memory_token_budget,
+        )
+    groupchat.memory = ConversationMemory(groupchat, llm_config)
+    groupchat.memory.install(moderator_agent, *personas_agents)
+    groupchat.saturation = SaturationDetector(threshold=saturation_threshold)
+    moderator_agent.register_hook("process_all_messages_before_reply", groupchat.saturation.wrap_up_hook)
+
+    return manager_class(groupchat=groupchat, llm_config=llm_config, silent=silent)
+
+
+def run_focus_group(manager, product, transcript=None, speaking_mode=None, silent=False):
+    """Run one focus-group session on `product` from a fresh history. Returns autogen's ChatResult."""
+    groupchat = manager.groupchat
+    manager.reset()
+    groupchat.reset()
+    for agent in groupchat.agents:
+        agent.reset()
+    if speaking_mode is not None:
+        groupchat.speaking_mode = speaking_mode
+    if transcript is not None:
+        manager.transcript = transcript
+    result = groupchat.moderator.initiate_chat(manager, message=product, silent=silent)
+    if groupchat.saturation is not None and groupchat.saturation.saturated:
+        groupchat.saturation.saved_turns = max(0, groupchat.max_round - len(groupchat.messages))
+    return result
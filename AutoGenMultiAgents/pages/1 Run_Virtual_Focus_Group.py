@@ -1,30 +1,33 @@
-import time
 import sys
 import os
 from dotenv import load_dotenv
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 import streamlit as st
 from streamlit_extras.stylable_container import stylable_container
-from typing import Union, Literal
-import json
-import autogen
-from autogen import AssistantAgent, UserProxyAgent, Agent
-import persona_handler as ph
-import random
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
+import uuid
+from persona_store import get_persona_store
+from transcript_store import TranscriptStore, maybe_remove_idle
+from shared.azure_clients import get_http_client, get_token_provider
+from shared.completion_cache import get_completion_cache
+from shared.resource_cache import fingerprint, session_resource
+from shared.streaming import render_message, streamlit_iostream, track_speaker
 
 # Load environment variables
 load_dotenv()
 
-current_dir = os.path.dirname(__file__)
-file_path = os.path.join(current_dir, '..', 'docs', 'personas.json')
-with open(file_path, 'r') as f:
-    personas = json.load(f)
+if "transcript" not in st.session_state:
+    st.session_state.transcript = TranscriptStore(uuid.uuid4().hex)
+    # every session starts a new transcript file; those of sessions idle for a day are removed
+    maybe_remove_idle()
 
-# Initialize the DefaultAzureCredential
-token_provider = get_bearer_token_provider(
-    DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default"
-)  
+# Only the personas of the selected panel are loaded from the persona library
+persona_store = get_persona_store()
+panels = persona_store.panels()
+
+# The DefaultAzureCredential token provider and HTTP connection pool are shared by all apps in the process;
+# credential discovery is the slowest part of a rerun
+token_provider = get_token_provider()
 # Azure OpenAI for Dalle
 api_version = os.getenv("AOAI_API_VERSION")
 dalle3_model = os.getenv("DALL_E_MODEL_NAME")
@@ -38,9 +41,13 @@ llm_config = {
             "api_type": "azure",
             "api_version": api_version,
             "max_tokens": 1000,
-            "azure_ad_token_provider": token_provider
+            "azure_ad_token_provider": token_provider,
+            "http_client": get_http_client(),
         }
-    ]
+    ],
+    "stream": True,
+    # identical requests are answered from the shared on-disk completion cache
+    "cache": get_completion_cache("focus_group"),
 }
 
 # setup page title and description
@@ -60,109 +67,64 @@ with stylable_container(
     st.markdown("<h4 style='text-align: center; '>To begin, describe your product in detail and explain the type of feedback you are looking for from the group.</h4>", unsafe_allow_html=True)
     st.markdown("<h6 style='text-align: center; '>The focus group will consist of a moderator and a group of personas. The moderator will guide the discussion, while the personas will provide feedback based on their unique characteristics and perspectives.</h6>", unsafe_allow_html=True)
 
-class CustomGroupChatManager(autogen.GroupChatManager):
-    def _process_received_message(self, message, sender, silent):
-        formatted_message = ""  # Initialize formatted_message as an empty string
-        with stylable_container(
-            key="container_with_border",
-            css_styles="""
-                {
-                    border: 1px solid rgba(49, 51, 63, 0.2);
-                    border-radius: 0.5rem;
-                    padding: calc(1em - 1px);
-                    box-shadow: 0 4px 8px 0 rgba(0, 0, 0, 0.2), 0 6px 20px 0 rgba(0, 0, 0, 0.19);
-                }
-                """,
-        ):
+def message_container():
+    return stylable_container(
+        key="container_with_border",
+        css_styles="""
+            {
+                border: 1px solid rgba(49, 51, 63, 0.2);
+                border-radius: 0.5rem;
+                padding: calc(1em - 1px);
+                box-shadow: 0 4px 8px 0 rgba(0, 0, 0, 0.2), 0 6px 20px 0 rgba(0, 0, 0, 0.19);
+            }
+            """,
+    )
+
+def build_streamlit_focus_group(personas, llm_config):
+    # autogen is imported when the first group chat starts, not on every page load
+    from focus_group import FocusGroupManager, build_focus_group
+
+    class StreamlitFocusGroupManager(FocusGroupManager):
+        def _process_received_message(self, message, sender, silent):
             # Handle the case when message is a dictionary
             if isinstance(message, dict):
-                if 'content' in message and message['content'].strip():
-                    formatted_message = f"**{sender.name}**: {message['content']}"
-                    st.session_state.setdefault("displayed_messages", []).append(message['content'])
-                else:
-                    return super()._process_received_message(message, sender, silent)
+                content = message.get('content')
             # Handle the case when message is a string
-            elif isinstance(message, str) and message.strip():
-                formatted_message = f"**{sender.name}**: {message}"
-                st.session_state.setdefault("displayed_messages", []).append(message)
             else:
-                return super()._process_received_message(message, sender, silent)
-        
-            # Only format and display the message if the sender is not the manager
-            if sender != manager and formatted_message:
-                with st.chat_message(sender.name):
-                    st.markdown(formatted_message + "\n")
-                    time.sleep(2)
-        # Save the message to a file in the docs folder: chat_summary.txt. If already exists, overwrite it.
-        chat_summary_path = os.path.join(current_dir, '..', 'docs', 'chat_summary.txt')
-        with open(chat_summary_path, 'a', encoding= 'utf-8') as f:
-            f.write(formatted_message + "\n")
-        return super()._process_received_message(message, sender, silent)
-    
-class CustomGroupChat(autogen.GroupChat):
-    @staticmethod
-    def custom_speaker_selection_func(last_speaker: Agent, groupchat: autogen.GroupChat) -> Union[Agent, Literal['auto', 'manual', 'random', 'round_robin'], None]:
-        
-        if last_speaker == moderator_agent:
-            return random.choice(personas_agents)
-        else:
-            return random.choice([moderator_agent] + personas_agents)
-    select_speaker_message_template = """You are in a focus group. The following roles are available:
-                {roles}.
-                Read the following conversation.
-                Then select the next role from {agentlist} to play. Only return the role."""
-       
-personas_agents = []
-for persona_name, persona_data in personas.items():
-    persona_name = persona_data['Name']
-    persona_prompt = ph.persona_prompt
-    persona_description = json.dumps(personas)
-    persona_agent = AssistantAgent(
-        name=persona_name,
-        system_message=persona_prompt,
-        llm_config=llm_config,
-        human_input_mode="NEVER",
-        description=f"A virtual focus group participant named {persona_name}. They do not know anything about the product beyond what they are told. They should be called on to give opinions.",
-    )
-    personas_agents.append(persona_agent)
-
-
-moderator_agent = AssistantAgent(
-    name="Moderator",
-    system_message=''' 
-    You keep the conversation flowing between group members.
-    Do not reply more than once before another group member speaks again.
-    You can answer group members questions, but you do not offer additional information.
-    Do not offer opinions about the topic or user_input, only moderate the conversation.
-    Do not say thank you or the end.''',
-    default_auto_reply="Reply `TERMINATE` if the task is done.",
-    llm_config=llm_config,
-    description="A Focus Group moderator.",
-    is_termination_msg=lambda x: True if "TERMINATE" in x.get("content") else False,
-    human_input_mode="NEVER",
-)
-
-user_proxy = UserProxyAgent(
-    name="Admin",
-    human_input_mode= "NEVER",
-    system_message="Human Admin for the Focus Group.",
-    max_consecutive_auto_reply=5,
-    default_auto_reply="Reply `TERMINATE` if the task is done.",
-    is_termination_msg=lambda x: True if "TERMINATE" in x.get("content") else False,
-    code_execution_config={"use_docker":False}
+                content = message
+            # Only display the message if the sender is not the manager. Streamed replies are already on the page.
+            if isinstance(content, str) and content.strip() and sender != self:
+                render_message(sender.name, message)
+            return super()._process_received_message(message, sender, silent)
+
+    manager = build_focus_group(personas, llm_config, manager_class=StreamlitFocusGroupManager)
+    track_speaker(manager.groupchat.moderator, *manager.groupchat.panel)
+    return manager
+
+
+with st.expander("Pick a maximally diverse panel from the persona library"):
+    panel_size = st.number_input("Panel size", min_value=2, max_value=20, value=5, step=1)
+    balanced = st.checkbox("Equal numbers of men and women", key="diverse_balanced")
+    if st.button("Pick panel"):
+        quotas = {"Gender": {"female": panel_size // 2, "male": panel_size - panel_size // 2, "non-binary": 0}} if balanced else None
+        diverse_name = f"Diverse panel of {panel_size} ({uuid.uuid4().hex[:6]})"
+        from panel_selection import save_diverse_panel
+
+        try:
+            save_diverse_panel(persona_store, diverse_name, panel_size, quotas=quotas)
+            st.session_state.panel = diverse_name
+            panels = persona_store.panels()
+        except ValueError as ex:
+            st.error(str(ex))
+if not panels:
+    st.warning("The persona library has no panels yet. Build personas or save a panel on the main page first.")
+    st.stop()
+panel_name = st.selectbox(
+    "Panel:", panels, index=panels.index(st.session_state.panel) if st.session_state.get("panel") in panels else 0
 )
+personas = persona_store.load_panel(panel_name)
+st.caption(", ".join(persona["Name"] for persona in personas.values()))
 
-
-groupchat = CustomGroupChat(
-    agents=[user_proxy, moderator_agent] + personas_agents, 
-    messages=[], 
-    speaker_selection_method=CustomGroupChat.custom_speaker_selection_func, 
-    max_round=10, 
-    select_speaker_message_template=CustomGroupChat.select_speaker_message_template
-    )
-
-
-manager = CustomGroupChatManager(groupchat=groupchat, llm_config=llm_config)
 with stylable_container(
         key="chat_container",
         css_styles="""
@@ -176,6 +138,17 @@ with stylable_container(
     ):
     with st.container(height=800):
         user_input = st.text_area("Describe your product and the topic of discussion to the group:")
+        speaking_mode = st.radio(
+            "Speaking mode:",
+            ["random", "round"],
+            format_func=lambda mode: {"random": "One persona at a time", "round": "All personas answer each question in parallel"}[mode],
+            horizontal=True,
+        )
+        memory_window = st.number_input(
+            "Messages sent in full each turn (0 = whole history; older messages are sent as a running summary):",
+            min_value=0, value=0, step=1,
+        )
+        end_early = st.checkbox("End the discussion early once the personas stop raising new points", value=True)
         with stylable_container(
             key="green_button",
             css_styles="""
@@ -187,18 +160,28 @@ with stylable_container(
             kickoff = st.button("Start Group Chat")
         
         if kickoff:
-            # delete all text in chat_summary.txt
-            chat_summary_path = os.path.join(current_dir, '..', 'docs', 'chat_summary.txt')
-            with open(chat_summary_path, 'w', encoding= 'utf-8') as f:
-                f.write("")
+            from focus_group import run_focus_group
+
+            # Reruns reuse the agents built for the same personas and llm_config; editing the personas rebuilds them
+            manager = session_resource(
+                st.session_state, "focus_group", fingerprint(personas, llm_config), lambda: build_streamlit_focus_group(personas, llm_config)
+            )
+            groupchat = manager.groupchat
+            # start a fresh transcript for this session
+            st.session_state.transcript.clear()
             llm_config=llm_config       
+            groupchat.speaking_mode = speaking_mode
+            groupchat.memory_window = memory_window or None
+            groupchat.saturation.threshold = 0.3 if end_early else None
             if "chat_initiated" not in st.session_state:
                 st.session_state.chat_initiated = False
                 if not st.session_state.chat_initiated:
-                    moderator_agent.initiate_chat(
-                        manager,
-                        message=user_input,
-                    )
+                    # Messages are recorded in this session's transcript (docs/transcripts/<session id>.jsonl)
+                    with streamlit_iostream(template="**{name}**: {content}", container=message_container):
+                        run_focus_group(manager, user_input, transcript=st.session_state.transcript)
+                    st.session_state.transcript.flush()
+                    if groupchat.saturation.saved_turns:
+                        st.caption(f"Opinions saturated: the moderator wrapped up {groupchat.saturation.saved_turns} turn(s) early.")
                     st.session_state.chat_initiated = True
 
 
@@ -1,11 +1,13 @@
 import streamlit as st
-from openai import AzureOpenAI
 from streamlit_extras.stylable_container import stylable_container
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 from dotenv import load_dotenv
 import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from shared.azure_clients import get_openai_client
+from shared.completion_cache import get_completion_cache
+from transcript_analysis import TranscriptAnalyzer
 
 load_dotenv()
 
@@ -13,22 +15,14 @@ st.set_page_config(page_title="Virtual Focus Group", page_icon=":tada:", layout=
 
 current_dir = os.path.dirname(__file__)
 
-# Azure Open AI Configuration
-token_provider = get_bearer_token_provider(
-    DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default"
-)
-
+# Azure Open AI Configuration, on the shared credential and HTTP connection pool. The map-reduce analysis runs
+# many parallel requests, so it is scheduled as batch traffic and never delays the interactive chats.
 api_base = os.getenv("AOAI_API_BASE") # your endpoint should look like the following https://YOUR_RESOURCE_NAME.openai.azure.com/
 api_version = os.getenv("AOAI_API_VERSION")
-client = AzureOpenAI( 
-    azure_ad_token_provider=token_provider,  
-    api_version=api_version,
-    azure_endpoint = api_base,
-)
 
-chat_summary_path = os.path.join(current_dir, '..', 'docs', 'chat_summary.txt')
-with open(chat_summary_path, 'r') as f:
-    summary = f.read()
+# The transcript of the focus group run in this session (see pages/1 Run_Virtual_Focus_Group.py)
+transcript = st.session_state.get("transcript")
+has_transcript = transcript is not None and len(transcript) > 0
 
 with stylable_container(
         key="green_button",
@@ -43,7 +37,7 @@ with stylable_container(
 
 
     if submit:
-        if not summary:
+        if not has_transcript:
             st.error("No chat data available. Please run a focus group before generating an analysis.")
         else:
             with st.spinner("Processing Analysis..."):
@@ -61,16 +55,19 @@ with stylable_container(
                     st.markdown("<h1 style='text-align: center; ;'>Analysis of Group Chat</h1>", unsafe_allow_html=True)
                     st.markdown("<h4 style='text-align: center; color: grey;'>The following is a summary of the focus group chat.</h4>", unsafe_allow_html=True)
 
-                response = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages = [
-                        {"role": "system",
-                        "content": f"Analyze the focus group chat and provide a detailed summary and analysis of the discussion in markdown format. Chat: {summary}"},
-                    ],
-                    temperature=0.7,
+                # Long transcripts are summarized in token-budgeted chunks in parallel, then merged
+                # Re-analyzing an unchanged transcript is answered from the completion cache
+                cache = get_completion_cache("analysis")
+                # the client (and openai with it) is created on the first analysis, not on every page load
+                client = get_openai_client(api_version=api_version, azure_endpoint=api_base, priority="batch")
+                analyzer = TranscriptAnalyzer(client, model="gpt-4o-mini", chunk_tokens=6000, max_workers=4, cache=cache)
+                analysis = analyzer.analyze(transcript.iter_records())
+                timings = analyzer.timings
+                st.caption(
+                    f"{timings['chunks']} chunk(s) | split {timings['split']:.2f}s | "
+                    f"map {timings['map']:.2f}s | reduce {timings['reduce']:.2f}s | total {timings['total']:.2f}s | "
+                    f"cache hit rate {cache.stats().get('analysis', {}).get('hit_rate', 0.0):.0%}"
                 )
-
-                analysis = response.choices[0].message.content
                 
                 with stylable_container(
                     key="outer_container",
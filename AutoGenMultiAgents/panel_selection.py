@@ -0,0 +1,110 @@
+import json
+import threading
+
+import numpy as np
+
+import demographics_dict as dd
+from persona_generator import CATEGORIES, COLUMN, HOBBY_BITS, KEYS
+
+# Ordered categories are encoded as one value in [0, 1], so neighbouring groups count as close;
+# the others are one-hot, so any two different categories are equally far apart
+ORDINAL = ("Age", "Education", "Income", "Children")
+# Weight of the 12 hobby bits together, relative to one attribute
+HOBBY_WEIGHT = 1.0
+
+# (store path, filters) -> (library version, pool); see pool_from_store
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def encode(codes, hobbies):
+    """Feature vectors (float32, one row per persona) for integer-coded personas, as in persona_generator.Population.
+
+    Every attribute contributes at most 1 to the squared distance between two personas, so no attribute dominates
+    because it has more categories.
+    """
+    columns = []
+    for key in KEYS:
+        column = codes[:, COLUMN[key]]
+        size = len(CATEGORIES[key])
+        if key in ORDINAL:
+            columns.append((column / (size - 1))[:, None])
+        else:
+            columns.append(np.eye(size, dtype=np.float32)[column] * np.sqrt(0.5))
+    bits = ((hobbies[:, None] & HOBBY_BITS) > 0).astype(np.float32)
+    columns.append(bits * np.sqrt(HOBBY_WEIGHT / len(dd.hobbies)))
+    return np.hstack(columns).astype(np.float32)
+
+
+def select_panel(codes, hobbies, size, quotas=None, seed=None):
+    """Indices of a maximally diverse panel of `size` personas, by farthest-point (greedy k-center) selection.
+
+    The first member is the persona farthest from the pool's centroid (or a random one with a seed); each next
+    member is the persona farthest from everyone already chosen. `quotas` caps the members per category, e.g.
+    {"Gender": {"female": 3, "male": 3}}; categories left out are not capped. Raises ValueError when the pool
+    cannot fill the panel under the quotas.
+    """
+    features = encode(codes, hobbies)
+    squared_norms = np.einsum("ij,ij->i", features, features)
+    remaining = {
+        key: np.array([quota.get(category, size) for category in CATEGORIES[key]], dtype=np.int64)
+        for key, quota in (quotas or {}).items()
+    }
+    eligible = np.ones(len(features), dtype=bool)
+
+    if seed is None:
+        centroid = features.mean(axis=0)
+        distances = squared_norms - 2 * features @ centroid + centroid @ centroid
+    else:
+        distances = np.random.default_rng(seed).random(len(features))
+
+    chosen = []
+    for _ in range(size):
+        for key, left in remaining.items():
+            eligible &= left[codes[:, COLUMN[key]]] > 0
+        candidates = np.where(eligible, distances, -np.inf)
+        index = int(np.argmax(candidates))
+        if not np.isfinite(candidates[index]):
+            raise ValueError(f"only {len(chosen)} of {size} panel members fit the quotas")
+        chosen.append(index)
+        eligible[index] = False
+        for key, left in remaining.items():
+            left[codes[index, COLUMN[key]]] -= 1
+        # squared distance of every persona to the new member; keep the distance to the nearest member
+        to_new = squared_norms - 2 * features @ features[index] + squared_norms[index]
+        distances = to_new if len(chosen) == 1 else np.minimum(distances, to_new)
+    return np.array(chosen)
+
+
+def pool_from_store(store, filters=None):
+    """(ids, codes, hobbies) of the library personas matching `filters`, integer-coded like a Population.
+
+    Pools are cached per store, filters and library version, so selecting several panels from an unchanged
+    library reads and encodes it once. The arrays are shared between callers and must not be modified.
+    """
+    key = (store.path, json.dumps(filters or {}, sort_keys=True, default=list))
+    version = store.version()
+    with _pools_lock:
+        cached = _pools.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    rows = np.array(store.coded(filters), dtype=np.int64).reshape(-1, len(KEYS) + 2)
+    pool = (rows[:, 0].copy(), rows[:, 1:-1].astype(np.uint8), rows[:, -1].astype(np.uint16))
+    for array in pool:
+        array.flags.writeable = False
+    with _pools_lock:
+        # only pools of the current library version are worth keeping
+        for stale in [k for k, (v, _) in _pools.items() if k[0] == store.path and v != version]:
+            del _pools[stale]
+        _pools[key] = (version, pool)
+    return pool
+
+
+def save_diverse_panel(store, name, size, filters=None, quotas=None, seed=None):
+    """Select a diverse panel from the library personas matching `filters` and save it as `name`. Returns the ids."""
+    ids, codes, hobbies = pool_from_store(store, filters)
+    if len(ids) < size:
+        raise ValueError(f"the library has {len(ids)} matching personas, fewer than the {size} requested")
+    panel = ids[select_panel(codes, hobbies, size, quotas=quotas, seed=seed)].tolist()
+    store.save_panel(name, panel)
+    return panel
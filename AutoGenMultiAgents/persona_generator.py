@@ -0,0 +1,260 @@
+import argparse
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+import demographics_dict as dd
+from persona_store import ATTRIBUTES, get_persona_store
+
+# Column order of Population.codes; each column holds indices into the attribute's demographics_dict list
+KEYS = list(ATTRIBUTES)
+CATEGORIES = {key: allowed for key, (_, allowed) in ATTRIBUTES.items()}
+COLUMN = {key: i for i, key in enumerate(KEYS)}
+HOBBY_BITS = (1 << np.arange(len(dd.hobbies))).astype(np.uint16)
+
+FIRST_NAMES = {
+    "male": ['James', 'Liam', 'Mateo', 'Wei', 'Arjun', 'Kwame', 'Lucas', 'Hiroshi', 'Omar', 'Noah', 'Diego', 'Ivan'],
+    "female": ['Emma', 'Sofia', 'Mei', 'Priya', 'Amara', 'Olivia', 'Yuki', 'Fatima', 'Isabella', 'Ana', 'Chloe', 'Zara'],
+    "non-binary": ['Alex', 'Sam', 'Jordan', 'Riley', 'Taylor', 'Robin', 'Kai', 'Quinn', 'Avery', 'Morgan', 'Sasha', 'Noor'],
+}
+LAST_NAMES = ['Smith', 'Garcia', 'Chen', 'Patel', 'Okafor', 'Mueller', 'Silva', 'Tanaka', 'Kowalski', 'Haddad', 'Nguyen',
+              'Johnson', 'Rossi', 'Kim', 'Mensah', 'Ivanova', 'Brown', 'Santos', 'Lee', 'Cohen']
+
+
+def _normalize(table):
+    table = np.asarray(table, dtype=np.float64)
+    return table / table.sum(axis=-1, keepdims=True)
+
+
+def _peaked(centers, size, width):
+    """Rows of a discrete distribution over `size` ordered categories, peaking at each of `centers`."""
+    positions = np.arange(size)
+    return _normalize(np.exp(-0.5 * ((positions - np.asarray(centers, dtype=np.float64)[..., None]) / width) ** 2))
+
+
+def _default_conditionals():
+    ages = len(dd.age_groups)
+    education_by_age = np.tile([0.28, 0.2, 0.1, 0.25, 0.13, 0.04], (ages, 1))
+    education_by_age[0] = [1, 0, 0, 0, 0, 0]
+    education_by_age[1] = [0.4, 0.35, 0.08, 0.15, 0.02, 0]
+
+    #                          Employed Unemployed Student Retired Other
+    employment_by_age = np.array([
+        [0.05, 0.0, 0.9, 0.0, 0.05],
+        [0.45, 0.1, 0.4, 0.0, 0.05],
+        [0.8, 0.07, 0.05, 0.0, 0.08],
+        [0.82, 0.07, 0.02, 0.0, 0.09],
+        [0.8, 0.07, 0.01, 0.03, 0.09],
+        [0.6, 0.05, 0.0, 0.3, 0.05],
+        [0.15, 0.0, 0.0, 0.8, 0.05],
+    ])
+    #                       Married Single Divorced Widowed
+    marital_by_age = np.array([
+        [0.0, 1.0, 0.0, 0.0],
+        [0.1, 0.88, 0.02, 0.0],
+        [0.45, 0.48, 0.06, 0.01],
+        [0.6, 0.27, 0.12, 0.01],
+        [0.62, 0.2, 0.15, 0.03],
+        [0.6, 0.15, 0.17, 0.08],
+        [0.5, 0.08, 0.14, 0.28],
+    ])
+    children_by_marital = np.array([
+        [0.2, 0.25, 0.35, 0.13, 0.07],
+        [0.75, 0.15, 0.07, 0.02, 0.01],
+        [0.3, 0.3, 0.25, 0.1, 0.05],
+        [0.2, 0.25, 0.3, 0.15, 0.1],
+    ])
+    children_by_age_and_marital = np.broadcast_to(children_by_marital, (ages,) + children_by_marital.shape).copy()
+    children_by_age_and_marital[:2] = [0.95, 0.05, 0, 0, 0]
+
+    # income rises with education and, until retirement, with age
+    age_offset = np.array([-3.0, -1.5, 0.0, 1.0, 1.5, 1.5, 0.0])
+    education_offset = np.arange(len(dd.education_levels)) * 1.2
+    income_by_age_and_education = _peaked(1.0 + age_offset[:, None] + education_offset[None, :], len(dd.income_levels), 1.8)
+
+    #                          Management Sales Clerical Service Production Technical Other
+    occupation_by_education = np.array([
+        [0.03, 0.15, 0.15, 0.3, 0.25, 0.04, 0.08],
+        [0.06, 0.2, 0.2, 0.22, 0.15, 0.1, 0.07],
+        [0.08, 0.15, 0.2, 0.15, 0.12, 0.22, 0.08],
+        [0.2, 0.18, 0.12, 0.08, 0.05, 0.3, 0.07],
+        [0.3, 0.1, 0.06, 0.04, 0.03, 0.38, 0.09],
+        [0.25, 0.03, 0.02, 0.02, 0.01, 0.5, 0.17],
+    ])
+    return {
+        "Education": (("Age",), education_by_age),
+        "Employment": (("Age",), employment_by_age),
+        "Marital Status": (("Age",), marital_by_age),
+        "Children": (("Age", "Marital Status"), children_by_age_and_marital),
+        "Income": (("Age", "Education"), income_by_age_and_education),
+        "Occupation": (("Education",), occupation_by_education),
+    }
+
+
+DEFAULT_MARGINALS = {
+    "Age": [0.05, 0.12, 0.18, 0.17, 0.16, 0.15, 0.17],
+    "Gender": [0.49, 0.49, 0.02],
+    "Location": [0.08, 0.08, 0.55, 0.1, 0.17, 0.02, 0.0],
+}
+DEFAULT_HOBBY_RATES = [0.3, 0.45, 0.35, 0.35, 0.3, 0.35, 0.3, 0.25, 0.4, 0.15, 0.25, 0.1]
+
+
+@dataclass
+class Population:
+    """Integer-coded personas: codes[i, COLUMN[key]] indexes CATEGORIES[key], hobbies[i] is a bitmask over dd.hobbies."""
+    codes: np.ndarray
+    hobbies: np.ndarray
+    first_names: np.ndarray
+    last_names: np.ndarray
+
+    def __len__(self):
+        return len(self.codes)
+
+    def column(self, key):
+        return self.codes[:, COLUMN[key]]
+
+    def counts(self, key):
+        return dict(zip(CATEGORIES[key], np.bincount(self.column(key), minlength=len(CATEGORIES[key])).tolist()))
+
+    def take(self, indices):
+        return Population(self.codes[indices], self.hobbies[indices], self.first_names[indices], self.last_names[indices])
+
+    def record(self, i):
+        """Persona i in the personas.json shape."""
+        gender = CATEGORIES["Gender"][self.codes[i, COLUMN["Gender"]]]
+        # an agent name must match ^[a-zA-Z0-9_-]+$, and the index keeps the names of one population unique
+        persona = {"Name": f"{FIRST_NAMES[gender][self.first_names[i]]}_{LAST_NAMES[self.last_names[i]]}_{i + 1}"}
+        persona.update((key, CATEGORIES[key][code]) for key, code in zip(KEYS, self.codes[i].tolist()))
+        persona["Hobbies"] = [hobby for hobby, bit in zip(dd.hobbies, HOBBY_BITS.tolist()) if int(self.hobbies[i]) & bit]
+        persona["Backstory"] = ""
+        return persona
+
+    def records(self):
+        return (self.record(i) for i in range(len(self)))
+
+
+class PopulationModel:
+    """Joint distribution of the demographics_dict attributes, as marginals for root attributes plus conditional tables.
+
+    `conditionals` maps an attribute to (parents, table), where table has shape
+    (len(parent categories)..., len(attribute categories)) and each row is that attribute's distribution given the
+    parents' categories, e.g. "Income": (("Age", "Education"), table of shape (7, 6, 11)). Overrides are merged into
+    the defaults; giving an attribute a marginal removes its default conditional.
+    """
+
+    def __init__(self, marginals=None, conditionals=None, hobby_rates=None):
+        self.conditionals = _default_conditionals()
+        self.marginals = dict(DEFAULT_MARGINALS)
+        for key, probabilities in (marginals or {}).items():
+            self.marginals[key] = probabilities
+            self.conditionals.pop(key, None)
+        self.conditionals.update(conditionals or {})
+        self.hobby_rates = np.asarray(hobby_rates if hobby_rates is not None else DEFAULT_HOBBY_RATES, dtype=np.float64)
+
+        for key in KEYS:
+            if key not in self.conditionals:
+                self.marginals[key] = _normalize(self.marginals.get(key, np.ones(len(CATEGORIES[key]))))
+                if self.marginals[key].shape != (len(CATEGORIES[key]),):
+                    raise ValueError(f"{key} needs {len(CATEGORIES[key])} probabilities")
+        for key, (parents, table) in self.conditionals.items():
+            table = _normalize(table)
+            expected = tuple(len(CATEGORIES[parent]) for parent in parents) + (len(CATEGORIES[key]),)
+            if table.shape != expected:
+                raise ValueError(f"{key} given {parents} needs a table of shape {expected}, not {table.shape}")
+            self.conditionals[key] = (tuple(parents), table)
+
+    def order(self, roots=()):
+        """Attributes in sampling order: every attribute after its parents. `roots` are sampled without parents."""
+        ordered, pending = [], [key for key in KEYS]
+        while pending:
+            ready = [key for key in pending if key in roots or key not in self.conditionals
+                     or all(parent in ordered for parent in self.conditionals[key][0])]
+            if not ready:
+                raise ValueError(f"the conditional distributions of {pending} form a cycle")
+            ordered.extend(ready)
+            pending = [key for key in pending if key not in ready]
+        return ordered
+
+    def sample(self, n, quotas=None, seed=None):
+        """Draw a Population of n personas.
+
+        `quotas` fixes exact category counts per attribute, e.g. {"Gender": {"female": 0.5, "male": 0.5}} (shares)
+        or {"Age": {"25-34": 400, "35-44": 600}} (counts summing to n). A quota replaces that attribute's own
+        distribution; attributes conditioned on it are still drawn from their conditional tables.
+        """
+        rng = np.random.default_rng(seed)
+        quotas = quotas or {}
+        codes = np.empty((n, len(KEYS)), dtype=np.uint8)
+        for key in self.order(roots=quotas):
+            if key in quotas:
+                codes[:, COLUMN[key]] = _quota_codes(key, quotas[key], n, rng)
+            elif key in self.conditionals:
+                parents, table = self.conditionals[key]
+                probabilities = table[tuple(codes[:, COLUMN[parent]] for parent in parents)]
+                codes[:, COLUMN[key]] = _draw(probabilities, rng)
+            else:
+                codes[:, COLUMN[key]] = rng.choice(len(CATEGORIES[key]), size=n, p=self.marginals[key])
+        hobbies = (rng.random((n, len(dd.hobbies))) < self.hobby_rates) @ HOBBY_BITS
+        return Population(
+            codes,
+            hobbies.astype(np.uint16),
+            rng.integers(0, len(FIRST_NAMES["male"]), size=n, dtype=np.uint16),
+            rng.integers(0, len(LAST_NAMES), size=n, dtype=np.uint16),
+        )
+
+
+def _draw(probabilities, rng):
+    """One category per row of an (n, k) probability matrix, by inverse CDF."""
+    cdf = np.cumsum(probabilities, axis=1)
+    u = rng.random((len(probabilities), 1)) * cdf[:, -1:]
+    return np.minimum((u >= cdf).sum(axis=1), probabilities.shape[1] - 1)
+
+
+def _quota_codes(key, quota, n, rng):
+    categories = CATEGORIES[key]
+    unknown = set(quota) - set(categories)
+    if unknown:
+        raise ValueError(f"unknown {key} categories in quota: {sorted(unknown)}")
+    targets = np.array([quota.get(category, 0) for category in categories], dtype=np.float64)
+    if not (np.all(targets == np.round(targets)) and targets.sum() == n):
+        # shares: allocate n by largest remainder
+        exact = targets / targets.sum() * n
+        targets = np.floor(exact)
+        targets[np.argsort(targets - exact)[: n - int(targets.sum())]] += 1
+    return rng.permutation(np.repeat(np.arange(len(categories), dtype=np.uint8), targets.astype(np.int64)))
+
+
+def add_to_store(population, store=None, panel=None):
+    """Insert a population into the persona library, optionally saved as a panel. Returns the new ids."""
+    store = store or get_persona_store()
+    ids = store.add_many(population.records())
+    if panel:
+        store.save_panel(panel, ids)
+    return ids
+
+
+def _parse_quota(text):
+    # Gender=female:0.5,male:0.5
+    key, _, shares = text.partition("=")
+    return key, {category: float(share) for category, share in (item.rsplit(":", 1) for item in shares.split(","))}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic personas into the persona library.")
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--quota", action="append", type=_parse_quota, default=[],
+                        help="exact category shares for one attribute, e.g. 'Gender=female:0.5,male:0.5' (repeatable)")
+    parser.add_argument("--panel", help="also save the generated personas as this panel")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    population = PopulationModel().sample(args.count, quotas=dict(args.quota), seed=args.seed)
+    sampled = time.perf_counter()
+    add_to_store(population, panel=args.panel)
+    print(f"Sampled {len(population)} personas in {sampled - start:.2f}s, stored in {time.perf_counter() - sampled:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
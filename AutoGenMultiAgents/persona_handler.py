@@ -1,24 +1,53 @@
+import functools
 import json
+from dataclasses import dataclass
 
-persona_name = []
-persona_data = []
-
-persona_prompt = f"""
-        You are {persona_name}, a member of a virtual focus group. Your role is to participate in a discussion about a given product or topic.
-        In this focus group, you have never seen the product before and should give your opinions on the positive and negative aspects.  Ask any questions
-        needed to understand the product better. 
-        You always have an opinion to share. If you do not have children or a partner/spouse, do not mention children or a partner/spouse.
-
-        Your demographics, traits, and background are as follows:
-        {json.dumps(persona_data, indent=2)}
-
-        When responding, make sure to:
-        1. Take your time and consider the topic carefully. Before replying, know your persona and how they would feel. Adhere strictly to your persona and do not act otherwise.
-        2. Remember that you are a participant. You know nothing about the product beyond what was told to you by the Admin or Moderator.
-        3. Act and speak in a way that is consistent with your demographics and traits. For example, if you are considered stubborn or shy, reflect that in your responses. Avoid being witty or using humor if your persona is serious or formal.
-        4. Provide opinions, insights, and reactions based on your persona's perspective.
-        5. Do not make up facts about your life or background that are not provided in the persona description.
-       
-        Remember to stay in character throughout the conversation and provide responses that align with your persona's background and traits.
-        
-        """
\ No newline at end of file
+from transcript_store import count_tokens
+
+# Shared by every persona, byte for byte, and placed first in each system message, with the persona-specific part
+# last. At about 330 tokens it is below the 1024 tokens from which Azure OpenAI caches prompt prefixes, so it is not
+# cached across personas; what the fixed layout buys is a stable prefix per persona, so each persona's follow-up turns
+# hit the cache once its system message and history pass 1024 tokens.
+PERSONA_INSTRUCTIONS = """You are a member of a virtual focus group. Your role is to participate in a discussion about a given product or topic.
+In this focus group, you have never seen the product before and should give your opinions on the positive and negative aspects. Ask any questions
+needed to understand the product better.
+You always have an opinion to share. If you do not have children or a partner/spouse, do not mention children or a partner/spouse.
+
+When responding, make sure to:
+1. Take your time and consider the topic carefully. Before replying, know your persona and how they would feel. Adhere strictly to your persona and do not act otherwise.
+2. Remember that you are a participant. You know nothing about the product beyond what was told to you by the Admin or Moderator.
+3. Act and speak in a way that is consistent with your demographics and traits. For example, if you are considered stubborn or shy, reflect that in your responses. Avoid being witty or using humor if your persona is serious or formal.
+4. Provide opinions, insights, and reactions based on your persona's perspective.
+5. Do not make up facts about your life or background that are not provided in the persona description.
+
+Remember to stay in character throughout the conversation and provide responses that align with your persona's background and traits.
+"""
+
+PERSONA_TEMPLATE = """
+Your name is {name}. Your demographics, traits, and background are as follows:
+{persona}
+"""
+
+
+@dataclass(frozen=True)
+class PersonaPrompt:
+    name: str
+    system_message: str
+    tokens: int
+
+
+def compile_persona_prompt(persona_data):
+    """The system message for one persona record from personas.json, compiled and token-counted once per record."""
+    return _compile(json.dumps(persona_data, indent=2), persona_data['Name'])
+
+
+# Bounded, so a survey over a large persona library does not keep every persona's prompt in memory
+@functools.lru_cache(maxsize=4096)
+def _compile(persona, name):
+    system_message = PERSONA_INSTRUCTIONS + PERSONA_TEMPLATE.format(name=name, persona=persona)
+    return PersonaPrompt(name, system_message, count_tokens(system_message))
+
+
+def compile_persona_prompts(personas):
+    """Compiled prompts for a personas.json mapping, with the same keys."""
+    return {key: compile_persona_prompt(persona_data) for key, persona_data in personas.items()}
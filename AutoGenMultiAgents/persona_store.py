@@ -0,0 +1,378 @@
+import csv
+import io
+import json
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+
+import demographics_dict as dd
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'docs', 'personas.sqlite')
+LEGACY_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'docs', 'personas.json')
+
+# personas.json key -> (column, allowed values from demographics_dict)
+ATTRIBUTES = {
+    "Age": ("age", dd.age_groups),
+    "Gender": ("gender", dd.gender_groups),
+    "Location": ("location", dd.geographic_location),
+    "Education": ("education", dd.education_levels),
+    "Employment": ("employment", dd.employment_status),
+    "Income": ("income", dd.income_levels),
+    "Marital Status": ("marital_status", dd.marital_status),
+    "Children": ("children", dd.number_of_children),
+    "Occupation": ("occupation", dd.occupation),
+}
+FIELDS = ["Name"] + list(ATTRIBUTES) + ["Hobbies", "Backstory"]
+HOBBY_SEPARATOR = ";"
+BATCH_SIZE = 1000
+
+
+@dataclass
+class ImportResult:
+    imported: int = 0
+    # (line number, error message) of rejected rows; only the first max_errors are kept
+    errors: list = field(default_factory=list)
+    rejected: int = 0
+
+
+def validate(record):
+    """A persona record normalized to the personas.json shape. Raises ValueError naming every invalid field."""
+    if not isinstance(record, dict):
+        raise ValueError(f"a persona must be an object, not {type(record).__name__}")
+    problems = []
+    persona = {"Name": str(record.get("Name") or "").strip()}
+    if not persona["Name"]:
+        problems.append("Name is required")
+    for key, (_, allowed) in ATTRIBUTES.items():
+        value = str(record.get(key) if record.get(key) is not None else "").strip()
+        if value not in allowed:
+            problems.append(f"{key} must be one of {allowed}, not {value!r}")
+        persona[key] = value
+    hobbies = record.get("Hobbies") or []
+    if isinstance(hobbies, str):
+        hobbies = [hobby.strip() for hobby in hobbies.split(HOBBY_SEPARATOR) if hobby.strip()]
+    elif not isinstance(hobbies, list) or not all(isinstance(hobby, str) for hobby in hobbies):
+        raise ValueError(f"Hobbies must be a list of strings, not {hobbies!r}")
+    unknown = [hobby for hobby in hobbies if hobby not in dd.hobbies]
+    if unknown:
+        problems.append(f"unknown hobbies {unknown}")
+    persona["Hobbies"] = sorted(set(hobbies), key=lambda hobby: dd.hobbies.index(hobby) if hobby in dd.hobbies else len(dd.hobbies))
+    persona["Backstory"] = str(record.get("Backstory") or "")
+    if problems:
+        raise ValueError("; ".join(problems))
+    return persona
+
+
+class PersonaStore:
+    """Persona library in SQLite, with an index per demographics_dict attribute and per hobby, and named panels.
+
+    Records use the personas.json shape ({"Name": ..., "Age": ..., "Hobbies": [...], ...}) plus an "id". One
+    connection per thread (WAL mode), so Streamlit sessions can share the store. On first use an existing
+    docs/personas.json is imported as the panel "personas.json".
+    """
+
+    def __init__(self, path=DEFAULT_PATH, legacy_json=LEGACY_JSON):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        db = self._connect()
+        columns = ", ".join(f"{column} TEXT NOT NULL" for column, _ in ATTRIBUTES.values())
+        db.executescript(f"""
+            CREATE TABLE IF NOT EXISTS personas (
+                id INTEGER PRIMARY KEY, name TEXT NOT NULL, {columns}, backstory TEXT NOT NULL DEFAULT '');
+            CREATE TABLE IF NOT EXISTS persona_hobbies (
+                persona_id INTEGER NOT NULL REFERENCES personas(id) ON DELETE CASCADE, hobby TEXT NOT NULL,
+                PRIMARY KEY (persona_id, hobby));
+            CREATE INDEX IF NOT EXISTS persona_hobbies_hobby ON persona_hobbies (hobby, persona_id);
+            CREATE TABLE IF NOT EXISTS panels (name TEXT PRIMARY KEY, created REAL NOT NULL DEFAULT (julianday('now')));
+            CREATE TABLE IF NOT EXISTS panel_members (
+                panel TEXT NOT NULL REFERENCES panels(name) ON DELETE CASCADE,
+                persona_id INTEGER NOT NULL REFERENCES personas(id) ON DELETE CASCADE,
+                position INTEGER NOT NULL, PRIMARY KEY (panel, persona_id));
+            -- one row, bumped by every write to personas, so readers can cache what they derive from the library
+            CREATE TABLE IF NOT EXISTS library_version (version INTEGER NOT NULL);
+            INSERT INTO library_version SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM library_version);
+        """)
+        for column, _ in ATTRIBUTES.values():
+            db.execute(f"CREATE INDEX IF NOT EXISTS personas_{column} ON personas ({column})")
+        if legacy_json and os.path.exists(legacy_json) and self.count() == 0:
+            with open(legacy_json, 'r') as f:
+                ids = self.add_many(json.load(f).values())
+            self.save_panel("personas.json", ids)
+
+    def _connect(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("PRAGMA foreign_keys=ON")
+            self._local.db = db
+        return db
+
+    # writing
+
+    def add(self, record):
+        return self.add_many([record])[0]
+
+    def add_many(self, records):
+        """Validate and insert personas in one transaction. Returns their ids; nothing is inserted if one is invalid."""
+        personas = [validate(record) for record in records]
+        db = self._connect()
+        ids = []
+        db.execute("BEGIN")
+        try:
+            for persona in personas:
+                ids.append(self._insert(db, persona))
+            self._bump_version(db)
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return ids
+
+    def _insert(self, db, persona):
+        columns = ["name"] + [column for column, _ in ATTRIBUTES.values()] + ["backstory"]
+        values = [persona["Name"]] + [persona[key] for key in ATTRIBUTES] + [persona["Backstory"]]
+        cursor = db.execute(
+            f"INSERT INTO personas ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", values
+        )
+        db.executemany(
+            "INSERT INTO persona_hobbies (persona_id, hobby) VALUES (?, ?)",
+            [(cursor.lastrowid, hobby) for hobby in persona["Hobbies"]],
+        )
+        return cursor.lastrowid
+
+    def _bump_version(self, db):
+        db.execute("UPDATE library_version SET version = version + 1")
+
+    def delete(self, ids):
+        ids = list(ids)
+        db = self._connect()
+        db.execute("BEGIN")
+        try:
+            db.execute(f"DELETE FROM personas WHERE id IN ({', '.join('?' * len(ids))})", ids)
+            self._bump_version(db)
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    def import_file(self, source, fmt=None, max_errors=100):
+        """Stream a CSV or JSONL file (a path or an open file) into the store, validating row by row.
+
+        Invalid rows are skipped and reported in the result; valid rows are committed in batches of BATCH_SIZE,
+        so a CSV or JSONL file of any size is imported without reading it into memory. CSV columns are the
+        personas.json keys, with hobbies separated by ";". A .json file is one document, read whole: a list of
+        personas or a personas.json mapping; its rows are numbered by position instead of by line.
+        """
+        if isinstance(source, str):
+            fmt = fmt or os.path.splitext(source)[1].lstrip(".").lower()
+            with open(source, 'r', encoding='utf-8', newline='') as f:
+                return self.import_file(f, fmt, max_errors)
+        if not isinstance(source, io.TextIOBase):
+            # binary files, e.g. Streamlit uploads
+            source = io.TextIOWrapper(source, encoding='utf-8', newline='')
+        fmt = (fmt or "jsonl").lower()
+        if fmt == "csv":
+            rows = ((reader.line_num, row) for reader in [csv.DictReader(source)] for row in reader)
+        elif fmt in ("jsonl", "ndjson"):
+            rows = ((line_number, line) for line_number, line in enumerate(source, 1) if line.strip())
+        elif fmt == "json":
+            document = json.load(source)
+            if isinstance(document, dict):
+                document = list(document.values())
+            if not isinstance(document, list):
+                raise ValueError("a .json file must hold a list of personas or a personas.json mapping")
+            rows = enumerate(document, 1)
+        else:
+            raise ValueError(f"unsupported format {fmt!r}, use csv, jsonl or json")
+
+        result = ImportResult()
+        db = self._connect()
+        batch = []
+        for line_number, row in rows:
+            try:
+                batch.append(validate(json.loads(row) if isinstance(row, str) else row))
+            except ValueError as ex:
+                result.rejected += 1
+                if len(result.errors) < max_errors:
+                    result.errors.append((line_number, str(ex)))
+                continue
+            if len(batch) >= BATCH_SIZE:
+                result.imported += self._insert_batch(db, batch)
+                batch = []
+        if batch:
+            result.imported += self._insert_batch(db, batch)
+        return result
+
+    def _insert_batch(self, db, personas):
+        db.execute("BEGIN")
+        try:
+            for persona in personas:
+                self._insert(db, persona)
+            self._bump_version(db)
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return len(personas)
+
+    def export(self, target, fmt="jsonl", filters=None):
+        """Write the personas matching `filters` to a path or an open text file, streaming in id order."""
+        if isinstance(target, str):
+            with open(target, 'w', encoding='utf-8', newline='') as f:
+                return self.export(f, fmt, filters)
+        writer = csv.DictWriter(target, fieldnames=["id"] + FIELDS) if fmt == "csv" else None
+        if writer:
+            writer.writeheader()
+        exported = 0
+        for persona in self.iter(filters):
+            if writer:
+                writer.writerow({**persona, "Hobbies": HOBBY_SEPARATOR.join(persona["Hobbies"])})
+            else:
+                target.write(json.dumps(persona) + "\n")
+            exported += 1
+        return exported
+
+    # reading
+
+    def _where(self, filters):
+        """SQL condition and parameters for {key: value or [values]}; "Hobbies" requires every listed hobby."""
+        clauses, params = [], []
+        for key, value in (filters or {}).items():
+            values = [value] if isinstance(value, str) else list(value or [])
+            if not values:
+                continue
+            if key == "Hobbies":
+                clauses.append(
+                    f"p.id IN (SELECT persona_id FROM persona_hobbies WHERE hobby IN ({', '.join('?' * len(values))}) "
+                    f"GROUP BY persona_id HAVING COUNT(*) = ?)"
+                )
+                params.extend(values + [len(set(values))])
+            elif key == "Name":
+                clauses.append("p.name LIKE ?")
+                params.append(f"%{values[0]}%")
+            else:
+                column = ATTRIBUTES[key][0]
+                clauses.append(f"p.{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _rows(self, sql, params):
+        columns = ", ".join(f"p.{column}" for column, _ in ATTRIBUTES.values())
+        rows = self._connect().execute(
+            f"SELECT p.id, p.name, {columns}, p.backstory, "
+            f"(SELECT group_concat(hobby, '{HOBBY_SEPARATOR}') FROM persona_hobbies h WHERE h.persona_id = p.id) "
+            f"FROM personas p {sql}",
+            params,
+        )
+        for row in rows:
+            persona = {"id": row[0], "Name": row[1]}
+            persona.update(zip(ATTRIBUTES, row[2:2 + len(ATTRIBUTES)]))
+            hobbies = row[-1].split(HOBBY_SEPARATOR) if row[-1] else []
+            persona["Hobbies"] = sorted(hobbies, key=dd.hobbies.index)
+            persona["Backstory"] = row[-2]
+            yield persona
+
+    def version(self):
+        """A number that changes whenever personas are added or deleted, by any process."""
+        return self._connect().execute("SELECT version FROM library_version").fetchone()[0]
+
+    def count(self, filters=None):
+        where, params = self._where(filters)
+        return self._connect().execute(f"SELECT COUNT(*) FROM personas p{where}", params).fetchone()[0]
+
+    def query(self, filters=None, limit=50, offset=0):
+        """One page of the personas matching `filters`, e.g. {"Age": "35-44", "Location": "Europe"}, in id order."""
+        where, params = self._where(filters)
+        return list(self._rows(f"{where} ORDER BY p.id LIMIT ? OFFSET ?", params + [limit, offset]))
+
+    def iter(self, filters=None, batch_size=BATCH_SIZE):
+        """All personas matching `filters`, fetched a batch at a time."""
+        where, params = self._where(filters)
+        last_id = 0
+        while True:
+            condition = f"{where} AND p.id > ?" if where else " WHERE p.id > ?"
+            page = list(self._rows(f"{condition} ORDER BY p.id LIMIT ?", params + [last_id, batch_size]))
+            yield from page
+            if len(page) < batch_size:
+                return
+            last_id = page[-1]["id"]
+
+    def coded(self, filters=None):
+        """Rows (id, code per attribute..., hobby mask) of the personas matching `filters` in id order, in one query.
+
+        The j-th code is the index of the persona's value in the j-th ATTRIBUTES list, and bit k of the hobby mask
+        is set when it has dd.hobbies[k]; SQLite does the encoding. Meant for bulk numeric work (panel selection),
+        where building a dict per persona with iter() costs more than the query.
+        """
+        where, params = self._where(filters)
+        cases = ", ".join(
+            f"CASE p.{column} " + " ".join(f"WHEN ? THEN {i}" for i in range(len(allowed))) + " END"
+            for column, allowed in ATTRIBUTES.values()
+        )
+        bits = " ".join(f"WHEN ? THEN {1 << i}" for i in range(len(dd.hobbies)))
+        labels = [value for _, allowed in ATTRIBUTES.values() for value in allowed] + list(dd.hobbies)
+        return self._connect().execute(
+            f"SELECT p.id, {cases}, "
+            f"(SELECT COALESCE(SUM(CASE h.hobby {bits} ELSE 0 END), 0) FROM persona_hobbies h WHERE h.persona_id = p.id) "
+            f"FROM personas p{where} ORDER BY p.id",
+            labels + params,
+        ).fetchall()
+
+    def get(self, ids):
+        """Personas by id, in the order given."""
+        ids = list(ids)
+        if not ids:
+            return []
+        found = {persona["id"]: persona for persona in self._rows(f"WHERE p.id IN ({', '.join('?' * len(ids))})", ids)}
+        return [found[persona_id] for persona_id in ids if persona_id in found]
+
+    # panels
+
+    def save_panel(self, name, ids):
+        db = self._connect()
+        db.execute("BEGIN")
+        try:
+            db.execute("DELETE FROM panels WHERE name = ?", (name,))
+            db.execute("INSERT INTO panels (name) VALUES (?)", (name,))
+            db.executemany(
+                "INSERT OR IGNORE INTO panel_members (panel, persona_id, position) VALUES (?, ?, ?)",
+                [(name, persona_id, position) for position, persona_id in enumerate(ids)],
+            )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    def panels(self):
+        """Panel names, newest first."""
+        return [row[0] for row in self._connect().execute("SELECT name FROM panels ORDER BY created DESC, name")]
+
+    def panel_ids(self, name):
+        return [row[0] for row in self._connect().execute(
+            "SELECT persona_id FROM panel_members WHERE panel = ? ORDER BY position", (name,)
+        )]
+
+    def load_panel(self, name):
+        """A panel in the personas.json shape ({"Persona <id>": record}), ready for build_focus_group."""
+        return as_personas(self.get(self.panel_ids(name)))
+
+
+def as_personas(records):
+    return {f"Persona {record['id']}": {key: record[key] for key in FIELDS} for record in records}
+
+
+_store = None
+_lock = threading.Lock()
+
+
+def get_persona_store():
+    """The process-wide PersonaStore on docs/personas.sqlite."""
+    global _store
+    with _lock:
+        if _store is None:
+            _store = PersonaStore()
+        return _store
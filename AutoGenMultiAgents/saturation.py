@@ -0,0 +1,85 @@
+import re
+
+# Frequent words that carry no opinion; left out so that overlap means repeated content, not shared grammar
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being below between both but by can
+could did do does doing down during each few for from further had has have having he her here hers herself him himself
+his how i if in into is it its itself just me more most my myself no nor not now of off on once only or other our ours
+ourselves out over own same she should so some such than that the their theirs them themselves then there these they
+this those through to too under until up very was we were what when where which while who whom why will with would you
+your yours yourself yourselves i'm it's that's don't i'd i've i'll really think like also much well
+""".split())
+
+# Must not contain "TERMINATE": the moderator's is_termination_msg would take the request itself as the end of the chat
+WRAP_UP_PROMPT = """The participants have stopped raising new points. Wrap up the focus group now: briefly summarize the main
+opinions you heard and thank the participants for the discussion."""
+
+
+def ngrams(text, n=2):
+    """Content-word n-grams of sizes 1..n of a message."""
+    words = [word for word in re.findall(r"[a-z0-9']+", text.lower()) if word not in STOPWORDS]
+    grams = set()
+    for size in range(1, n + 1):
+        grams.update(zip(*(words[i:] for i in range(size))))
+    return grams
+
+
+class SaturationDetector:
+    """Detects when a focus group stops producing new opinions, without LLM calls.
+
+    Each participant message is scored by its novelty: the share of its content-word n-grams that nobody has
+    used earlier in the session (the moderator's messages and the product description count as used). Once
+    `patience` participant messages in a row score below `threshold`, the discussion is saturated: the
+    moderator gets one wrap-up turn (or, with wrap_up=False, the session ends at once). threshold=None only
+    scores messages and never ends the session.
+    """
+
+    def __init__(self, threshold=None, patience=3, n=2, wrap_up=True):
+        self.threshold = threshold
+        self.patience = patience
+        self.n = n
+        self.wrap_up = wrap_up
+        self.reset()
+
+    def reset(self):
+        self.seen = set()
+        self.scores = []
+        self.low_streak = 0
+        self.saturated = False
+        self.wrapped_up = False
+        self.saved_turns = 0
+
+    def observe(self, content):
+        """Add a message that is not scored (moderator, product description) to the known content."""
+        self.seen.update(ngrams(content, self.n))
+
+    def score(self, content):
+        """Novelty of a participant message, between 0.0 (nothing new) and 1.0 (all new)."""
+        grams = ngrams(content, self.n)
+        novelty = len(grams - self.seen) / len(grams) if grams else 0.0
+        self.seen.update(grams)
+        self.scores.append(novelty)
+        if self.threshold is not None:
+            self.low_streak = self.low_streak + 1 if novelty < self.threshold else 0
+            if self.low_streak >= self.patience:
+                self.saturated = True
+        return novelty
+
+    @property
+    def done(self):
+        """True when the session should end now."""
+        return self.wrapped_up or (self.saturated and not self.wrap_up)
+
+    def wrap_up_hook(self, messages):
+        """process_all_messages_before_reply hook for the moderator: asks for the wrap-up once saturated."""
+        if self.saturated and self.wrap_up and not self.wrapped_up:
+            return messages + [{"role": "user", "name": "Admin", "content": WRAP_UP_PROMPT}]
+        return messages
+
+    def stats(self):
+        return {
+            "scored_messages": len(self.scores),
+            "last_novelty": self.scores[-1] if self.scores else None,
+            "saturated": self.saturated,
+            "saved_turns": self.saved_turns,
+        }
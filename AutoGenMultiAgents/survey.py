@@ -0,0 +1,324 @@
+"""Send one questionnaire to every persona of a panel, concurrently, at the deployment's rate limits.
+
+Each persona answers once, in character (the same system prompt as in the focus group). Requests run on asyncio,
+paced by token buckets sized to the deployment's requests-per-minute and tokens-per-minute quota. 429 responses
+pause every request for the Retry-After time; other transient errors are retried with exponential backoff and
+jitter. Every answer is appended to a JSONL file as soon as it arrives, tagged with a hash of the topic and questions;
+personas that already answered the same questionnaire there are skipped, so an interrupted survey resumes where it
+stopped, while a new questionnaire on the same panel asks everyone again.
+
+    python survey.py --panel "Synthetic 100k" --questions questions.txt --rpm 1000 --tpm 150000
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+
+import httpx
+import openai
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from persona_handler import compile_persona_prompt
+from transcript_store import count_tokens
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'docs', 'surveys')
+
+SURVEY_PROMPT = """Please fill in this questionnaire about the product or topic below, answering every question as yourself.
+
+{topic}
+
+Questions:
+{questions}
+
+Reply with a JSON object {{"answers": [...]}} holding one answer string per question, in order."""
+
+
+class TokenBucket:
+    """Async token bucket refilled continuously at `per_minute`, holding at most `capacity` (10 seconds' worth by default,
+    the window Azure enforces quotas over). The level may go negative when actual usage exceeds what was reserved."""
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute / 6.0
+        self.level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount=1):
+        amount = min(amount, self.capacity)
+        # the lock keeps waiters in arrival order
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.level >= amount:
+                    self.level -= amount
+                    return
+                await asyncio.sleep((amount - self.level) / self.rate)
+
+    def adjust(self, amount):
+        """Give back (positive) or charge (negative) the difference between reserved and actual usage."""
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+    def drain(self):
+        self._refill()
+        self.level = min(self.level, 0.0)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute buckets, plus a pause shared by all requests after a 429."""
+
+    def __init__(self, rpm, tpm):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.paused_until = 0.0
+
+    async def acquire(self, tokens):
+        while (delay := self.paused_until - time.monotonic()) > 0:
+            await asyncio.sleep(delay)
+        await self.requests.acquire(1)
+        await self.tokens.acquire(tokens)
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens.drain()
+
+
+@dataclass
+class SurveyStats:
+    requests: int = 0
+    completed: int = 0
+    failed: int = 0
+    skipped: int = 0
+    throttled: int = 0
+    retried: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    seconds: float = 0.0
+    errors: dict = field(default_factory=dict)
+
+
+def retry_after(ex):
+    """Seconds to wait from a 429 response's retry-after-ms or Retry-After header, or None."""
+    headers = getattr(getattr(ex, "response", None), "headers", None) or {}
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000.0
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+def questionnaire_id(topic, questions):
+    """Short hash of a questionnaire's topic and questions; results and default file names carry it."""
+    return hashlib.sha256(json.dumps([topic, list(questions)]).encode('utf-8')).hexdigest()[:12]
+
+
+def load_answered(path, survey=None):
+    """Ids of the personas that already have an answer in a survey file, to questionnaire `survey` if given."""
+    answered = set()
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError:
+                    # a line cut off by an interrupted run
+                    continue
+                if "answers" in result and (survey is None or result.get("survey") == survey):
+                    answered.add(result["persona"])
+    return answered
+
+
+class Survey:
+    """One questionnaire sent to many personas over an AsyncAzureOpenAI client.
+
+    `client` must be created with max_retries=0: retries are done here, so they are paced by the shared limiter.
+    """
+
+    def __init__(self, client, model, topic, questions, rpm, tpm, concurrency=64, max_tokens=400, max_attempts=8,
+                 backoff_base=1.0, backoff_max=60.0, temperature=0.7):
+        self.client = client
+        self.model = model
+        self.prompt = SURVEY_PROMPT.format(topic=topic, questions="\n".join(f"{i}. {q}" for i, q in enumerate(questions, 1)))
+        self.questions = questions
+        self.id = questionnaire_id(topic, questions)
+        self.limiter = RateLimiter(rpm, tpm)
+        self.concurrency = concurrency
+        self.max_tokens = max_tokens
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.temperature = temperature
+        self.stats = SurveyStats()
+
+    async def run(self, personas, output):
+        """Ask every persona ({key: record}) and append the results to `output` (JSONL). Returns the stats."""
+        start = time.perf_counter()
+        answered = load_answered(output, self.id)
+        queue = asyncio.Queue()
+        for key, persona in personas.items():
+            if key in answered:
+                self.stats.skipped += 1
+            else:
+                queue.put_nowait((key, persona))
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'a', encoding='utf-8') as results:
+            workers = [asyncio.create_task(self._worker(queue, results)) for _ in range(min(self.concurrency, queue.qsize()))]
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                for worker in workers:
+                    worker.cancel()
+        self.stats.seconds = time.perf_counter() - start
+        return self.stats
+
+    async def _worker(self, queue, results):
+        while not queue.empty():
+            key, persona = queue.get_nowait()
+            result = await self.ask(key, persona)
+            # one write per line, so a result is either complete on disk or missing
+            results.write(json.dumps(result) + "\n")
+            results.flush()
+
+    async def ask(self, key, persona):
+        prompt = compile_persona_prompt(persona)
+        messages = [{"role": "system", "content": prompt.system_message}, {"role": "user", "content": self.prompt}]
+        reserved = prompt.tokens + count_tokens(self.prompt) + self.max_tokens
+        result = {"survey": self.id, "persona": key, "name": persona["Name"]}
+        start = time.perf_counter()
+        for attempt in range(1, self.max_attempts + 1):
+            await self.limiter.acquire(reserved)
+            self.stats.requests += 1
+            try:
+                response = await self.client.chat.completions.create(
+                    model=self.model, messages=messages, max_tokens=self.max_tokens, temperature=self.temperature,
+                )
+            except openai.RateLimitError as ex:
+                self.stats.throttled += 1
+                delay = retry_after(ex)
+                self.limiter.pause(delay if delay is not None else self._backoff(attempt))
+                continue
+            except (openai.APIConnectionError, openai.InternalServerError) as ex:
+                self.stats.retried += 1
+                if attempt == self.max_attempts:
+                    return self._failed(result, ex, attempt)
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+            except openai.APIStatusError as ex:
+                return self._failed(result, ex, attempt)
+
+            usage = response.usage
+            if usage is not None:
+                self.limiter.tokens.adjust(reserved - usage.total_tokens)
+                self.stats.prompt_tokens += usage.prompt_tokens
+                self.stats.completion_tokens += usage.completion_tokens
+            text = response.choices[0].message.content or ""
+            self.stats.completed += 1
+            result.update(answers=parse_answers(text, len(self.questions)), attempts=attempt,
+                          seconds=round(time.perf_counter() - start, 3))
+            return result
+        return self._failed(result, "too many 429 responses", self.max_attempts)
+
+    def _backoff(self, attempt):
+        # full jitter: spreads the retries of many requests that failed together
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+    def _failed(self, result, ex, attempt):
+        error = ex if isinstance(ex, str) else f"{type(ex).__name__}: {ex}"
+        self.stats.failed += 1
+        self.stats.errors[error] = self.stats.errors.get(error, 0) + 1
+        result.update(error=error, attempts=attempt)
+        return result
+
+
+def parse_answers(text, count):
+    """The answers list from the persona's JSON reply; the raw text as the only answer if it is not valid JSON."""
+    try:
+        start, end = text.index("{"), text.rindex("}") + 1
+        answers = json.loads(text[start:end])["answers"]
+        if isinstance(answers, list):
+            return [str(answer) for answer in answers[:count]]
+    except (ValueError, KeyError, TypeError):
+        pass
+    return [text]
+
+
+def async_openai_client(concurrency, api_version=None, azure_endpoint=None, **kwargs):
+    """An AsyncAzureOpenAI client without built-in retries, with a connection pool sized to `concurrency`.
+    Uses the shared Azure AD token provider unless an api_key is given."""
+    if "api_key" not in kwargs:
+        from shared.azure_clients import get_token_provider
+        kwargs["azure_ad_token_provider"] = get_token_provider()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    return openai.AsyncAzureOpenAI(
+        api_version=api_version or os.getenv("AOAI_API_VERSION"),
+        azure_endpoint=azure_endpoint or os.getenv("AOAI_API_BASE"),
+        max_retries=0,
+        http_client=httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(120.0, connect=10.0)),
+        **kwargs,
+    )
+
+
+async def run_survey(personas, topic, questions, output, rpm, tpm, model=None, concurrency=64, client=None, **options):
+    client = client or async_openai_client(concurrency)
+    survey = Survey(client, model or os.getenv("GPT_4o_mini_Model_Name"), topic, questions, rpm, tpm,
+                    concurrency=concurrency, **options)
+    try:
+        return await survey.run(personas, output)
+    finally:
+        await client.close()
+
+
+def main(argv=None):
+    from persona_store import as_personas, get_persona_store
+    from batch_focus_groups import load_products
+
+    parser = argparse.ArgumentParser(description="Send a questionnaire to every persona of a panel.")
+    parser.add_argument("--panel", help="panel of the persona library to survey (default: the whole library)")
+    parser.add_argument("--topic", required=True, help="product or topic description, or @file to read it from")
+    parser.add_argument("--questions", required=True, help="text file with one question per line, or a .json list")
+    parser.add_argument("--rpm", type=int, required=True, help="the deployment's requests-per-minute quota")
+    parser.add_argument("--tpm", type=int, required=True, help="the deployment's tokens-per-minute quota")
+    parser.add_argument("--concurrency", type=int, default=64, help="requests in flight at most")
+    parser.add_argument("--max-tokens", type=int, default=400)
+    parser.add_argument("--output", help="results file (default: docs/surveys/<panel>-<questionnaire hash>.jsonl); rerun to resume")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    store = get_persona_store()
+    personas = store.load_panel(args.panel) if args.panel else as_personas(store.iter())
+    topic = args.topic
+    if topic.startswith("@"):
+        with open(topic[1:], 'r', encoding='utf-8') as f:
+            topic = f.read()
+    questions = load_products(args.questions)
+    output = args.output or os.path.join(DEFAULT_OUTPUT, f"{args.panel or 'library'}-{questionnaire_id(topic, questions)}.jsonl")
+    stats = asyncio.run(run_survey(
+        personas, topic, questions, output, args.rpm, args.tpm,
+        concurrency=args.concurrency, max_tokens=args.max_tokens,
+    ))
+    print(json.dumps(asdict(stats), indent=2))
+    if stats.seconds:
+        print(f"{stats.requests / stats.seconds * 60:.0f} requests/min, "
+              f"{(stats.prompt_tokens + stats.completion_tokens) / stats.seconds * 60:.0f} tokens/min")
+    return 1 if stats.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
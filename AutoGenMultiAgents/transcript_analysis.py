@@ -0,0 +1,114 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from transcript_store import count_tokens
+
+ANALYSIS_PROMPT = "Analyze the focus group chat and provide a detailed summary and analysis of the discussion in markdown format. Chat: {chat}"
+
+MAP_PROMPT = """You are analyzing part {index} of {total} of a focus group chat.
+Summarize this part in markdown: the opinions each participant gave, the positive and negative aspects raised,
+the questions asked and any points of agreement or disagreement. Keep participant names. Chat: {chat}"""
+
+REDUCE_PROMPT = """The following are analyses of consecutive parts of one focus group chat.
+Merge them into a single detailed summary and analysis of the whole discussion in markdown format.
+Follow how opinions developed across the parts and do not repeat the same point twice. Partial analyses: {partials}"""
+
+
+def chunk_records(records, max_tokens):
+    """Split transcript records into consecutive chunks of at most max_tokens (a longer single record gets its own chunk)."""
+    chunks, chunk, chunk_tokens = [], [], 0
+    for record in records:
+        if chunk and chunk_tokens + record.tokens > max_tokens:
+            chunks.append(chunk)
+            chunk, chunk_tokens = [], 0
+        chunk.append(record)
+        chunk_tokens += record.tokens
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def _group_texts(texts, max_tokens):
+    groups, group, group_tokens = [], [], 0
+    for text in texts:
+        tokens = count_tokens(text)
+        if group and group_tokens + tokens > max_tokens:
+            groups.append(group)
+            group, group_tokens = [], 0
+        group.append(text)
+        group_tokens += tokens
+    if group:
+        groups.append(group)
+    return groups
+
+
+class TranscriptAnalyzer:
+    """Map-reduce analysis of a focus-group transcript.
+
+    The transcript is split into chunks of `chunk_tokens`, each chunk is summarized concurrently (at most
+    `max_workers` requests in flight), and the partial analyses are merged into the final analysis. If the
+    partial analyses themselves exceed `chunk_tokens` they are merged in several reduce passes.
+    `timings` holds the latency of each stage of the last run in seconds. With a `cache` (a CompletionCache),
+    chunks and merges that were analyzed before are not sent to the model again.
+    """
+
+    def __init__(self, client, model="gpt-4o-mini", chunk_tokens=6000, max_workers=4, temperature=0.7, cache=None):
+        self.client = client
+        self.cache = cache
+        self.model = model
+        self.chunk_tokens = chunk_tokens
+        self.max_workers = max_workers
+        self.temperature = temperature
+        self.timings = {}
+
+    def _complete(self, prompt):
+        params = dict(model=self.model, messages=[{"role": "system", "content": prompt}], temperature=self.temperature)
+        if self.cache is not None:
+            response = self.cache.chat_completion(self.client, **params)
+        else:
+            response = self.client.chat.completions.create(**params)
+        return response.choices[0].message.content
+
+    def analyze(self, records):
+        self.timings = {}
+        start = time.perf_counter()
+        chunks = chunk_records(records, self.chunk_tokens)
+        self.timings["split"] = time.perf_counter() - start
+        self.timings["chunks"] = len(chunks)
+        if not chunks:
+            return ""
+
+        texts = ["\n".join(record.to_text() for record in chunk) for chunk in chunks]
+        if len(texts) == 1:
+            # short transcript: one call, no reduce step
+            stage_start = time.perf_counter()
+            analysis = self._complete(ANALYSIS_PROMPT.format(chat=texts[0]))
+            self.timings["map"] = time.perf_counter() - stage_start
+            self.timings["reduce"] = 0.0
+            self.timings["total"] = time.perf_counter() - start
+            return analysis
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            stage_start = time.perf_counter()
+            prompts = [MAP_PROMPT.format(index=i + 1, total=len(texts), chat=text) for i, text in enumerate(texts)]
+            partials = list(pool.map(self._complete, prompts))
+            self.timings["map"] = time.perf_counter() - stage_start
+
+            stage_start = time.perf_counter()
+            reduce_passes = 0
+            while True:
+                reduce_passes += 1
+                groups = _group_texts(partials, self.chunk_tokens)
+                if len(groups) == len(partials):
+                    # every partial fills a chunk on its own; merge pairwise so each pass still shrinks the input
+                    groups = [partials[i:i + 2] for i in range(0, len(partials), 2)]
+                prompts = [REDUCE_PROMPT.format(partials="\n\n---\n\n".join(group)) for group in groups]
+                if len(prompts) == 1:
+                    analysis = self._complete(prompts[0])
+                    break
+                partials = list(pool.map(self._complete, prompts))
+            self.timings["reduce"] = time.perf_counter() - stage_start
+            self.timings["reduce_passes"] = reduce_passes
+
+        self.timings["total"] = time.perf_counter() - start
+        return analysis
@@ -0,0 +1,185 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+
+TRANSCRIPTS_DIR = os.path.join(os.path.dirname(__file__), 'docs', 'transcripts')
+
+# Byte offset of every INDEX_STRIDE-th record is kept so range reads can seek instead of scanning the file.
+INDEX_STRIDE = 256
+# Transcripts not written to for this long belong to ended sessions; see remove_idle()
+MAX_IDLE = 24 * 3600
+CLEANUP_INTERVAL = 600
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    # imported on the first count, not when a page that only stores transcripts loads
+    import tiktoken
+
+    return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text):
+    return len(_encoding().encode(text, disallowed_special=()))
+
+
+@dataclass
+class TranscriptRecord:
+    seq: int
+    speaker: str
+    timestamp: float
+    tokens: int
+    content: str
+
+    def to_text(self):
+        return f"**{self.speaker}**: {self.content}"
+
+
+class TranscriptStore:
+    """Transcript of one focus-group session, stored as JSONL at docs/transcripts/<session_id>.jsonl.
+
+    Appends are buffered and written in batches of `flush_every` records. Only the last `memory_limit`
+    records are kept in memory; older ones are read back from disk on demand.
+    """
+
+    def __init__(self, session_id, directory=TRANSCRIPTS_DIR, memory_limit=200, flush_every=20):
+        self.session_id = session_id
+        self.path = os.path.join(directory, f"{session_id}.jsonl")
+        self.flush_every = flush_every
+        self._recent = deque(maxlen=memory_limit)
+        self._pending = []
+        self._offsets = []
+        self._count = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.path):
+            self._load_index()
+
+    def __len__(self):
+        return self._count
+
+    def _load_index(self):
+        offset = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if self._count % INDEX_STRIDE == 0:
+                    self._offsets.append(offset)
+                self._recent.append(TranscriptRecord(**json.loads(line)))
+                self._count += 1
+                offset += len(line)
+
+    def append(self, speaker, content):
+        with self._lock:
+            record = TranscriptRecord(
+                seq=self._count,
+                speaker=speaker,
+                timestamp=time.time(),
+                tokens=count_tokens(content),
+                content=content,
+            )
+            self._count += 1
+            self._recent.append(record)
+            self._pending.append(record)
+            if len(self._pending) >= self.flush_every:
+                self._flush()
+        return record
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        with open(self.path, 'ab') as f:
+            offset = f.tell()
+            for record in self._pending:
+                line = (json.dumps(asdict(record), ensure_ascii=False) + "\n").encode('utf-8')
+                if record.seq % INDEX_STRIDE == 0:
+                    self._offsets.append(offset)
+                f.write(line)
+                offset += len(line)
+        self._pending.clear()
+
+    def read(self, start=0, stop=None):
+        """Return records[start:stop], from memory when the range is still in the ring buffer."""
+        with self._lock:
+            stop = self._count if stop is None else min(stop, self._count)
+            if start >= stop:
+                return []
+            first_in_memory = self._count - len(self._recent)
+            if start >= first_in_memory:
+                return list(self._recent)[start - first_in_memory:stop - first_in_memory]
+            self._flush()
+            return list(self._read_from_disk(start, stop))
+
+    def _read_from_disk(self, start, stop):
+        block = start // INDEX_STRIDE
+        seq = block * INDEX_STRIDE
+        with open(self.path, 'rb') as f:
+            f.seek(self._offsets[block])
+            for line in f:
+                if seq >= stop:
+                    break
+                if seq >= start:
+                    yield TranscriptRecord(**json.loads(line))
+                seq += 1
+
+    def iter_records(self, start=0, stop=None, batch_size=INDEX_STRIDE):
+        stop = len(self) if stop is None else stop
+        for batch_start in range(start, stop, batch_size):
+            yield from self.read(batch_start, min(batch_start + batch_size, stop))
+
+    def to_text(self, start=0, stop=None):
+        return "\n".join(record.to_text() for record in self.iter_records(start, stop))
+
+    def total_tokens(self):
+        return sum(record.tokens for record in self.iter_records())
+
+    def clear(self):
+        with self._lock:
+            self._recent.clear()
+            self._pending.clear()
+            self._offsets.clear()
+            self._count = 0
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+def remove_idle(directory=TRANSCRIPTS_DIR, max_idle=MAX_IDLE):
+    """Delete the transcripts in `directory` not written to for `max_idle` seconds. Returns how many were removed."""
+    removed = 0
+    cutoff = time.time() - max_idle
+    for entry in os.scandir(directory):
+        try:
+            if entry.name.endswith(".jsonl") and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            # removed by another process's cleanup
+            pass
+    return removed
+
+
+_last_cleanup = 0.0
+_cleanup_lock = threading.Lock()
+
+
+def maybe_remove_idle(directory=TRANSCRIPTS_DIR):
+    """Run remove_idle() in the background if the last run was more than CLEANUP_INTERVAL seconds ago."""
+    global _last_cleanup
+    if time.time() - _last_cleanup >= CLEANUP_INTERVAL and _cleanup_lock.acquire(blocking=False):
+        _last_cleanup = time.time()
+
+        def cleanup():
+            try:
+                if os.path.isdir(directory):
+                    remove_idle(directory)
+            finally:
+                _cleanup_lock.release()
+
+        threading.Thread(target=cleanup, daemon=True).start()
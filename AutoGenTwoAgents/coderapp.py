@@ -1,18 +1,25 @@
 import tempfile
 import asyncio
 import streamlit as st
-from autogen import ConversableAgent, AssistantAgent, UserProxyAgent, register_function
-from autogen.coding import DockerCommandLineCodeExecutor
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 from datetime import datetime
 from io import StringIO
 import os
-
-# Initialize the DefaultAzureCredential
+import sys
+import uuid
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_profile import format_profile, profile_file
+from execution_cache import CachingCodeExecutor
+from executor_pool import get_executor_pool
+from workdir_manager import get_workdir_manager
+from shared.azure_clients import get_http_client, get_token_provider
+from shared.completion_cache import get_completion_cache
+from shared.session_loop import get_session_loop
+from shared.streaming import streamlit_iostream, track_speaker
+
+# The DefaultAzureCredential token provider and HTTP connection pool are shared by all apps in the process
 # This will be used to authenticate rather than use a key directly
-token_provider = get_bearer_token_provider(
-    DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default"
-)
+token_provider = get_token_provider()
 
 # Our configuration for the LLM model. 
 # You will need to provide the model, the base url which you can find from your Azure resource, the api type, the api version, the max tokens, and the token provider. 
@@ -24,34 +31,57 @@ llm_config = {
             "api_type": "azure",
             "api_version": "2024-02-01",
             "max_tokens": 2000,
-            "azure_ad_token_provider": token_provider
+            "azure_ad_token_provider": token_provider,
+            "http_client": get_http_client(),
         }
     ],
     "temperature": 0, 
+    "stream": True,
+    # identical requests are answered from the shared on-disk completion cache
+    "cache": get_completion_cache("coderapp"),
 }
 
-# # Create a temporary directory to store the code files.
-# temp_dir = tempfile.TemporaryDirectory()
-
-# Create a Docker command line code executor.
-executor = DockerCommandLineCodeExecutor(
+# Every session works in its own directory below work_dir; uploads are stored once and linked into it
+workdir_manager = get_workdir_manager("work_dir")
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+session_work_dir = workdir_manager.session_dir(st.session_state.session_id)
+
+# Code runs on a process-wide pool of warm workers instead of a new Docker container per chat:
+# "docker" keeps containers running, "local" keeps Python processes with numpy and pandas imported
+# and forks each code block from them. Workers that time out or crash are replaced.
+# The backend is server configuration, not a page setting: "local" runs generated code unsandboxed on this host.
+executor_backend = os.getenv("CODE_EXECUTOR_BACKEND", "docker")
+st.sidebar.caption(f"Code execution backend: {executor_backend}")
+executor_pool = get_executor_pool(
+    executor_backend,
+    size=int(os.getenv("CODE_EXECUTOR_WORKERS", "2")),
     image="python:3.12-slim",  # Execute code using the given docker image name.
     timeout=10,  # Timeout for each code execution in seconds.
-    work_dir="work_dir",  # Use the temporary directory to store the code files.
+    work_dir="work_dir",
 )
+# one executor per session, so its timings are this session's
+executor_key = f"code_executor_{executor_backend}"
+if executor_key not in st.session_state:
+    st.session_state[executor_key] = executor_pool.executor(work_dir=session_work_dir)
+executor = st.session_state[executor_key]
+# Re-running the same deterministic code on the same input files returns the stored output and files
+reuse_results = st.sidebar.checkbox("Reuse results of identical code runs", value=True)
+# kept with the session's executor, so input files are only re-hashed when they change, not on every rerun
+caching_key = f"caching_executor_{executor_backend}"
+if caching_key not in st.session_state:
+    st.session_state[caching_key] = CachingCodeExecutor(
+        executor,
+        work_dir=session_work_dir,
+        environment="docker:python:3.12-slim" if executor_backend == "docker" else f"local:{sys.version}",
+    )
+caching_executor = st.session_state[caching_key]
+caching_executor.enabled = reuse_results
 
 # define function to get today's date as string format MMMM DD, YYYY
 def get_today_date() -> str:
     return datetime.today().strftime("%B %d, %Y")
 
-# We will create a class that extends the ConversableAgent class to track the messages sent by the agent 
-# so we can tap it into the Streamlit chat messages.
-class TrackableConversableAgent(ConversableAgent):        
-    def _process_received_message(self, message, sender, silent):
-        with st.chat_message(sender.name):
-            st.markdown(message)
-        return super()._process_received_message(message, sender, silent)
-
 # Set the title of the app
 st.title("2 Agents Chat App with coding capability")
 
@@ -61,10 +91,11 @@ st.markdown(f"""#### You can chat with the AI assistant and the user proxy agent
 st.markdown(f"""##### Optionally, you can upload a file from local (by clicking on the file upload element below) to reference in your task assignment.""")
 st.markdown(f"""##### The user proxy agent will use the uploaded file to ground the task solving process. Delete the file from the work directory by clicking on the *Clear work directory* button below.""")
 
-# Create a function to clear the work directory
+# Create a function to clear this session's work directory; other sessions keep their files
 def clear_work_dir():
-    for file in os.listdir("work_dir"):
-        os.remove(os.path.join("work_dir", file))
+    workdir_manager.clear(st.session_state.session_id)
+    st.session_state.pop("saved_upload", None)
+    st.session_state.pop("upload_profile", None)
     return st.success("Work directory cleared.")
 # Create a button to clear the work directory
 if st.button("Clear work directory"):
@@ -72,8 +103,16 @@ if st.button("Clear work directory"):
 
 
 def save_uploaded_file(uploadedfile):
-  with open(os.path.join("work_dir",uploadedfile.name),"wb") as f:
-     f.write(uploadedfile.getbuffer())
+  # streamed to disk in chunks; a file another session already uploaded is linked, not stored again
+  upload_id = getattr(uploadedfile, "file_id", uploadedfile.name)
+  if st.session_state.get("saved_upload") != upload_id:
+     uploadedfile.seek(0)
+     path, _ = workdir_manager.save_upload(st.session_state.session_id, uploadedfile, uploadedfile.name)
+     st.session_state.saved_upload = upload_id
+     # profile the file locally once, so the agent does not spend turns printing head(), dtypes and shapes
+     with st.spinner("Profiling the uploaded file..."):
+        profile = profile_file(path)
+     st.session_state.upload_profile = format_profile(profile) if profile else None
   return st.success("Saved file :{} in work_dir".format(uploadedfile.name))
 
 uploaded_file = st.file_uploader("Choose a file to upload to work directory")
@@ -81,16 +120,39 @@ if uploaded_file:
     additional_instructions = f"use only the uploaded local file {uploaded_file.name} for the task"
     # Apply Function here
     save_uploaded_file(uploaded_file)
+    if st.session_state.get("upload_profile"):
+        with st.expander("Data profile given to the agent"):
+            st.text(st.session_state.upload_profile)
+        additional_instructions += (
+            ". The file has already been profiled; use this profile instead of writing code to inspect its "
+            f"structure:\n{st.session_state.upload_profile}"
+        )
 else:
     additional_instructions = ""
 
-# Create a code executor agent that uses docker to execute the code from code writer and surface back the result
-code_executor_agent = TrackableConversableAgent(
-    "code_executor",
-    llm_config=False,  # Turn off LLM for this agent.
-    code_execution_config={"executor": executor},  # Use the docker command line code executor.
-    human_input_mode="NEVER",  # Always take human input for this agent for safety.
-)
+def build_agents():
+    # autogen is imported here, on the first chat, so the page renders before the agent framework is loaded
+    from trackable_agents import TrackableConversableAgent
+
+    # Create a code executor agent that uses docker to execute the code from code writer and surface back the result
+    code_executor_agent = TrackableConversableAgent(
+        "code_executor",
+        llm_config=False,  # Turn off LLM for this agent.
+        code_execution_config={"executor": caching_executor},  # Use the pooled code executor, behind the execution cache.
+        human_input_mode="NEVER",  # Always take human input for this agent for safety.
+    )
+
+    # Create a code writer agent that will be used to solve the tasks by writing code 
+    code_writer_agent = TrackableConversableAgent(
+        "code_writer_agent",
+        system_message=code_writer_system_message,
+        llm_config=llm_config,
+        code_execution_config=False,  # Turn off code execution for this agent.
+        max_consecutive_auto_reply=20,
+        human_input_mode="NEVER",
+    )
+    track_speaker(code_writer_agent)
+    return code_executor_agent, code_writer_agent
 
 code_writer_system_message=f"""You are a helpful AI assistant and today is {get_today_date()}.
             Solve tasks using your coding and language skills.
@@ -115,19 +177,18 @@ code_writer_system_message=f"""You are a helpful AI assistant and today is {get_
             {additional_instructions}
             Reply \"TERMINATE\" in the end when everything is done."""
 
-# Create a code writer agent that will be used to solve the tasks by writing code 
-code_writer_agent = TrackableConversableAgent(
-    "code_writer_agent",
-    system_message=code_writer_system_message,
-    llm_config=llm_config,
-    code_execution_config=False,  # Turn off code execution for this agent.
-    max_consecutive_auto_reply=20,
-    human_input_mode="NEVER",
-)
 if 'chat_initiated' not in st.session_state:
     st.session_state.chat_initiated = False
 
 chat_result = None
+session_loop = get_session_loop(st.session_state)
+
+def stop_chat():
+    session_loop.cancel()
+    st.session_state.chat_stopped = True
+
+if st.session_state.pop("chat_stopped", False):
+    st.info("Chat stopped.")
 
 # Creating a Streamlit container to hold the chat messages and the input 
 with st.container():
@@ -136,23 +197,33 @@ with st.container():
     user_input = st.chat_input("Give me a task...")
     # If the user input is not empty, we will initiate the chat
     if user_input:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        executor.timings.clear()
+        # the chat runs on the session's event loop; Stop (or any other interaction) cancels it
+        st.button("Stop", on_click=stop_chat)
+        status = st.empty()
+        code_executor_agent, code_writer_agent = build_agents()
 
         async def initiate_chat():
             try:
-                chat_result = code_executor_agent.initiate_chat(
-                    code_writer_agent,
-                    message=user_input,
-                    max_consecutive_auto_reply=10,
-                    is_termination_msg=lambda x: x.get("content", "").strip().endswith("TERMINATE"),
-                )
+                with streamlit_iostream():
+                    return await code_executor_agent.a_initiate_chat(
+                        code_writer_agent,
+                        message=user_input,
+                        max_consecutive_auto_reply=10,
+                        is_termination_msg=lambda x: x.get("content", "").strip().endswith("TERMINATE"),
+                    )
             except Exception as e:
                 st.error(f"An error occurred: {e}")
-        
-        loop.run_until_complete(initiate_chat())
-        loop.close()
-        executor.stop()
+
+        try:
+            chat_result = session_loop.run(initiate_chat(), status=status)
+        finally:
+            # the session's worker goes back to the pool between chats
+            executor.release()
+        if executor.timings:
+            queued = sum(timing["queue_seconds"] for timing in executor.timings)
+            ran = sum(timing["run_seconds"] for timing in executor.timings)
+            st.caption(f"Code execution: {len(executor.timings)} run(s), {queued:.2f}s waiting for a worker, {ran:.2f}s running.")
 
 if st.session_state.chat_initiated:
     st.write(chat_result)
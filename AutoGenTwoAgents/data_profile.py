@@ -0,0 +1,233 @@
+import csv
+import os
+from collections import Counter
+
+CHUNK_ROWS = 100_000
+# Distinct values tracked per column for top-k; beyond this the counts are approximate
+MAX_TRACKED = 10_000
+FORMATS = {".csv": "csv", ".tsv": "csv", ".txt": "csv", ".parquet": "parquet", ".pq": "parquet",
+           ".json": "json", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+
+class _Column:
+    def __init__(self, name):
+        self.name = name
+        self.dtypes = []
+        self.count = 0
+        self.nulls = 0
+        self.min = None
+        self.max = None
+        self.total = 0.0
+        self.numeric = True
+        self.ordered = True
+        self.values = Counter()
+        self.truncated = False
+
+    def update(self, series):
+        import pandas as pd
+
+        dtype = str(series.dtype)
+        if dtype not in self.dtypes:
+            self.dtypes.append(dtype)
+        self.count += len(series)
+        values = series.dropna()
+        self.nulls += len(series) - len(values)
+        if values.empty:
+            return
+        self.numeric = self.numeric and pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values)
+        try:
+            if self.ordered:
+                low, high = values.min(), values.max()
+                self.min = low if self.min is None else min(self.min, low)
+                self.max = high if self.max is None else max(self.max, high)
+        except TypeError:
+            # mixed types in an object column have no order
+            self.ordered = False
+            self.min = self.max = None
+        if self.numeric:
+            self.total += float(values.sum())
+        if self.truncated:
+            # mostly unique values (ids, timestamps, measurements) have no meaningful top-k; stop counting them
+            return
+        try:
+            self.values.update(values.value_counts().to_dict())
+        except TypeError:
+            # unhashable values such as nested JSON lists
+            self.values.update(values.astype(str).value_counts().to_dict())
+        if len(self.values) > MAX_TRACKED:
+            self.values = Counter()
+            self.truncated = True
+
+    def summary(self, top_k):
+        non_null = self.count - self.nulls
+        summary = {
+            "name": str(self.name),
+            "dtype": "/".join(self.dtypes),
+            "null_rate": round(self.nulls / self.count, 4) if self.count else 0.0,
+            "min": _plain(self.min),
+            "max": _plain(self.max),
+            "distinct": MAX_TRACKED if self.truncated else len(self.values),
+            "distinct_exact": not self.truncated,
+            "top": [[_plain(value), count] for value, count in self.values.most_common(top_k)],
+        }
+        if self.numeric and non_null:
+            summary["mean"] = round(self.total / non_null, 6)
+        return summary
+
+
+def _plain(value):
+    if value is None:
+        return None
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, (int, float, bool, str)):
+        return value
+    return str(value)
+
+
+def detect_format(path):
+    return FORMATS.get(os.path.splitext(path)[1].lower())
+
+
+def _csv_chunks(path, chunk_rows):
+    import pandas as pd
+
+    with open(path, newline='', encoding='utf-8', errors='replace') as f:
+        head = f.read(64 * 1024)
+    try:
+        delimiter = csv.Sniffer().sniff(head, delimiters=",;\t|").delimiter
+    except csv.Error:
+        delimiter = "\t" if path.lower().endswith(".tsv") else ","
+    return pd.read_csv(path, sep=delimiter, chunksize=chunk_rows, low_memory=False, encoding_errors='replace')
+
+
+def _parquet_chunks(path, chunk_rows):
+    import pyarrow.parquet as pq
+
+    parquet = pq.ParquetFile(path, memory_map=True)
+    for batch in parquet.iter_batches(batch_size=chunk_rows):
+        yield batch.to_pandas()
+
+
+def _json_chunks(path, chunk_rows, lines):
+    import pandas as pd
+
+    if not lines:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            first = f.read(1024).lstrip()[:1]
+        # a file of one JSON object per line also often ends in .json
+        lines = first == "{"
+    if lines:
+        try:
+            yield from pd.read_json(path, lines=True, chunksize=chunk_rows)
+            return
+        except ValueError:
+            pass
+    # a single JSON document has to be read whole
+    yield pd.read_json(path)
+
+
+def profile_file(path, fmt=None, top_k=5, sample_rows=5, max_rows=5_000_000, chunk_rows=CHUNK_ROWS):
+    """Schema, row count, null rates, per-column min/max/mean/top-k and a sample of a CSV, Parquet or JSON file.
+
+    The file is read in chunks of `chunk_rows` (Parquet memory-mapped), so memory stays bounded by the chunk size
+    and MAX_TRACKED distinct values per column. Statistics cover the first `max_rows` rows. Returns None for files
+    in other formats or that cannot be parsed. pandas is imported on the first profile, not with coderapp.
+    """
+    import pandas as pd
+
+    fmt = fmt or detect_format(path)
+    if fmt is None:
+        return None
+    chunks = {
+        "csv": lambda: _csv_chunks(path, chunk_rows),
+        "parquet": lambda: _parquet_chunks(path, chunk_rows),
+        "json": lambda: _json_chunks(path, chunk_rows, lines=False),
+        "jsonl": lambda: _json_chunks(path, chunk_rows, lines=True),
+    }[fmt]
+
+    columns, sample, rows, complete = {}, None, 0, True
+    try:
+        for chunk in chunks():
+            if rows >= max_rows:
+                complete = False
+                break
+            chunk = chunk.iloc[:max_rows - rows]
+            if sample is None:
+                sample = chunk.head(sample_rows)
+            for name in chunk.columns:
+                if name not in columns:
+                    columns[name] = _Column(name)
+                columns[name].update(chunk[name])
+            rows += len(chunk)
+    except (ValueError, UnicodeError, pd.errors.ParserError, OSError):
+        if not columns:
+            return None
+        complete = False
+
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        # the row count is in the footer, whether or not every row was read
+        total_rows = pq.ParquetFile(path, memory_map=True).metadata.num_rows
+    else:
+        total_rows = rows
+    return {
+        "file": os.path.basename(path),
+        "format": fmt,
+        "bytes": os.path.getsize(path),
+        "rows": total_rows,
+        "rows_exact": complete or fmt == "parquet",
+        "rows_profiled": rows,
+        "complete": complete and rows == total_rows,
+        "columns": [column.summary(top_k) for column in columns.values()],
+        "sample": sample.to_dict(orient="records") if sample is not None else [],
+    }
+
+
+def _short(value, width=40):
+    text = f"{value:.6g}" if isinstance(value, float) else str(value)
+    return text if len(text) <= width else text[:width - 3] + "..."
+
+
+def format_profile(profile, max_columns=60, max_top_distinct=50):
+    """Compact plain-text rendering of a profile_file() result for a system message."""
+    rows = f"{profile['rows']:,} rows" if profile["rows_exact"] else f"at least {profile['rows']:,} rows"
+    if not profile["complete"]:
+        rows += f"; statistics cover the first {profile['rows_profiled']:,}"
+    lines = [f"Profile of {profile['file']} ({profile['format']}, {rows}, {len(profile['columns'])} columns):"]
+    for column in profile["columns"][:max_columns]:
+        parts = [f"nulls {column['null_rate']:.1%}"]
+        if column["min"] is not None:
+            parts.append(f"min {_short(column['min'])}, max {_short(column['max'])}")
+        if "mean" in column:
+            parts.append(f"mean {column['mean']:.6g}")
+        distinct = f"{column['distinct']:,}" if column["distinct_exact"] else f"over {column['distinct']:,}"
+        parts.append(f"{distinct} distinct")
+        # the most frequent values of a column of mostly unique values say nothing
+        if column["top"] and column["distinct_exact"] and column["distinct"] <= max_top_distinct:
+            parts.append("top " + ", ".join(f"{_short(value, 30)} ({count})" for value, count in column["top"]))
+        lines.append(f"- {column['name']} ({column['dtype']}): " + "; ".join(parts))
+    if len(profile["columns"]) > max_columns:
+        lines.append(f"- ... and {len(profile['columns']) - max_columns} more columns")
+    if profile["sample"]:
+        names = list(profile["sample"][0])[:max_columns]
+        lines.append(f"First {len(profile['sample'])} rows:")
+        lines.append(" | ".join(_short(name, 20) for name in names))
+        for record in profile["sample"]:
+            lines.append(" | ".join(_short(record[name], 20) for name in names))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Profile a CSV, Parquet or JSON file the way coderapp does on upload.")
+    parser.add_argument("path")
+    parser.add_argument("--json", action="store_true", help="print the full profile as JSON")
+    args = parser.parse_args()
+    result = profile_file(args.path)
+    if result is None:
+        raise SystemExit(f"cannot profile {args.path}")
+    print(json.dumps(result, indent=2, default=str) if args.json else format_profile(result))
@@ -0,0 +1,254 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+DEFAULT_PATH = os.getenv(
+    "EXECUTION_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "executions.sqlite"),
+)
+
+# A code block containing this comment is always executed
+OPT_OUT = "# execution-cache: off"
+# Code whose output depends on more than its source and input files: calls to the clock or a random generator,
+# the network, subprocesses, package installs or the machine it runs on. It is executed every time unless it fixes
+# this itself. Only calls and imports count, so a "date" column or parse_dates= does not make code uncacheable.
+NONDETERMINISTIC = re.compile(
+    r"\b(import|from)\s+(random|uuid|secrets|requests|urllib|httpx|aiohttp|socket|yfinance|platform|subprocess)\b"
+    r"|(?<![\w.])(random|uuid|secrets|platform|socket|subprocess|requests|urllib|httpx|aiohttp|yfinance)\.\w"
+    r"|\b(np|numpy)\.random\.(?!default_rng\(\s*[^)\s])"
+    r"|\b(datetime\.(now|today|utcnow)|date\.today|Timestamp\.(now|today)|time\.(time|time_ns|monotonic)"
+    r"|perf_counter|os\.(urandom|getpid|uname|system|popen)|default_rng\(\s*)\s*\("
+    r"|\bto_datetime\(\s*['\"](now|today)['\"]"
+    r"|\.sample\((?![^)]*random_state)"
+    r"|https?://|\bpip3?\s+install\b"
+)
+# The same for shell blocks: commands whose output depends on the clock, the network or the machine
+SHELL_NONDETERMINISTIC = re.compile(r"(^|[;&|`(]|\$\()\s*(curl|wget|pip3?|date|hostname|uname|shuf)\b", re.MULTILINE)
+SHELLS = ("bash", "shell", "sh")
+# Code files the executors write into work_dir; not inputs or artifacts
+CODE_FILE = re.compile(r"^tmp_code_[0-9a-f]{32}\.\w+$")
+
+
+def execution_key(blocks, environment, inputs):
+    """Hash of the code blocks (language and code), the execution environment and the input files' content hashes."""
+    payload = {
+        "blocks": [[block.language.lower(), block.code.strip()] for block in blocks],
+        "environment": environment,
+        "inputs": sorted(inputs.items()),
+    }
+    return hashlib.sha256(json.dumps(payload).encode('utf-8')).hexdigest()
+
+
+def cacheable(blocks):
+    return not any(
+        OPT_OUT in block.code or NONDETERMINISTIC.search(block.code)
+        or (block.language.lower() in SHELLS and SHELL_NONDETERMINISTIC.search(block.code))
+        for block in blocks
+    )
+
+
+class ExecutionCache:
+    """Disk-backed store of code execution results: exit code, output and the files the code created or changed.
+
+    SQLite in WAL mode with one connection per thread, like the completion cache; the least recently used entries
+    are evicted when the stored outputs and artifacts exceed `max_bytes`.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connect().executescript("""
+            CREATE TABLE IF NOT EXISTS executions (
+                key TEXT PRIMARY KEY, exit_code INTEGER NOT NULL, output TEXT NOT NULL, seconds REAL NOT NULL,
+                size INTEGER NOT NULL, last_access REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS executions_last_access ON executions (last_access);
+            CREATE TABLE IF NOT EXISTS artifacts (
+                key TEXT NOT NULL REFERENCES executions(key) ON DELETE CASCADE, name TEXT NOT NULL,
+                content BLOB NOT NULL, PRIMARY KEY (key, name));
+            CREATE TABLE IF NOT EXISTS stats (
+                id INTEGER PRIMARY KEY CHECK (id = 0), hits INTEGER NOT NULL, misses INTEGER NOT NULL,
+                skipped INTEGER NOT NULL, saved_seconds REAL NOT NULL);
+            INSERT OR IGNORE INTO stats VALUES (0, 0, 0, 0, 0.0);
+        """)
+
+    def _connect(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("PRAGMA foreign_keys=ON")
+            self._local.db = db
+        return db
+
+    def count(self, hits=0, misses=0, skipped=0, saved_seconds=0.0):
+        self._connect().execute(
+            "UPDATE stats SET hits = hits + ?, misses = misses + ?, skipped = skipped + ?, saved_seconds = saved_seconds + ?",
+            (hits, misses, skipped, saved_seconds),
+        )
+
+    def get(self, key):
+        """(exit code, output, {artifact name: bytes}, seconds the original run took), or None."""
+        db = self._connect()
+        row = db.execute("SELECT exit_code, output, seconds FROM executions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        db.execute("UPDATE executions SET last_access = ? WHERE key = ?", (time.time(), key))
+        artifacts = dict(db.execute("SELECT name, content FROM artifacts WHERE key = ?", (key,)).fetchall())
+        return row[0], row[1], artifacts, row[2]
+
+    def set(self, key, exit_code, output, artifacts, seconds):
+        size = len(output) + sum(len(content) for content in artifacts.values())
+        if size > self.max_bytes // 10:
+            return
+        db = self._connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("DELETE FROM executions WHERE key = ?", (key,))
+            db.execute(
+                "INSERT INTO executions (key, exit_code, output, seconds, size, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, exit_code, output, seconds, size, time.time()),
+            )
+            db.executemany("INSERT INTO artifacts (key, name, content) VALUES (?, ?, ?)",
+                           [(key, name, content) for name, content in artifacts.items()])
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        self._evict(db)
+
+    def _evict(self, db):
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM executions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - int(self.max_bytes * 0.9)
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            freed = 0
+            for key, size in db.execute("SELECT key, size FROM executions ORDER BY last_access").fetchall():
+                if freed >= excess:
+                    break
+                db.execute("DELETE FROM executions WHERE key = ?", (key,))
+                freed += size
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    def stats(self):
+        hits, misses, skipped, saved = self._connect().execute(
+            "SELECT hits, misses, skipped, saved_seconds FROM stats"
+        ).fetchone()
+        return {
+            "hits": hits,
+            "misses": misses,
+            "skipped_nondeterministic": skipped,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "saved_seconds": round(saved, 2),
+        }
+
+
+class CachingCodeExecutor:
+    """autogen CodeExecutor that answers repeated executions of deterministic code from an ExecutionCache.
+
+    The key covers the code blocks, `environment` (e.g. the Docker image) and the content of every work_dir file
+    whose name appears in the code, which stands in for the files it reads. On a hit, the stored output and exit
+    code are returned and the files the original run created or changed are written back to work_dir. Code that
+    looks nondeterministic (see NONDETERMINISTIC), contains OPT_OUT, timed out or crashed is never cached.
+    """
+
+    def __init__(self, executor, work_dir, environment, cache=None, enabled=True):
+        self.executor = executor
+        self.work_dir = os.path.abspath(work_dir)
+        self.environment = environment
+        self.cache = cache or get_execution_cache()
+        self.enabled = enabled
+        self._hashes = {}
+
+    @property
+    def code_extractor(self):
+        return self.executor.code_extractor
+
+    def restart(self):
+        self.executor.restart()
+
+    def _files(self):
+        files = {}
+        for entry in os.scandir(self.work_dir):
+            if entry.is_file() and not entry.name.startswith(".") and not CODE_FILE.match(entry.name):
+                stat = entry.stat()
+                files[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def _hash(self, name, signature):
+        # files are only re-hashed when their mtime or size changes
+        cached = self._hashes.get(name)
+        if cached and cached[0] == signature:
+            return cached[1]
+        digest = hashlib.sha256()
+        with open(os.path.join(self.work_dir, name), 'rb') as f:
+            # chunked rather than hashlib.file_digest, which needs Python 3.11
+            while chunk := f.read(1024 * 1024):
+                digest.update(chunk)
+        digest = digest.hexdigest()
+        self._hashes[name] = (signature, digest)
+        return digest
+
+    def execute_code_blocks(self, code_blocks):
+        if not self.enabled:
+            return self.executor.execute_code_blocks(code_blocks)
+        if not cacheable(code_blocks):
+            self.cache.count(skipped=1)
+            return self.executor.execute_code_blocks(code_blocks)
+
+        before = self._files()
+        code = "\n".join(block.code for block in code_blocks)
+        inputs = {name: self._hash(name, signature) for name, signature in before.items() if name in code}
+        key = execution_key(code_blocks, self.environment, inputs)
+        cached = self.cache.get(key)
+        if cached is not None:
+            exit_code, output, artifacts, seconds = cached
+            for name, content in artifacts.items():
+                path = os.path.join(self.work_dir, name)
+                if os.path.islink(path):
+                    # an upload linked to its read-only blob; replace the link rather than write through it
+                    os.remove(path)
+                with open(path, 'wb') as f:
+                    f.write(content)
+            self.cache.count(hits=1, saved_seconds=seconds)
+            from autogen.coding.base import CommandLineCodeResult
+
+            return CommandLineCodeResult(exit_code=exit_code, output=output)
+
+        start = time.perf_counter()
+        result = self.executor.execute_code_blocks(code_blocks)
+        seconds = time.perf_counter() - start
+        self.cache.count(misses=1)
+        # 124 is a timeout; negative codes are crashes: children killed by a signal, or a crashed pool worker
+        if 0 <= result.exit_code != 124:
+            artifacts = {}
+            for name, signature in self._files().items():
+                if before.get(name) != signature:
+                    with open(os.path.join(self.work_dir, name), 'rb') as f:
+                        artifacts[name] = f.read()
+            self.cache.set(key, result.exit_code, result.output, artifacts, seconds)
+        return result
+
+
+_cache = None
+_lock = threading.Lock()
+
+
+def get_execution_cache():
+    """The process-wide ExecutionCache."""
+    global _cache
+    with _lock:
+        if _cache is None:
+            _cache = ExecutionCache()
+        return _cache
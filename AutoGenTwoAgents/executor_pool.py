@@ -0,0 +1,486 @@
+"""Pool of warm code-execution workers shared by all coderapp sessions.
+
+Two backends:
+- "local": each worker is a long-lived Python process with numpy and pandas already imported. Every code block
+  runs in a child forked from it (forkserver-style), so it starts in milliseconds with the imports done, and
+  still cannot change the worker's state. Needs os.fork; elsewhere blocks run as plain subprocesses.
+- "docker": each worker is a running DockerCommandLineCodeExecutor container.
+
+Workers are created up front and leased to a session: a session's executor takes a worker on its first code block
+and keeps it for the rest of its chat, so all of a task's blocks run on one warm worker, and gives it back when the
+chat ends (release()) or after `lease_idle` seconds without code. A worker whose code timed out or whose process
+crashed is replaced; other errors leave it in service. Every execution records how long it waited for a worker
+(queue time, zero while the session holds its lease) and how long it ran (run time).
+"""
+import json
+import os
+import queue
+import select
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from collections import deque
+from hashlib import md5
+from pathlib import Path
+
+
+PRELOAD = ("numpy", "pandas")
+# Exit code of a result whose worker crashed; negative like a child killed by a signal, so it is never cached
+CRASHED_EXIT_CODE = -1
+SHELLS = ("bash", "shell", "sh")
+
+
+def _run_child(lang, path, output_path):
+    # in the forked child: own process group (so a timeout kills everything it started), output to a file
+    os.setpgrp()
+    fd = os.open(output_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    os.dup2(fd, 1)
+    os.dup2(fd, 2)
+    if lang != "python":
+        os.execvp("sh", ["sh", path])
+    import runpy
+    code = 0
+    try:
+        sys.argv = [path]
+        runpy.run_path(path, run_name="__main__")
+    except SystemExit as ex:
+        code = ex.code if isinstance(ex.code, int) else (0 if ex.code is None else 1)
+        if not isinstance(ex.code, int) and ex.code is not None:
+            print(ex.code, file=sys.stderr)
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(code)
+
+
+def _wait(pid, timeout):
+    """Exit code of a child, or None (after killing its process group) if it outlives `timeout` seconds."""
+    deadline = time.monotonic() + timeout
+    delay = 0.001
+    while True:
+        done, status = os.waitpid(pid, os.WNOHANG)
+        if done:
+            return os.waitstatus_to_exitcode(status)
+        if time.monotonic() >= deadline:
+            try:
+                os.killpg(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            os.waitpid(pid, 0)
+            return None
+        time.sleep(delay)
+        delay = min(delay * 2, 0.02)
+
+
+def _zygote(preload):
+    """Main loop of a local worker process: import `preload` once, then fork one child per code block.
+
+    Requests and answers are JSON lines on the worker's stdin and original stdout; fd 1 itself is pointed at
+    stderr, so nothing the preloaded modules print can corrupt the protocol.
+    """
+    answers = os.fdopen(os.dup(1), 'w')
+    os.dup2(2, 1)
+    for module in preload:
+        try:
+            __import__(module)
+        except ImportError:
+            pass
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    answers.write("ready\n")
+    answers.flush()
+    for line in sys.stdin:
+        lang, path, output_path, work_dir, timeout = json.loads(line)
+        pid = os.fork()
+        if pid == 0:
+            try:
+                os.chdir(work_dir)
+                _run_child(lang, path, output_path)
+            finally:
+                os._exit(1)
+        answers.write(json.dumps(_wait(pid, timeout)) + "\n")
+        answers.flush()
+
+
+class WorkerCrashed(Exception):
+    pass
+
+
+def _execute_blocks(code_blocks, work_dir, run):
+    """Write each code block to a file in work_dir and run it with run(lang, path, work_dir), until one fails."""
+    # autogen is imported on first use: the app page and the --worker processes load faster without it
+    from autogen.code_utils import PYTHON_VARIANTS, TIMEOUT_MSG
+    from autogen.coding import LocalCommandLineCodeExecutor
+    from autogen.coding.base import CommandLineCodeResult
+    from autogen.coding.utils import _get_file_name_from_content, silence_pip
+
+    logs, exit_code, code_files = "", 0, []
+    for block in code_blocks:
+        lang = block.language.lower()
+        LocalCommandLineCodeExecutor.sanitize_command(lang, block.code)
+        code = silence_pip(block.code, lang)
+        lang = "python" if lang in PYTHON_VARIANTS else ("sh" if lang in SHELLS else lang)
+        if lang not in ("python", "sh"):
+            exit_code = 1
+            logs += f"\nunknown language {lang}"
+            break
+        try:
+            filename = _get_file_name_from_content(code, Path(work_dir))
+        except ValueError:
+            return CommandLineCodeResult(exit_code=1, output="Filename is not in the workspace")
+        filename = filename or f"tmp_code_{md5(code.encode()).hexdigest()}.{'py' if lang == 'python' else 'sh'}"
+        path = (Path(work_dir) / filename).resolve()
+        path.write_text(code, encoding="utf-8")
+        code_files.append(str(path))
+
+        exit_code, output = run(lang, path, work_dir)
+        logs += output
+        if exit_code is None:
+            logs += "\n" + TIMEOUT_MSG
+            # same exit code as the timeout command, as autogen's executors report it
+            return CommandLineCodeResult(exit_code=124, output=logs, code_file=code_files[0])
+        if exit_code != 0:
+            break
+    return CommandLineCodeResult(exit_code=exit_code, output=logs, code_file=code_files[0] if code_files else None)
+
+
+class _LocalWorker:
+    def __init__(self, timeout, preload):
+        self.timeout = timeout
+        self._fork = hasattr(os, "fork")
+        if self._fork:
+            # a fresh interpreter, not a fork of the app: the app has threads (Streamlit, HTTP pools) that must not be forked
+            self.process = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--worker", *preload],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1,
+            )
+            self._readline(timeout=120)
+
+    def _readline(self, timeout):
+        ready, _, _ = select.select([self.process.stdout], [], [], timeout)
+        line = self.process.stdout.readline() if ready else ""
+        if not line:
+            raise WorkerCrashed("the worker exited" if self.process.poll() is not None else "the worker did not answer")
+        return line
+
+    def run(self, lang, path, work_dir):
+        """(exit code, output) of one code file run in work_dir; exit code None if it timed out."""
+        # outside work_dir, so listing the work directory does not show it
+        fd, output_path = tempfile.mkstemp(prefix="executor_", suffix=".out")
+        os.close(fd)
+        try:
+            if self._fork:
+                try:
+                    self.process.stdin.write(json.dumps([lang, str(path), output_path, str(work_dir), self.timeout]) + "\n")
+                    self.process.stdin.flush()
+                except OSError as ex:
+                    raise WorkerCrashed(str(ex))
+                exit_code = json.loads(self._readline(self.timeout + 10))
+            else:
+                program = sys.executable if lang == "python" else "sh"
+                with open(output_path, 'w') as output:
+                    try:
+                        exit_code = subprocess.run([program, str(path)], cwd=work_dir, stdout=output,
+                                                   stderr=subprocess.STDOUT, timeout=self.timeout).returncode
+                    except subprocess.TimeoutExpired:
+                        exit_code = None
+            with open(output_path, 'r', encoding='utf-8', errors='replace') as f:
+                return exit_code, f.read()
+        finally:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+
+    def execute(self, code_blocks, work_dir):
+        return _execute_blocks(code_blocks, work_dir, self.run)
+
+    def healthy(self):
+        return not self._fork or self.process.poll() is None
+
+    def stop(self):
+        if self._fork and self.process.poll() is None:
+            try:
+                self.process.stdin.close()
+                self.process.wait(2)
+            except (OSError, subprocess.TimeoutExpired):
+                self.process.kill()
+
+
+class _DockerWorker:
+    """A running container with the pool's work_dir mounted at /workspace; code runs in a directory below it.
+
+    The upload blob store under work_dir is mounted over its own path again read-only, so code running as root in
+    the container can read the uploads sessions link to but not change them.
+    """
+
+    def __init__(self, root, timeout, image):
+        import docker
+        from docker.errors import ImageNotFound
+        from workdir_manager import BLOBS
+
+        self.root = root
+        self.timeout = timeout
+        client = docker.from_env()
+        try:
+            client.images.get(image)
+        except ImageNotFound:
+            client.images.pull(image)
+        blobs = os.path.join(root, BLOBS)
+        os.makedirs(blobs, exist_ok=True)
+        # created here rather than through autogen's DockerCommandLineCodeExecutor, which cannot add a second volume
+        self.container = client.containers.create(
+            image,
+            name=f"autogen-code-exec-{md5(os.urandom(16)).hexdigest()}",
+            entrypoint="/bin/sh",
+            tty=True,
+            auto_remove=True,
+            volumes={
+                os.path.abspath(root): {"bind": "/workspace", "mode": "rw"},
+                os.path.abspath(blobs): {"bind": f"/workspace/{BLOBS}", "mode": "ro"},
+            },
+            working_dir="/workspace",
+        )
+        self.container.start()
+        deadline = time.monotonic() + 60
+        while self.container.status != "running":
+            if time.monotonic() > deadline:
+                self.stop()
+                raise WorkerCrashed(f"container {self.container.name} did not start")
+            time.sleep(0.1)
+            self.container.reload()
+
+    def run(self, lang, path, work_dir):
+        relative = os.path.relpath(work_dir, self.root)
+        if relative.startswith(os.pardir):
+            raise ValueError(f"{work_dir} is not inside the executor pool's work_dir {self.root}")
+        container_dir = "/workspace" if relative == os.curdir else f"/workspace/{Path(relative).as_posix()}"
+        program = "python" if lang == "python" else "sh"
+        try:
+            exit_code, output = self.container.exec_run(
+                ["timeout", str(self.timeout), program, path.name], workdir=container_dir
+            )
+        except Exception as ex:
+            raise WorkerCrashed(str(ex))
+        return (None if exit_code == 124 else exit_code), output.decode("utf-8", errors="replace")
+
+    def execute(self, code_blocks, work_dir):
+        return _execute_blocks(code_blocks, work_dir, self.run)
+
+    def healthy(self):
+        try:
+            self.container.reload()
+            return self.container.status == "running"
+        except Exception:
+            return False
+
+    def stop(self):
+        try:
+            self.container.stop()
+        except Exception:
+            # already gone: auto_remove deletes a container once it exits
+            pass
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class ExecutorPool:
+    """`size` warm workers of one backend. Code runs in `work_dir` or, per executor, in a directory below it."""
+
+    def __init__(self, backend="local", size=2, timeout=60, work_dir="work_dir", image="python:3.12-slim", preload=PRELOAD):
+        if backend not in ("local", "docker"):
+            raise ValueError(f"unknown executor backend {backend!r}, use 'local' or 'docker'")
+        self.backend = backend
+        self.size = size
+        self.timeout = timeout
+        self.work_dir = os.path.abspath(work_dir)
+        self.image = image
+        self.preload = preload
+        os.makedirs(self.work_dir, exist_ok=True)
+        self.recycled = 0
+        self.queue_times = deque(maxlen=1000)
+        self.run_times = deque(maxlen=1000)
+        self._idle = queue.Queue()
+        self._stats_lock = threading.Lock()
+        for _ in range(size):
+            self._idle.put(self._new_worker())
+
+    def _new_worker(self):
+        if self.backend == "docker":
+            return _DockerWorker(self.work_dir, self.timeout, self.image)
+        return _LocalWorker(self.timeout, self.preload)
+
+    def _replace(self, worker):
+        worker.stop()
+        self._idle.put(self._new_worker())
+        with self._stats_lock:
+            self.recycled += 1
+
+    def lease(self):
+        """Wait for a free worker and take it. Returns (worker, seconds waited)."""
+        start = time.perf_counter()
+        worker = self._idle.get()
+        if not worker.healthy():
+            # died while idle: this session waits for its replacement
+            worker.stop()
+            worker = self._new_worker()
+            with self._stats_lock:
+                self.recycled += 1
+        return worker, time.perf_counter() - start
+
+    def release(self, worker, broken=False):
+        """Give a leased worker back; a broken one is replaced in the background, so nobody waits for its imports."""
+        if broken:
+            threading.Thread(target=self._replace, args=(worker,), daemon=True).start()
+        else:
+            self._idle.put(worker)
+
+    def run(self, worker, code_blocks, work_dir=None):
+        """Run code blocks in work_dir (default: the pool's) on a leased worker. Returns (result, run seconds, broken):
+        broken is True if the worker crashed or the code timed out, which may have left processes or state behind."""
+        start = time.perf_counter()
+        try:
+            result = worker.execute(code_blocks, os.path.abspath(work_dir or self.work_dir))
+            broken = result.exit_code == 124
+        except WorkerCrashed as ex:
+            from autogen.coding.base import CommandLineCodeResult
+
+            result, broken = CommandLineCodeResult(exit_code=CRASHED_EXIT_CODE, output=f"The code executor crashed: {ex}"), True
+        return result, time.perf_counter() - start, broken
+
+    def record(self, queue_seconds, run_seconds):
+        with self._stats_lock:
+            self.queue_times.append(queue_seconds)
+            self.run_times.append(run_seconds)
+
+    def execute(self, code_blocks, work_dir=None):
+        """Run code blocks on the next free worker and give it back. Returns (result, queue seconds, run seconds)."""
+        worker, queue_seconds = self.lease()
+        broken = False
+        try:
+            result, run_seconds, broken = self.run(worker, code_blocks, work_dir)
+        finally:
+            self.release(worker, broken)
+        self.record(queue_seconds, run_seconds)
+        return result, queue_seconds, run_seconds
+
+    def executor(self, work_dir=None, lease_idle=120):
+        """A CodeExecutor on this pool for one chat session, running its code in work_dir (default: the pool's)."""
+        return PooledCodeExecutor(self, work_dir, lease_idle)
+
+    def stats(self):
+        with self._stats_lock:
+            queue_times, run_times = list(self.queue_times), list(self.run_times)
+            return {
+                "backend": self.backend,
+                "workers": self.size,
+                "idle_workers": self._idle.qsize(),
+                "executions": len(run_times),
+                "recycled": self.recycled,
+                "queue_p50": round(_percentile(queue_times, 50), 4),
+                "queue_p95": round(_percentile(queue_times, 95), 4),
+                "run_p50": round(_percentile(run_times, 50), 4),
+                "run_p95": round(_percentile(run_times, 95), 4),
+            }
+
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get_nowait().stop()
+
+
+class PooledCodeExecutor:
+    """autogen CodeExecutor for one session, running its code on a worker leased from the shared pool.
+
+    The lease is taken on the first code block and held until release() or until no code ran for `lease_idle`
+    seconds, so a session that is stopped or abandoned mid-chat does not keep its worker.
+    """
+
+    def __init__(self, pool, work_dir=None, lease_idle=120):
+        self.pool = pool
+        self.work_dir = work_dir
+        self.lease_idle = lease_idle
+        self.timings = []
+        self._worker = None
+        self._timer = None
+        self._release_pending = False
+        self._lock = threading.Lock()
+
+    @property
+    def code_extractor(self):
+        from autogen.coding import MarkdownCodeExtractor
+
+        return MarkdownCodeExtractor()
+
+    def execute_code_blocks(self, code_blocks):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            queue_seconds = 0.0
+            if self._worker is None:
+                self._worker, queue_seconds = self.pool.lease()
+            # an error that is not a crash (e.g. a refused command) leaves the worker with this session
+            broken = False
+            try:
+                result, run_seconds, broken = self.pool.run(self._worker, code_blocks, self.work_dir)
+            finally:
+                if broken or self._release_pending:
+                    self.pool.release(self._worker, broken=broken)
+                    self._worker = None
+                    self._release_pending = False
+                else:
+                    self._timer = threading.Timer(self.lease_idle, self.release)
+                    self._timer.daemon = True
+                    self._timer.start()
+        self.pool.record(queue_seconds, run_seconds)
+        self.timings.append({"queue_seconds": queue_seconds, "run_seconds": run_seconds})
+        return result
+
+    def release(self):
+        """Give the session's worker back to the pool, e.g. when its chat ends. Does not wait: if code is still
+        running (a stopped chat), the worker goes back when it finishes."""
+        if not self._lock.acquire(blocking=False):
+            self._release_pending = True
+            return
+        try:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._worker is not None:
+                self.pool.release(self._worker)
+                self._worker = None
+        finally:
+            self._lock.release()
+
+    def restart(self):
+        pass
+
+
+_pools = {}
+_lock = threading.Lock()
+
+
+def get_executor_pool(backend="local", size=2, **kwargs):
+    """The process-wide pool of a backend, created with warm workers on first use."""
+    with _lock:
+        if backend not in _pools:
+            _pools[backend] = ExecutorPool(backend, size=size, **kwargs)
+        return _pools[backend]
+
+
+def executor_pool_stats():
+    """Queue and run times of every pool created in this process, by backend."""
+    with _lock:
+        pools = dict(_pools)
+    return {backend: pool.stats() for backend, pool in pools.items()}
+
+
+if __name__ == "__main__" and sys.argv[1:2] == ["--worker"]:
+    _zygote(sys.argv[2:])
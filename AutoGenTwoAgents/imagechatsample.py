@@ -1,18 +1,19 @@
 import os
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
+import sys
 import autogen
 from autogen.agentchat.contrib.multimodal_conversable_agent import MultimodalConversableAgent
 from dotenv import load_dotenv
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.azure_clients import get_http_client, get_token_provider
+from shared.completion_cache import get_completion_cache
 load_dotenv()
 
 # Azure OpenAI for Dalle
 api_version = os.getenv("AOAI_API_VERSION")
 dalle3_model = os.getenv("DALL_E_MODEL_NAME")
 api_base = os.getenv("AOAI_API_BASE")
-# Initialize the DefaultAzureCredential
-token_provider = get_bearer_token_provider(
-    DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default"
-)
+# The DefaultAzureCredential token provider and HTTP connection pool are shared by all apps in the process
+token_provider = get_token_provider()
 
 llm_config = {
     "config_list": [
@@ -22,10 +23,11 @@ llm_config = {
             "api_type": "azure",
             "api_version": api_version,
             "max_tokens": 1000,
-            "azure_ad_token_provider": token_provider
+            "azure_ad_token_provider": token_provider,
+            "http_client": get_http_client(),
         }
     ],
-    "cache_seed": 42,
+    "cache": get_completion_cache("imagechatsample"),
     "temperature": 0.5, 
     "max_tokens": 300
 }
@@ -1,26 +1,23 @@
 import os
+import sys
 import streamlit as st
-import asyncio
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
-from autogen import ConversableAgent, register_function
-from autogen.agentchat.contrib.multimodal_conversable_agent import MultimodalConversableAgent
-import requests
-from openai import AzureOpenAI
+from web_search import BingSearchClient
+from tool_executor import ParallelToolExecutor
 from datetime import datetime
 import json
 from dotenv import load_dotenv
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.azure_clients import get_http_client, get_openai_client, get_token_provider
+from shared.completion_cache import get_completion_cache
+from shared.session_loop import get_session_loop
+from shared.streaming import streamlit_iostream, track_speaker
 load_dotenv()
 
-# from promptflow.tracing import start_trace
-# start_trace()
-
 
 # Set the title of the app
 st.title("2 agents with multiple tools")
-# Initialize the DefaultAzureCredential
-token_provider = get_bearer_token_provider(
-    DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default"
-)
+# The DefaultAzureCredential token provider and HTTP connection pool are shared by all apps in the process
+token_provider = get_token_provider()
 # Bing Search API
 bing_search_api_key = os.getenv("BING_SEARCH_API_KEY")
 bing_search_api_endpoint = os.getenv("BING_SEARCH_API_ENDPOINT")
@@ -37,52 +34,33 @@ llm_config = {
             "api_type": "azure",
             "api_version": api_version,
             "max_tokens": 1000,
-            "azure_ad_token_provider": token_provider
+            "azure_ad_token_provider": token_provider,
+            "http_client": get_http_client(),
         }
     ],
-    "cache_seed": 42,
+    "cache": get_completion_cache("multitoolsapp"),
     "temperature": 0.5, 
-    "max_tokens": 1000
+    "max_tokens": 1000,
+    "stream": True,
 }
     
-def web_searcher(query: str, up_to_date:bool=False) -> str:
+# One search client per process: its cache and connection pool are shared by every session
+@st.cache_resource
+def get_search_client():
+    return BingSearchClient(bing_search_api_endpoint, bing_search_api_key, count=3)
 
-    headers = {"Ocp-Apim-Subscription-Key": bing_search_api_key}
-    question = query
-    params = {"q": question, "count": 3}  # Limit the results to 5
-    if up_to_date:
-            params.update({"sortby":"Date"})
-    try:
-        response = requests.get(bing_search_api_endpoint, headers=headers,params = params)
-        print(params)
-        response.raise_for_status()
-        search_results = response.json()
-        results = []
-        if search_results is not None:
-            for v in search_results["webPages"]["value"]:
-                result = {
-                    "title": v["name"],
-                    "content": v["snippet"],
-                    "source_url": v["url"]
-                }
-                results.append(result)
-            return [
-                    {"content": doc["content"],
-                    "source_page": doc["title"],
-                    "source_url":doc["source_url"]}
-                for doc in results]
-        return json.dumps(results)
-    except Exception as ex:
-        raise ex
+# Tool calls of one assistant message run concurrently on a bounded pool shared by every session,
+# so searches no longer wait behind a slow image generation
+@st.cache_resource
+def get_tool_executor():
+    return ParallelToolExecutor(max_workers=8, timeouts={"web_searcher": 20, "image_generator": 120})
+
+def web_searcher(query: str, up_to_date:bool=False) -> str:
+    # Repeated queries are served from the cache unless up_to_date is set; concurrent identical queries share one request
+    return get_search_client().search(query, up_to_date=up_to_date)
 def image_generator(prompt: str) -> str:
-    token_provider = get_bearer_token_provider(
-            DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default"
-        )
-    client = AzureOpenAI(
-            api_version="2024-02-01",  
-            azure_ad_token_provider=token_provider, 
-            azure_endpoint=api_base
-        )
+    # reuses the cached token and pooled connections instead of a new credential and TLS handshake per call
+    client = get_openai_client(api_version="2024-02-01", azure_endpoint=api_base)
     result = client.images.generate(
             model=dalle3_model, # the name of your DALL-E 3 deployment
             prompt=prompt,
@@ -96,112 +74,98 @@ def image_generator(prompt: str) -> str:
     # define function to get today's date as string format MMMM DD, YYYY
 def get_today_date() -> str:
     return datetime.today().strftime("%B %d, %Y")
-## We need to extend the ConversableAgent class to track the conversation in Streamlit
-class TrackableAssistantAgent(ConversableAgent):
-
-    def __init__(self, *args, skills=None, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.skills = skills or []
-        
-    def _process_received_message(self, message, sender, silent):
-        with st.chat_message(sender.name):
-            st.markdown(message)
-        return super()._process_received_message(message, sender, silent)
-
-## We need to extend the ConversableAgent class to track the conversation in Streamlit
-class TrackableUserProxyAgent(ConversableAgent):
-    def _process_received_message(self, message, sender, silent):
-        with st.chat_message(sender.name):
-            st.markdown(message)
-        return super()._process_received_message(message, sender, silent)
-
-## We need to extend the ConversableAgent class to track the conversation in Streamlit
-class TrackableMultimodalAssistantAgent(MultimodalConversableAgent):
-
-    def __init__(self, *args, skills=None, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.skills = skills or []
-    def _process_received_message(self, message, sender, silent):
-        with st.chat_message(sender.name):
-            st.markdown(message)
-        return super()._process_received_message(message, sender, silent)
-
-# Let's first define the assistant agent that suggests tool calls. You can modify for your own tools. 
-assistant = TrackableAssistantAgent(
-    name="Assistant",
-    system_message=f"""You are a helpful AI assistant that help people with complext tasks, today is {get_today_date()}.
-    You have access to 2 tools: web_searcher and image_generator.
-    You can help with multistep tasks by making an execution plan and sequentially using the tools. 
-    Reason step by step which actions to take to get to the answer.
-    When you give the final answer, provide the key reasoning steps you took to get to the answer.
-    Return 'TERMINATE' when the task is done.""",
-    llm_config=llm_config,
-)
-
-# The user proxy agent is used for interacting with the assistant agent
-# and executes tool calls.
-user_proxy = TrackableUserProxyAgent(
-    name="User",
-    system_message="""You act on behalf of the user to monitor the assistant's actions for solving the task given by the user. 
-    You examine if the assistant is making the right plan and suggesting the right tool to use. If it is the case, execute the tool.
-    Before outputing the final result, validate the web search result and make sure any image url is represented as markdown image that is visible in the chat application.
-    """,
-    llm_config=llm_config,
-    is_termination_msg=lambda msg: msg.get("content") is not None and "TERMINATE" in msg["content"],
-    human_input_mode="TERMINATE",
-)
-
-# image_agent = TrackableMultimodalAssistantAgent(
-#     name="image-explainer",
-#     max_consecutive_auto_reply=10,
-#     llm_config=llm_config,
-# )
-
-# Registering the functions
-# Register the image_generator function as a tool. If you modify this you need to change the name, and the description. 
-register_function(
-    image_generator,
-    caller=assistant,  # The assistant agent can suggest calls to the calculator.
-    executor=user_proxy,  # The user proxy agent can execute the calculator calls.
-    name="image_generator",  # By default, the function name is used as the tool name.
-    description="A image generator that calls Dall-E API to generate an image based on the input prompt",  # A description of the tool.
-)
-# Register the web_searcher function as a tool. If you modify this you need to change the name, and the description. 
-register_function(
-    web_searcher,
-    caller=assistant,  # The assistant agent can suggest calls to the calculator.
-    executor=user_proxy,  # The user proxy agent can execute the calculator calls.
-    name="web_searcher",  # By default, the function name is used as the tool name.
-    description="A web searcher that calls Bing Search API to search the web and return a list of search result based on a query. If the query requires up-to-date information, overright the <up_to_date> parameter to 'true'",  # A description of the tool.
-)
-
+def build_agents():
+    # autogen is imported here, on the first chat, so the page renders before the agent framework is loaded
+    from autogen import register_function
+    from trackable_agents import TrackableConversableAgent
+
+    # Let's first define the assistant agent that suggests tool calls. You can modify for your own tools. 
+    assistant = TrackableConversableAgent(
+        name="Assistant",
+        system_message=f"""You are a helpful AI assistant that help people with complext tasks, today is {get_today_date()}.
+        You have access to 2 tools: web_searcher and image_generator.
+        You can help with multistep tasks by making an execution plan and sequentially using the tools. 
+        Reason step by step which actions to take to get to the answer.
+        When you give the final answer, provide the key reasoning steps you took to get to the answer.
+        Return 'TERMINATE' when the task is done.""",
+        llm_config=llm_config,
+    )
+
+    # The user proxy agent is used for interacting with the assistant agent
+    # and executes tool calls.
+    user_proxy = TrackableConversableAgent(
+        name="User",
+        system_message="""You act on behalf of the user to monitor the assistant's actions for solving the task given by the user. 
+        You examine if the assistant is making the right plan and suggesting the right tool to use. If it is the case, execute the tool.
+        Before outputing the final result, validate the web search result and make sure any image url is represented as markdown image that is visible in the chat application.
+        """,
+        llm_config=llm_config,
+        is_termination_msg=lambda msg: msg.get("content") is not None and "TERMINATE" in msg["content"],
+        human_input_mode="TERMINATE",
+    )
+    track_speaker(assistant, user_proxy)
+    get_tool_executor().register(user_proxy)
+
+    # Registering the functions
+    # Register the image_generator function as a tool. If you modify this you need to change the name, and the description. 
+    register_function(
+        image_generator,
+        caller=assistant,  # The assistant agent can suggest calls to the calculator.
+        executor=user_proxy,  # The user proxy agent can execute the calculator calls.
+        name="image_generator",  # By default, the function name is used as the tool name.
+        description="A image generator that calls Dall-E API to generate an image based on the input prompt",  # A description of the tool.
+    )
+    # Register the web_searcher function as a tool. If you modify this you need to change the name, and the description. 
+    register_function(
+        web_searcher,
+        caller=assistant,  # The assistant agent can suggest calls to the calculator.
+        executor=user_proxy,  # The user proxy agent can execute the calculator calls.
+        name="web_searcher",  # By default, the function name is used as the tool name.
+        description="A web searcher that calls Bing Search API to search the web and return a list of search result based on a query. If the query requires up-to-date information, overright the <up_to_date> parameter to 'true'",  # A description of the tool.
+    )
+    return assistant, user_proxy
+
+with st.sidebar.expander("Web search cache"):
+    st.json(get_search_client().stats())
+with st.sidebar.expander("Tool calls"):
+    st.json(get_tool_executor().stats())
 
 if 'chat_initiated' not in st.session_state:
     st.session_state.chat_initiated = False
 
 chatresult = None
+session_loop = get_session_loop(st.session_state)
+
+def stop_chat():
+    session_loop.cancel()
+    st.session_state.chat_stopped = True
+
+if st.session_state.pop("chat_stopped", False):
+    st.info("Chat stopped.")
+
 with st.container():
  
     user_input = st.chat_input("Type something...")
     if user_input:
-        
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        # the chat runs on the session's event loop; Stop (or any other interaction) cancels it
+        st.button("Stop", on_click=stop_chat)
+        status = st.empty()
+        assistant, user_proxy = build_agents()
 
         async def initiate_chat():
             
             try:
-                chatresult = user_proxy.initiate_chat(
-                    assistant,
-                    message=user_input,
-                    max_consecutive_auto_reply=5,
-                    is_termination_msg=lambda x: x.get("content", "").strip().endswith("TERMINATE"),
-                )
+                with streamlit_iostream():
+                    return await user_proxy.a_initiate_chat(
+                        assistant,
+                        message=user_input,
+                        max_consecutive_auto_reply=5,
+                        is_termination_msg=lambda x: x.get("content", "").strip().endswith("TERMINATE"),
+                    )
             except Exception as e:
                 st.error(f"An error occurred: {e}")
         
-        loop.run_until_complete(initiate_chat())
-        loop.close()
+        chatresult = session_loop.run(initiate_chat(), status=status)
 
 if st.session_state.chat_initiated:
     st.write(chatresult)
@@ -0,0 +1,51 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from autogen.coding import CodeBlock
+
+from execution_cache import CachingCodeExecutor, ExecutionCache
+from executor_pool import CRASHED_EXIT_CODE, ExecutorPool, WorkerCrashed
+
+
+class _CrashingWorker:
+    def execute(self, code_blocks, work_dir):
+        raise WorkerCrashed("the worker exited")
+
+
+class _PoolExecutor:
+    # runs every block on a worker whose process dies, through the pool's crash handling
+    def __init__(self, pool):
+        self.pool = pool
+        self.calls = 0
+
+    def execute_code_blocks(self, code_blocks):
+        self.calls += 1
+        result, _, broken = self.pool.run(_CrashingWorker(), code_blocks)
+        assert broken
+        return result
+
+
+class CrashedExecutionTest(unittest.TestCase):
+    def test_crashed_worker_result_is_not_cached(self):
+        with tempfile.TemporaryDirectory() as work_dir:
+            pool = ExecutorPool("local", size=0, work_dir=work_dir)
+            executor = _PoolExecutor(pool)
+            cache = ExecutionCache(path=os.path.join(work_dir, ".executions.sqlite"))
+            caching = CachingCodeExecutor(executor, work_dir, "local:test", cache=cache)
+            blocks = [CodeBlock(code="print(sum(range(10)))", language="python")]
+
+            first = caching.execute_code_blocks(blocks)
+            second = caching.execute_code_blocks(blocks)
+
+            self.assertEqual(first.exit_code, CRASHED_EXIT_CODE)
+            self.assertEqual(second.exit_code, CRASHED_EXIT_CODE)
+            # nothing was stored, so the second run executed again instead of returning the crash
+            self.assertEqual(executor.calls, 2)
+            self.assertEqual(cache.stats()["hits"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class ParallelToolExecutor:
+    """Runs the tool calls of one assistant message concurrently instead of one after another.
+
+    Synchronous tools run on a bounded thread pool shared by every agent registered with this executor, async tools
+    on the event loop. Each call gets the timeout in `timeouts` for its tool (else `default_timeout`); a call that
+    times out or raises is answered with an error message, so the others still return. Responses come back in call
+    order, and every call's latency is recorded for stats(). A timed-out synchronous call cannot be interrupted and
+    keeps its thread until it returns; only its result is dropped.
+    """
+
+    def __init__(self, max_workers=8, timeouts=None, default_timeout=60.0, history=1000):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+        self.timeouts = timeouts or {}
+        self.default_timeout = default_timeout
+        self.calls = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def register(self, agent):
+        """Make `agent` execute tool calls with this executor in async chats (a_initiate_chat)."""
+        from autogen import ConversableAgent
+
+        executor = self
+
+        async def a_generate_tool_calls_reply(recipient, messages=None, sender=None, config=None):
+            if messages is None:
+                messages = recipient._oai_messages[sender]
+            return await executor.generate_reply(recipient, messages[-1])
+
+        agent.replace_reply_func(ConversableAgent.a_generate_tool_calls_reply, a_generate_tool_calls_reply)
+        return agent
+
+    async def generate_reply(self, agent, message):
+        tool_calls = message.get("tool_calls") or []
+        if not tool_calls:
+            return False, None
+        responses = await asyncio.gather(*(self._execute(agent, tool_call) for tool_call in tool_calls))
+        return True, {
+            "role": "tool",
+            "tool_responses": responses,
+            "content": "\n\n".join(response["content"] for response in responses),
+        }
+
+    async def _execute(self, agent, tool_call):
+        function_call = tool_call.get("function", {})
+        name = function_call.get("name", "")
+        content, _ = await self._call(agent, name, function_call.get("arguments") or "{}")
+        return {"tool_call_id": tool_call["id"], "role": "tool", "content": content}
+
+    async def _call(self, agent, name, arguments):
+        func = agent.function_map.get(name)
+        if func is None:
+            return f"Error: Function {name} not found.", "error"
+        try:
+            arguments = json.loads(agent._format_json_str(arguments))
+        except json.JSONDecodeError as e:
+            return f"Error: {e}\n The argument must be in JSON format.", "error"
+
+        from autogen.io import IOStream
+
+        IOStream.get_default().print(f"\n>>>>>>>> EXECUTING FUNCTION {name}...", flush=True)
+        timeout = self.timeouts.get(name, self.default_timeout)
+        start = time.perf_counter()
+        try:
+            if inspect.iscoroutinefunction(func):
+                result = await asyncio.wait_for(func(**arguments), timeout)
+            else:
+                # the tool sees the chat's context variables (such as its IOStream), as with asyncio.to_thread
+                call = functools.partial(contextvars.copy_context().run, func, **arguments)
+                result = await asyncio.wait_for(asyncio.get_running_loop().run_in_executor(self._pool, call), timeout)
+            content, status = str(result), "ok"
+        except asyncio.TimeoutError:
+            content, status = f"Error: {name} timed out after {timeout:g} seconds.", "timeout"
+        except Exception as e:
+            content, status = f"Error: {e}", "error"
+        self._record(name, time.perf_counter() - start, status)
+        return content, status
+
+    def _record(self, name, seconds, status):
+        with self._lock:
+            self.calls.append({"tool": name, "seconds": seconds, "status": status, "finished": time.time()})
+
+    def stats(self):
+        """Calls, errors, timeouts and p50/p95 latency per tool, over the last `history` calls."""
+        with self._lock:
+            calls = list(self.calls)
+        tools = {}
+        for call in calls:
+            tools.setdefault(call["tool"], []).append(call)
+        return {
+            name: {
+                "calls": len(records),
+                "errors": sum(1 for record in records if record["status"] == "error"),
+                "timeouts": sum(1 for record in records if record["status"] == "timeout"),
+                "p50_seconds": round(_percentile([record["seconds"] for record in records], 50), 3),
+                "p95_seconds": round(_percentile([record["seconds"] for record in records], 95), 3),
+            }
+            for name, records in tools.items()
+        }
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
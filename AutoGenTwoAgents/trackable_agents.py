@@ -0,0 +1,31 @@
+import asyncio
+import os
+import sys
+
+from autogen import ConversableAgent
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.streaming import render_message
+
+
+# We will create a class that extends the ConversableAgent class to track the messages sent by the agent
+# so we can tap it into the Streamlit chat messages.
+# The apps import this module only when a chat starts, so a page load does not import autogen.
+class TrackableConversableAgent(ConversableAgent):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self._code_execution_config:
+            # autogen only has a blocking code execution reply; in async chats run it in a worker thread instead
+            self.replace_reply_func(
+                ConversableAgent._generate_code_execution_reply_using_executor,
+                TrackableConversableAgent.a_generate_code_execution_reply,
+            )
+
+    async def a_generate_code_execution_reply(self, messages=None, sender=None, config=None):
+        return await asyncio.to_thread(
+            ConversableAgent._generate_code_execution_reply_using_executor, self, messages, sender, config
+        )
+
+    def _process_received_message(self, message, sender, silent):
+        render_message(sender.name, message)
+        return super()._process_received_message(message, sender, silent)
@@ -1,14 +1,16 @@
 import streamlit as st
 import os
+import sys
 from dotenv import load_dotenv
 import json
-import promptflow as pf
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.azure_clients import pool_stats, scheduler_stats
+from shared.completion_cache import get_completion_cache
+from execution_cache import get_execution_cache
+from executor_pool import executor_pool_stats
 # Load environment variables
 load_dotenv()
 
-# from promptflow.tracing import start_trace
-# start_trace()
-
 coderapp_page = st.Page("coderapp.py", title="Code Intepretor", icon="🤖")
 multitools_page = st.Page("multitoolsapp.py", title="multiple tools usage", icon="🤖")
 
@@ -20,4 +22,24 @@ st.title("AutoGen two Agents Demo")
 
 # button to select the page
 pg = st.navigation([coderapp_page, multitools_page])
-pg.run()
\ No newline at end of file
+pg.run()
+
+# Requests on reused connections show that the shared keep-alive pool is working
+with st.sidebar.expander("Azure OpenAI connection pool"):
+    st.json(pool_stats())
+
+# Concurrency limit and queueing of the LLM request scheduler, per priority class
+with st.sidebar.expander("LLM request scheduler"):
+    st.json(scheduler_stats())
+
+# Warm code-executor workers of coderapp: time spent waiting for a worker vs running code
+with st.sidebar.expander("Code executor pool"):
+    st.json(executor_pool_stats())
+
+# Code runs answered from the execution cache, and the run time that saved
+with st.sidebar.expander("Code execution cache"):
+    st.json(get_execution_cache().stats())
+
+# Hit rates of the on-disk completion cache, per app
+with st.sidebar.expander("LLM completion cache"):
+    st.json(get_completion_cache("two_agents_app").stats())
@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire `ttl` seconds after they were stored."""
+
+    def __init__(self, maxsize=256, ttl=600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class BingSearchClient:
+    """Bing Web Search with a pooled session, a TTL/LRU result cache and request coalescing.
+
+    Identical queries issued while a request for them is in flight wait for that request instead of
+    sending their own. `up_to_date=True` skips the cache, since the caller wants the latest results.
+    The endpoint is a constructor argument so the client can be pointed at a local stub server.
+    """
+
+    def __init__(self, endpoint, api_key, count=3, cache_size=256, ttl=600, pool_size=10, timeout=10):
+        self.endpoint = endpoint
+        self.count = count
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({"Ocp-Apim-Subscription-Key": api_key or ""})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.cache = TTLCache(maxsize=cache_size, ttl=ttl)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.metrics = {"hits": 0, "misses": 0, "coalesced": 0, "upstream_requests": 0, "errors": 0}
+
+    def _count(self, metric):
+        with self._lock:
+            self.metrics[metric] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.metrics)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["cached_queries"] = len(self.cache)
+        return stats
+
+    def search(self, query, up_to_date=False):
+        key = (" ".join(query.lower().split()), self.count, up_to_date)
+        if not up_to_date:
+            results = self.cache.get(key)
+            if results is not None:
+                self._count("hits")
+                return [dict(result) for result in results]
+            self._count("misses")
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self.metrics["coalesced"] += 1
+        if not leader:
+            return [dict(result) for result in future.result()]
+
+        try:
+            results = self._fetch(query, up_to_date)
+        except Exception as ex:
+            self._count("errors")
+            future.set_exception(ex)
+            raise
+        else:
+            if not up_to_date:
+                self.cache.set(key, results)
+            future.set_result(results)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        return [dict(result) for result in results]
+
+    def _fetch(self, query, up_to_date):
+        params = {"q": query, "count": self.count}
+        if up_to_date:
+            params.update({"sortby": "Date"})
+        self._count("upstream_requests")
+        response = self.session.get(self.endpoint, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        search_results = response.json()
+        return [
+            {"content": v["snippet"],
+             "source_page": v["name"],
+             "source_url": v["url"]}
+            for v in search_results.get("webPages", {}).get("value", [])
+        ]
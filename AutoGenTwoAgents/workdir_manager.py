@@ -0,0 +1,187 @@
+import hashlib
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import time
+
+CHUNK_SIZE = 1024 * 1024
+# Touched on every use of a session directory; its mtime is the session's last use
+LAST_USED = ".last_used"
+# Blob store directory under the root; executors that can mount it (Docker) mount it read-only
+BLOBS = ".blobs"
+
+
+class WorkdirManager:
+    """Per-session work directories under one root, with uploads stored once in a content-addressed blob store.
+
+    Layout: <root>/sessions/<session id>/ for each session and <root>/.blobs/<sha256> for uploaded content. An
+    upload is streamed to a temporary file in chunks while it is hashed; if a blob with that hash exists the copy is
+    dropped, and the session gets a relative symlink to the blob either way, so the same file uploaded by several
+    analysts is stored once. Blobs are read-only: their mode is 0444, and the Docker backend mounts the blob
+    directory read-only, so code running as root in a container cannot change a file other sessions see either.
+    (Code on the unsandboxed local backend runs as the app's user and is trusted not to chmod them.)
+
+    gc() removes sessions idle for longer than `max_idle` seconds, then, while the root is over `quota_bytes`, the
+    least recently used sessions idle for longer than `min_idle` seconds, so a session still in use is never removed
+    underneath its user, then blobs no session links to any more.
+    """
+
+    def __init__(self, root="work_dir", max_idle=24 * 3600, min_idle=1800, quota_bytes=10 * 1024 ** 3, gc_interval=600):
+        self.root = os.path.abspath(root)
+        self.sessions = os.path.join(self.root, "sessions")
+        self.blobs = os.path.join(self.root, BLOBS)
+        self.max_idle = max_idle
+        self.min_idle = min_idle
+        self.quota_bytes = quota_bytes
+        self.gc_interval = gc_interval
+        self._last_gc = 0.0
+        self._gc_lock = threading.Lock()
+        # held while a blob is linked into a session or deleted, so gc never removes a blob being linked
+        self._blob_lock = threading.Lock()
+        os.makedirs(self.sessions, exist_ok=True)
+        os.makedirs(self.blobs, exist_ok=True)
+
+    def session_dir(self, session_id):
+        """The session's directory, created on first use; marks the session as used now."""
+        path = os.path.join(self.sessions, session_id)
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, LAST_USED), 'a'):
+            pass
+        os.utime(os.path.join(path, LAST_USED))
+        self.maybe_gc()
+        return path
+
+    def save_upload(self, session_id, fileobj, name):
+        """Stream a binary file object into the session's directory as `name`. Returns (path, deduplicated)."""
+        name = os.path.basename(name)
+        if not name or name.startswith("."):
+            raise ValueError(f"invalid file name {name!r}")
+        digest = hashlib.sha256()
+        fd, temporary = tempfile.mkstemp(dir=self.blobs, prefix=".upload_")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                while chunk := fileobj.read(CHUNK_SIZE):
+                    digest.update(chunk)
+                    f.write(chunk)
+            blob = os.path.join(self.blobs, digest.hexdigest())
+            path = os.path.join(self.session_dir(session_id), name)
+            if os.path.lexists(path):
+                os.remove(path)
+            with self._blob_lock:
+                deduplicated = os.path.exists(blob)
+                if deduplicated:
+                    os.remove(temporary)
+                else:
+                    os.chmod(temporary, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+                    os.replace(temporary, blob)
+                try:
+                    # relative, so it resolves inside a container that mounts the root elsewhere
+                    os.symlink(os.path.relpath(blob, os.path.dirname(path)), path)
+                except OSError:
+                    # no symlinks (e.g. Windows without developer mode): the session gets its own copy
+                    shutil.copyfile(blob, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return path, deduplicated
+
+    def clear(self, session_id):
+        """Delete the session's files; other sessions' files and the blobs they use stay."""
+        path = os.path.join(self.sessions, session_id)
+        if os.path.isdir(path):
+            shutil.rmtree(path, onerror=_force_remove)
+        return self.session_dir(session_id)
+
+    def maybe_gc(self):
+        """Run gc() in the background if the last run was more than gc_interval seconds ago."""
+        if time.time() - self._last_gc >= self.gc_interval and self._gc_lock.acquire(blocking=False):
+            self._last_gc = time.time()
+            threading.Thread(target=self._gc_locked, daemon=True).start()
+
+    def _gc_locked(self):
+        try:
+            self.gc()
+        finally:
+            self._gc_lock.release()
+
+    def last_used(self, path):
+        """When a session was last used: its last page run, or the last file its code created or removed."""
+        times = []
+        for candidate in (os.path.join(path, LAST_USED), path):
+            try:
+                times.append(os.path.getmtime(candidate))
+            except OSError:
+                pass
+        return max(times, default=0.0)
+
+    def gc(self):
+        """Remove idle sessions, then sessions over quota (least recently used first), then unreferenced blobs."""
+        now = time.time()
+        sessions = sorted(
+            (self.last_used(entry.path), entry.path) for entry in os.scandir(self.sessions) if entry.is_dir()
+        )
+
+        removed = 0
+        for last_used, path in list(sessions):
+            if now - last_used > self.max_idle:
+                shutil.rmtree(path, onerror=_force_remove)
+                sessions.remove((last_used, path))
+                removed += 1
+        self._remove_orphan_blobs()
+        # sessions used within min_idle stay, even over quota
+        evictable = [path for last_used, path in sessions if now - last_used > self.min_idle]
+        while evictable and self.usage() > self.quota_bytes:
+            shutil.rmtree(evictable.pop(0), onerror=_force_remove)
+            self._remove_orphan_blobs()
+            removed += 1
+        return removed
+
+    def _remove_orphan_blobs(self):
+        with self._blob_lock:
+            linked = set()
+            for directory, _, files in os.walk(self.sessions):
+                for name in files:
+                    path = os.path.join(directory, name)
+                    if os.path.islink(path):
+                        linked.add(os.path.basename(os.readlink(path)))
+            for entry in os.scandir(self.blobs):
+                if entry.is_file() and not entry.name.startswith(".upload_") and entry.name not in linked:
+                    _force_remove(os.remove, entry.path, None)
+
+    def usage(self):
+        """Bytes on disk under the root; symlinks count as nothing, so each blob is counted once."""
+        seen, total = set(), 0
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                try:
+                    info = os.lstat(os.path.join(directory, name))
+                except OSError:
+                    continue
+                if stat.S_ISLNK(info.st_mode):
+                    continue
+                if (info.st_dev, info.st_ino) not in seen:
+                    seen.add((info.st_dev, info.st_ino))
+                    total += info.st_size
+        return total
+
+
+def _force_remove(function, path, exc_info):
+    # read-only blobs cannot be removed on Windows until they are writable
+    os.chmod(path, stat.S_IWRITE)
+    function(path)
+
+
+_managers = {}
+_lock = threading.Lock()
+
+
+def get_workdir_manager(root="work_dir"):
+    """The process-wide WorkdirManager for a root directory."""
+    root = os.path.abspath(root)
+    with _lock:
+        if root not in _managers:
+            _managers[root] = WorkdirManager(root)
+        return _managers[root]
@@ -0,0 +1,152 @@
+"""Run the benchmark scenarios against a local stub server and report latency, LLM calls and tokens.
+
+    python benchmarks/run_benchmarks.py --repeat 3 --output benchmarks/results/baseline.json
+    python benchmarks/run_benchmarks.py --baseline benchmarks/results/baseline.json
+
+Per scenario it reports the end-to-end time, p50/p95 turn latency, LLM calls, 429s and tokens sent and received,
+averaged over --repeat runs. With --baseline, the change of each number against an earlier --output is shown.
+"""
+import argparse
+import inspect
+import json
+import math
+import os
+import platform
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from scenarios import SCENARIOS
+from stub_server import StubServer
+
+COLUMNS = [
+    ("e2e_seconds", "e2e s", "{:.2f}"),
+    ("turn_p50", "turn p50 s", "{:.3f}"),
+    ("turn_p95", "turn p95 s", "{:.3f}"),
+    ("turns", "turns", "{:.0f}"),
+    ("llm_calls", "LLM calls", "{:.0f}"),
+    ("throttled", "429s", "{:.0f}"),
+    ("prompt_tokens", "tokens sent", "{:.0f}"),
+    ("completion_tokens", "tokens recv", "{:.0f}"),
+]
+
+
+def percentile(values, q):
+    """Nearest-rank percentile; 0.0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def run_scenario(server, name, **options):
+    """Run one scenario; each option is passed on if the scenario takes it and it is not None."""
+    server.state.reset()
+    scenario = SCENARIOS[name]
+    parameters = inspect.signature(scenario).parameters
+    kwargs = {key: value for key, value in options.items() if key in parameters and value is not None}
+    start = time.perf_counter()
+    result = scenario(server, **kwargs)
+    e2e = time.perf_counter() - start
+    stats = server.state.snapshot()
+    turns = result["turns"]
+    return {
+        "e2e_seconds": e2e,
+        "turn_p50": percentile(turns, 50),
+        "turn_p95": percentile(turns, 95),
+        "turns": len(turns),
+        "llm_calls": stats["chat_requests"],
+        "throttled": stats["throttled"],
+        "prompt_tokens": stats["prompt_tokens"],
+        "completion_tokens": stats["completion_tokens"],
+        "image_requests": stats["image_requests"],
+        "search_requests": stats["search_requests"],
+    }
+
+
+def average(runs):
+    return {key: sum(run[key] for run in runs) / len(runs) for key in runs[0]}
+
+
+def print_report(results, baseline=None):
+    header = f"{'scenario':<12}" + "".join(f"{label:>14}" for _, label, _ in COLUMNS)
+    print(header)
+    print("-" * len(header))
+    for name, metrics in results.items():
+        row = f"{name:<12}" + "".join(f"{fmt.format(metrics[key]):>14}" for key, _, fmt in COLUMNS)
+        print(row)
+        if baseline and name in baseline:
+            deltas = []
+            for key, _, _ in COLUMNS:
+                before = baseline[name].get(key)
+                if not before:
+                    deltas.append(f"{'':>14}")
+                else:
+                    deltas.append(f"{(metrics[key] - before) / before:>+14.1%}")
+            print(f"{'  vs base':<12}" + "".join(deltas))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the demo apps against a local Azure OpenAI stub.")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--repeat", type=int, default=1, help="runs per scenario; the report shows the average")
+    parser.add_argument("--latency", type=float, default=0.2, help="stub seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=100.0, help="stub generation speed")
+    parser.add_argument("--completion-tokens", type=int, default=60, help="length of the stub's text replies")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of chat requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with a 429")
+    parser.add_argument("--stream", action="store_true", help="stream completions, as the Streamlit apps do")
+    parser.add_argument("--max-round", type=int, help="focus group: messages per session")
+    parser.add_argument("--memory-window", type=int, help="focus group: messages sent verbatim, older ones are summarized")
+    parser.add_argument("--memory-token-budget", type=int, help="focus group: history tokens sent per reply")
+    parser.add_argument("--saturation-threshold", type=float, help="focus group: wrap up once novelty stays below this")
+    parser.add_argument("--executor", choices=["pool", "subprocess"], help="coder: run code on the warm worker pool or a new process per block")
+    parser.add_argument("--tool-executor", choices=["parallel", "serial"], help="tool_fanout: run one message's tool calls concurrently or one by one")
+    parser.add_argument("--image-latency", type=float, help="stub seconds per image generation (default: --latency)")
+    parser.add_argument("--rpm", type=int, help="survey: requests-per-minute quota to pace to")
+    parser.add_argument("--tpm", type=int, help="survey: tokens-per-minute quota to pace to")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON written by an earlier --output to compare against")
+    args = parser.parse_args(argv)
+
+    server = StubServer(
+        latency=args.latency, tokens_per_second=args.tokens_per_second, completion_tokens=args.completion_tokens,
+        error_rate=args.error_rate, retry_after=args.retry_after, image_latency=args.image_latency,
+    ).start()
+
+    results = {}
+    try:
+        for name in args.scenarios:
+            runs = [
+                run_scenario(
+                    server, name, stream=args.stream, max_round=args.max_round,
+                    memory_window=args.memory_window, memory_token_budget=args.memory_token_budget,
+                    saturation_threshold=args.saturation_threshold, rpm=args.rpm, tpm=args.tpm,
+                    executor=args.executor, tool_executor=args.tool_executor,
+                )
+                for _ in range(args.repeat)
+            ]
+            results[name] = average(runs)
+    finally:
+        server.shutdown()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)["results"]
+    print_report(results, baseline)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "settings": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+                "results": results,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+"""Benchmark scenarios. Each one rebuilds the hot path of an app against the stub server and times its turns.
+
+A scenario takes the running StubServer and returns {"turns": [seconds, ...]}; the runner adds the end-to-end
+time and the server's request and token counters. A turn is one agent reply (one LLM call for the analysis).
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from autogen import ConversableAgent, register_function
+from autogen.coding import LocalCommandLineCodeExecutor
+from autogen.io import IOConsole, IOStream
+from openai import AzureOpenAI
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'AutoGenMultiAgents'))
+sys.path.append(os.path.join(ROOT, 'AutoGenTwoAgents'))
+
+from executor_pool import get_executor_pool
+from focus_group import build_focus_group, run_focus_group
+from persona_generator import PopulationModel
+from survey import async_openai_client, run_survey
+from tool_executor import ParallelToolExecutor
+from shared.azure_clients import get_http_client
+from transcript_analysis import TranscriptAnalyzer
+from transcript_store import TranscriptRecord, count_tokens
+from web_search import BingSearchClient
+
+MODEL = "gpt-4o-mini"
+API_VERSION = "2024-02-01"
+
+
+class _SilentIOStream(IOConsole):
+    def print(self, *objects, sep=" ", end="\n", flush=False):
+        pass
+
+
+# autogen prints every message and streamed token to the default IOStream, from worker threads too; keep it quiet
+IOStream.set_global_default(_SilentIOStream())
+
+
+class TurnTimer:
+    """Times every generate_reply of the hooked agents, so parallel replies are each measured on their own."""
+
+    def __init__(self):
+        self.durations = []
+        self._lock = threading.Lock()
+
+    def hook(self, *agents):
+        for agent in agents:
+            agent.generate_reply = self._timed(agent.generate_reply)
+            agent.a_generate_reply = self._a_timed(agent.a_generate_reply)
+
+    def _record(self, start):
+        with self._lock:
+            self.durations.append(time.perf_counter() - start)
+
+    def _timed(self, generate_reply):
+        def timed_generate_reply(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return generate_reply(*args, **kwargs)
+            finally:
+                self._record(start)
+        return timed_generate_reply
+
+    def _a_timed(self, a_generate_reply):
+        async def timed_a_generate_reply(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await a_generate_reply(*args, **kwargs)
+            finally:
+                self._record(start)
+        return timed_a_generate_reply
+
+    def turns(self):
+        return list(self.durations)
+
+
+def llm_config(server, stream=False):
+    # the apps' config, pointed at the stub: same shared HTTP pool, an API key instead of the Azure AD token
+    return {
+        "config_list": [{
+            "model": MODEL,
+            "base_url": server.base_url,
+            "api_type": "azure",
+            "api_version": API_VERSION,
+            "api_key": "stub",
+            "max_tokens": 1000,
+            "http_client": get_http_client(),
+        }],
+        "cache_seed": None,
+        "stream": stream,
+    }
+
+
+def _tool_messages(request):
+    return sum(1 for message in request.get("messages", []) if message.get("role") == "tool")
+
+
+def _tool_call(name, arguments):
+    return {"id": f"call_{uuid.uuid4().hex[:8]}", "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}
+
+
+def focus_group(server, personas=4, max_round=10, speaking_mode="round", stream=False, memory_window=None, memory_token_budget=None,
+                saturation_threshold=None):
+    """One focus-group session from AutoGenMultiAgents/focus_group.py."""
+    panel = {f"Persona {i + 1}": {"Name": f"P{i + 1}", "Age": "25-34", "Occupation": "Management"} for i in range(personas)}
+    manager = build_focus_group(
+        panel, llm_config(server, stream), max_round=max_round, speaking_mode=speaking_mode, silent=True,
+        memory_window=memory_window, memory_token_budget=memory_token_budget, saturation_threshold=saturation_threshold,
+    )
+    timer = TurnTimer()
+    timer.hook(*manager.groupchat.agents)
+    run_focus_group(manager, "A reusable water bottle that tracks how much you drink.", silent=True)
+    return {"turns": timer.turns()}
+
+
+def coder(server, steps=3, stream=False, executor="pool"):
+    """The coderapp loop: the writer proposes pandas code, the executor runs it, `steps` times, then the writer terminates.
+
+    executor="pool" runs the code on coderapp's local warm worker pool (created on the first run), "subprocess" in a
+    new Python process per block; neither uses Docker, so the numbers exclude container start-up.
+    """
+    def responder(request, completion_tokens):
+        results = sum(1 for message in request.get("messages", []) if "exitcode:" in (message.get("content") or ""))
+        if results >= steps:
+            return {"content": "The task is done. TERMINATE"}
+        return {"content": f"Step {results + 1}:\n```python\nimport pandas as pd\nprint(pd.Series(range({(results + 1) * 1000})).sum())\n```"}
+
+    server.state.responder = responder
+    with tempfile.TemporaryDirectory() as work_dir:
+        if executor == "pool":
+            # the pool outlives this run, so it gets no directory of its own; the code runs in this run's work_dir
+            code_executor = get_executor_pool("local", size=2, timeout=10, work_dir=tempfile.gettempdir()).executor(work_dir=work_dir)
+        else:
+            code_executor = LocalCommandLineCodeExecutor(timeout=10, work_dir=work_dir)
+        executor_agent = ConversableAgent(
+            "code_executor",
+            llm_config=False,
+            code_execution_config={"executor": code_executor},
+            human_input_mode="NEVER",
+            is_termination_msg=lambda x: (x.get("content") or "").strip().endswith("TERMINATE"),
+        )
+        writer_agent = ConversableAgent(
+            "code_writer_agent",
+            system_message="Solve tasks using your coding and language skills. Reply \"TERMINATE\" in the end when everything is done.",
+            llm_config=llm_config(server, stream),
+            code_execution_config=False,
+            max_consecutive_auto_reply=20,
+            human_input_mode="NEVER",
+        )
+        timer = TurnTimer()
+        timer.hook(executor_agent, writer_agent)
+        executor_agent.initiate_chat(
+            writer_agent,
+            message="Compute a few sums.",
+            max_consecutive_auto_reply=10,
+            silent=True,
+        )
+        if executor == "pool":
+            code_executor.release()
+    return {"turns": timer.turns()}
+
+
+def multitools(server, stream=False):
+    """The multitoolsapp loop: a web search tool call, an image tool call, then the final answer."""
+    def responder(request, completion_tokens):
+        if not request.get("tools"):
+            return {"content": "Looks right, go ahead."}
+        done = _tool_messages(request)
+        if done == 0:
+            return {"tool_calls": [_tool_call("web_searcher", {"query": "best reusable water bottles"})]}
+        if done == 1:
+            return {"tool_calls": [_tool_call("image_generator", {"prompt": "a reusable water bottle"})]}
+        return {"content": " ".join(["answer"] * completion_tokens) + " TERMINATE"}
+
+    server.state.responder = responder
+    search_client = BingSearchClient(f"{server.base_url}/v7.0/search", "stub", count=3)
+    image_client = AzureOpenAI(api_key="stub", api_version=API_VERSION, azure_endpoint=server.base_url, http_client=get_http_client())
+
+    def web_searcher(query: str, up_to_date: bool = False) -> str:
+        return search_client.search(query, up_to_date=up_to_date)
+
+    def image_generator(prompt: str) -> str:
+        return image_client.images.generate(model="dall-e-3", prompt=prompt, n=1).data[0].url
+
+    config = llm_config(server, stream)
+    assistant = ConversableAgent(
+        name="Assistant",
+        system_message="You have access to 2 tools: web_searcher and image_generator. Return 'TERMINATE' when the task is done.",
+        llm_config=config,
+    )
+    user_proxy = ConversableAgent(
+        name="User",
+        llm_config=config,
+        is_termination_msg=lambda msg: msg.get("content") is not None and "TERMINATE" in msg["content"],
+        human_input_mode="NEVER",
+    )
+    register_function(web_searcher, caller=assistant, executor=user_proxy, name="web_searcher", description="Search the web.")
+    register_function(image_generator, caller=assistant, executor=user_proxy, name="image_generator", description="Generate an image.")
+    timer = TurnTimer()
+    timer.hook(assistant, user_proxy)
+    user_proxy.initiate_chat(assistant, message="Find a good water bottle and draw it.", max_turns=6, silent=True)
+    return {"turns": timer.turns()}
+
+
+def tool_fanout(server, searches=3, tool_executor="parallel"):
+    """One multitoolsapp turn in which the assistant asks for `searches` web searches and an image at once.
+
+    tool_executor="parallel" runs the calls with multitoolsapp's ParallelToolExecutor, "serial" with autogen's
+    default, which runs synchronous tools one after another. Use --image-latency to make the image as slow as
+    DALL-E is.
+    """
+    def responder(request, completion_tokens):
+        if not request.get("tools"):
+            return {"content": "Looks right, go ahead."}
+        if _tool_messages(request) == 0:
+            calls = [_tool_call("web_searcher", {"query": f"water bottle review {i}"}) for i in range(searches)]
+            return {"tool_calls": calls + [_tool_call("image_generator", {"prompt": "a reusable water bottle"})]}
+        return {"content": "Here it is. TERMINATE"}
+
+    server.state.responder = responder
+    search_client = BingSearchClient(f"{server.base_url}/v7.0/search", "stub", count=3)
+    image_client = AzureOpenAI(api_key="stub", api_version=API_VERSION, azure_endpoint=server.base_url, http_client=get_http_client())
+
+    def web_searcher(query: str, up_to_date: bool = False) -> str:
+        return search_client.search(query, up_to_date=up_to_date)
+
+    def image_generator(prompt: str) -> str:
+        return image_client.images.generate(model="dall-e-3", prompt=prompt, n=1).data[0].url
+
+    assistant = ConversableAgent(name="Assistant", system_message="Use the tools. Return 'TERMINATE' when done.", llm_config=llm_config(server))
+    user_proxy = ConversableAgent(
+        name="User",
+        llm_config=False,
+        is_termination_msg=lambda msg: msg.get("content") is not None and "TERMINATE" in msg["content"],
+        human_input_mode="NEVER",
+    )
+    register_function(web_searcher, caller=assistant, executor=user_proxy, name="web_searcher", description="Search the web.")
+    register_function(image_generator, caller=assistant, executor=user_proxy, name="image_generator", description="Generate an image.")
+    if tool_executor == "parallel":
+        executor = ParallelToolExecutor()
+        executor.register(user_proxy)
+    timer = TurnTimer()
+    timer.hook(user_proxy)
+    asyncio.run(user_proxy.a_initiate_chat(assistant, message="Find three water bottle reviews and draw one.", max_turns=2, silent=True))
+    if tool_executor == "parallel":
+        executor.close()
+    return {"turns": timer.turns()}
+
+
+class _TimedAnalyzer(TranscriptAnalyzer):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = []
+
+    def _complete(self, prompt):
+        start = time.perf_counter()
+        try:
+            return super()._complete(prompt)
+        finally:
+            self.calls.append(time.perf_counter() - start)
+
+
+def analysis(server, records=400, chunk_tokens=2000, max_workers=4):
+    """Final analysis of a synthetic transcript of `records` messages with TranscriptAnalyzer."""
+    client = AzureOpenAI(api_key="stub", api_version=API_VERSION, azure_endpoint=server.base_url, http_client=get_http_client())
+    transcript = []
+    for seq in range(records):
+        content = f"Message {seq}: " + " ".join(["opinion"] * 40)
+        transcript.append(TranscriptRecord(seq, f"P{seq % 4 + 1}", time.time(), count_tokens(content), content))
+    analyzer = _TimedAnalyzer(client, model=MODEL, chunk_tokens=chunk_tokens, max_workers=max_workers)
+    analyzer.analyze(transcript)
+    return {"turns": analyzer.calls}
+
+
+def mixed(server, batch_workers=48, interactive_requests=20):
+    """Interactive chat turns while `batch_workers` threads flood the same deployment with batch requests.
+
+    The turns are the interactive requests only; with the scheduler their p95 should stay close to an idle run's.
+    """
+    def client(priority):
+        return AzureOpenAI(api_key="stub", api_version=API_VERSION, azure_endpoint=server.base_url, http_client=get_http_client(priority))
+
+    def ask(openai_client):
+        openai_client.chat.completions.create(model=MODEL, messages=[{"role": "user", "content": "Hello"}], max_tokens=50)
+
+    interactive, batch = client("interactive"), client("batch")
+    stop = threading.Event()
+
+    def flood():
+        while not stop.is_set():
+            ask(batch)
+
+    turns = []
+    with ThreadPoolExecutor(batch_workers) as pool:
+        for _ in range(batch_workers):
+            pool.submit(flood)
+        time.sleep(0.5)
+        for _ in range(interactive_requests):
+            start = time.perf_counter()
+            ask(interactive)
+            turns.append(time.perf_counter() - start)
+        stop.set()
+    return {"turns": turns}
+
+
+def survey(server, personas=200, concurrency=32, rpm=6000, tpm=1000000):
+    """A survey of `personas` synthetic personas with survey.py, paced to the given quota."""
+    population = PopulationModel().sample(personas, seed=0)
+    panel = {f"Persona {i}": record for i, record in enumerate(population.records())}
+    client = async_openai_client(concurrency, api_version=API_VERSION, azure_endpoint=server.base_url, api_key="stub")
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, "survey.jsonl")
+        asyncio.run(run_survey(
+            panel, "A reusable water bottle that tracks how much you drink.", ["Would you buy it?", "What would you pay?"],
+            output, rpm, tpm, model=MODEL, concurrency=concurrency, client=client,
+        ))
+        with open(output, 'r', encoding='utf-8') as f:
+            results = [json.loads(line) for line in f]
+    return {"turns": [result["seconds"] for result in results if "seconds" in result]}
+
+
+SCENARIOS = {
+    "focus_group": focus_group,
+    "coder": coder,
+    "multitools": multitools,
+    "tool_fanout": tool_fanout,
+    "analysis": analysis,
+    "survey": survey,
+    "mixed": mixed,
+}
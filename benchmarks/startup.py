@@ -0,0 +1,143 @@
+"""Measure the cold start of every Streamlit page and fail when a page's imports go over budget.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --pages coderapp --scale 1.5 --output benchmarks/results/startup.json
+
+Each page runs in a fresh `python -X importtime` process under Streamlit's AppTest, once cold and once as a rerun.
+The import cost of a page is the cumulative import time of the modules its first run loaded, minus that of an
+empty page (the harness's own lazy imports). Exits with status 1 if any page raises or is over its budget times
+--scale; raise --scale on slow machines rather than the budgets.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MARKER = "startup-benchmark: page run starts"
+
+# page: (script, import budget in milliseconds)
+# autogen, openai, azure.identity and pandas are loaded on first use, so no page should pay for them at start-up;
+# Multi_Agent_App's budget includes the pandas that st.dataframe imports
+PAGES = {
+    "two_agents_app": ("AutoGenTwoAgents/two_agents_app.py", 500),
+    "coderapp": ("AutoGenTwoAgents/coderapp.py", 500),
+    "multitoolsapp": ("AutoGenTwoAgents/multitoolsapp.py", 600),
+    "Multi_Agent_App": ("AutoGenMultiAgents/Multi_Agent_App.py", 900),
+    "Run_Virtual_Focus_Group": ("AutoGenMultiAgents/pages/1 Run_Virtual_Focus_Group.py", 500),
+    "Analyze_Final_Results": ("AutoGenMultiAgents/pages/Analyze_Final_Results.py", 500),
+}
+
+# Pages run without Azure: nothing connects at start-up, and code runs on local workers instead of Docker
+ENVIRONMENT = {
+    "AOAI_API_BASE": "http://127.0.0.1:9",
+    "AOAI_API_VERSION": "2024-02-01",
+    "GPT_4o_mini_Model_Name": "gpt-4o-mini",
+    "CODE_EXECUTOR_BACKEND": "local",
+    "CODE_EXECUTOR_WORKERS": "1",
+}
+
+
+def child(script):
+    """Run `script` twice under AppTest in this process and print the timings as JSON."""
+    import time
+
+    from streamlit.testing.v1 import AppTest
+
+    print(MARKER, file=sys.stderr, flush=True)
+    app = AppTest.from_file(script, default_timeout=120)
+    start = time.perf_counter()
+    app.run()
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    app.run()
+    rerun = time.perf_counter() - start
+    errors = [str(exception.message) for exception in app.exception]
+    print(json.dumps({"cold_seconds": cold, "rerun_seconds": rerun, "errors": errors}))
+
+
+def parse_importtime(stderr):
+    """(total milliseconds, {module: milliseconds}) of the top-level imports logged after MARKER."""
+    lines = stderr.splitlines()
+    if MARKER in lines:
+        lines = lines[lines.index(MARKER) + 1:]
+    modules = {}
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # nested imports are indented under the module that triggered them
+        if cumulative.strip().isdigit() and not name[1:].startswith(" "):
+            modules[name.strip()] = modules.get(name.strip(), 0) + int(cumulative) / 1000
+    return sum(modules.values()), modules
+
+
+def measure(script, work_dir):
+    environment = dict(os.environ, **ENVIRONMENT)
+    environment.setdefault("COMPLETION_CACHE_PATH", os.path.join(work_dir, "completions.sqlite"))
+    environment.setdefault("EXECUTION_CACHE_PATH", os.path.join(work_dir, "executions.sqlite"))
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.abspath(__file__), "--child", script],
+        cwd=work_dir, env=environment, capture_output=True, text=True, timeout=600,
+    )
+    if process.returncode != 0:
+        raise RuntimeError(f"{script} failed:\n{process.stderr[-2000:]}")
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    result["import_ms"], result["modules"] = parse_importtime(process.stderr)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", nargs="+", choices=list(PAGES), default=list(PAGES))
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every budget, e.g. on a slow machine")
+    parser.add_argument("--top", type=int, default=3, help="heaviest imports shown per page")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        return child(args.child)
+
+    results, over = {}, []
+    with tempfile.TemporaryDirectory() as work_dir:
+        empty = os.path.join(work_dir, "empty_page.py")
+        with open(empty, 'w') as f:
+            f.write("import streamlit as st\nst.write('empty')\n")
+        baseline = measure(empty, work_dir)["import_ms"]
+        print(f"{'page':<26}{'imports ms':>12}{'budget ms':>12}{'cold s':>9}{'rerun s':>9}  heaviest imports")
+        for name in args.pages:
+            script, budget = PAGES[name]
+            result = measure(os.path.join(ROOT, script), work_dir)
+            result["import_ms"] = max(0.0, result["import_ms"] - baseline)
+            result["budget_ms"] = budget * args.scale
+            heaviest = sorted(result.pop("modules").items(), key=lambda item: -item[1])[:args.top]
+            result["heaviest"] = heaviest
+            results[name] = result
+            status = "" if result["import_ms"] <= result["budget_ms"] else "  OVER BUDGET"
+            if status:
+                over.append(name)
+            print(
+                f"{name:<26}{result['import_ms']:>12.0f}{result['budget_ms']:>12.0f}{result['cold_seconds']:>9.2f}"
+                f"{result['rerun_seconds']:>9.3f}  " + ", ".join(f"{module} {ms:.0f}" for module, ms in heaviest) + status
+            )
+            for error in result["errors"]:
+                print(f"    {name} raised: {error.splitlines()[0] if error else error}")
+            # a page that raises stops early, so its import time would look better than it is
+            if result["errors"] and name not in over:
+                over.append(name)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({"python": platform.python_version(), "results": results}, f, indent=2)
+    if over:
+        print(f"Over the import budget or failed: {', '.join(over)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
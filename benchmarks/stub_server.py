@@ -0,0 +1,234 @@
+"""Local stand-in for the Azure OpenAI chat/images APIs and the Bing Web Search API.
+
+Responses are synthetic, but their timing is controlled: every request waits `latency` seconds (time to first
+token), then the completion is produced at `tokens_per_second`. A fraction `error_rate` of the chat requests
+is answered with 429 and a Retry-After header, as Azure does when a deployment's quota is exhausted.
+The server counts requests, prompt tokens received and completion tokens sent, so a benchmark can report
+what a scenario would have cost.
+
+    python benchmarks/stub_server.py --port 8000 --latency 0.3 --tokens-per-second 80 --error-rate 0.05
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import tiktoken
+
+_encoding = None
+
+
+def count_tokens(text):
+    global _encoding
+    if _encoding is None:
+        _encoding = tiktoken.get_encoding("o200k_base")
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def prompt_text(request):
+    parts = []
+    for message in request.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        parts.append(content or "")
+        if message.get("tool_calls"):
+            parts.append(json.dumps(message["tool_calls"]))
+    if request.get("tools"):
+        parts.append(json.dumps(request["tools"]))
+    return "\n".join(parts)
+
+
+def default_responder(request, completion_tokens):
+    """A plain text reply of `completion_tokens` words."""
+    return {"content": " ".join(["lorem"] * completion_tokens)}
+
+
+class StubState:
+    def __init__(self, latency=0.2, tokens_per_second=100.0, completion_tokens=60, error_rate=0.0, retry_after=1.0, seed=0,
+                 image_latency=None):
+        self.latency = latency
+        # image generation is much slower than a chat completion's first token; defaults to `latency`
+        self.image_latency = image_latency
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Zero the counters and go back to the default responder."""
+        with self._lock:
+            # responder(request, completion_tokens) -> {"content": ...} or {"tool_calls": [...]}; scenarios replace it
+            self.responder = default_responder
+            self.stats = {
+                "chat_requests": 0,
+                "image_requests": 0,
+                "search_requests": 0,
+                "throttled": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+            }
+
+    def count(self, **deltas):
+        with self._lock:
+            for key, value in deltas.items():
+                self.stats[key] += value
+
+    def throttle(self):
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if not url.path.endswith("/search"):
+            return self._send_json(404, {"error": {"message": f"unknown path {url.path}"}})
+        query = parse_qs(url.query).get("q", [""])[0]
+        count = int(parse_qs(url.query).get("count", ["3"])[0])
+        self.state.count(search_requests=1)
+        time.sleep(self.state.latency)
+        pages = [
+            {"name": f"Result {i + 1} for {query}", "url": f"https://example.com/{i + 1}", "snippet": f"Snippet {i + 1} about {query}."}
+            for i in range(count)
+        ]
+        self._send_json(200, {"webPages": {"value": pages}})
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        request = self._read_json()
+        if path.endswith("/chat/completions"):
+            return self._chat(request)
+        if path.endswith("/images/generations"):
+            self.state.count(image_requests=1)
+            time.sleep(self.state.latency if self.state.image_latency is None else self.state.image_latency)
+            return self._send_json(200, {"created": int(time.time()), "data": [{"url": f"https://example.com/{uuid.uuid4().hex}.png"}]})
+        self._send_json(404, {"error": {"message": f"unknown path {path}"}})
+
+    def _chat(self, request):
+        state = self.state
+        if state.throttle():
+            state.count(throttled=1)
+            return self._send_json(
+                429,
+                {"error": {"code": "429", "message": "Rate limit is exceeded."}},
+                {"Retry-After": str(state.retry_after), "retry-after-ms": str(int(state.retry_after * 1000))},
+            )
+        prompt_tokens = count_tokens(prompt_text(request))
+        reply = state.responder(request, state.completion_tokens)
+        content = reply.get("content")
+        tool_calls = reply.get("tool_calls")
+        completion_tokens = count_tokens(content or json.dumps(tool_calls))
+        state.count(chat_requests=1, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex}", "created": int(time.time()), "model": request.get("model", "gpt-4o-mini")}
+        finish_reason = "tool_calls" if tool_calls else "stop"
+
+        time.sleep(state.latency)
+        if not request.get("stream"):
+            time.sleep(completion_tokens / state.tokens_per_second)
+            message = {"role": "assistant", "content": content}
+            if tool_calls:
+                message["tool_calls"] = tool_calls
+            return self._send_json(200, {
+                **base, "object": "chat.completion", "usage": usage,
+                "choices": [{"index": 0, "finish_reason": finish_reason, "message": message}],
+            })
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        if tool_calls:
+            deltas = [{"role": "assistant", "tool_calls": [{"index": i, **call} for i, call in enumerate(tool_calls)]}]
+        else:
+            words = content.split(" ")
+            deltas = [{"content": word if i == 0 else " " + word} for i, word in enumerate(words)]
+        for i, delta in enumerate(deltas):
+            time.sleep(1 / state.tokens_per_second)
+            chunk = {**base, "object": "chat.completion.chunk", "choices": [
+                {"index": 0, "delta": delta, "finish_reason": finish_reason if i == len(deltas) - 1 else None}
+            ]}
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+        self._write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, text):
+        data = text.encode('utf-8')
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, **options):
+        super().__init__((host, port), StubHandler)
+        self.state = StubState(**options)
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serve in a background thread. Returns the server."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Azure OpenAI / Bing stub server for benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=100.0)
+    parser.add_argument("--completion-tokens", type=int, default=60)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of chat requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--image-latency", type=float, help="seconds per image generation (default: --latency)")
+    args = parser.parse_args()
+    server = StubServer(
+        args.host, args.port, latency=args.latency, tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens, error_rate=args.error_rate, retry_after=args.retry_after,
+        image_latency=args.image_latency,
+    )
+    print(f"Stub server on {server.base_url} (AOAI_API_BASE={server.base_url}, BING_SEARCH_API_ENDPOINT={server.base_url}/v7.0/search)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+import os
+import threading
+import time
+import weakref
+
+import httpx
+
+from shared.llm_scheduler import get_scheduler
+
+SCOPE = "https://cognitiveservices.azure.com/.default"
+
+
+class CachedTokenProvider:
+    """Azure AD bearer token provider that reuses one token until shortly before it expires.
+
+    A background timer fetches the next token `refresh_margin` seconds before expiry, so callers
+    never wait on the credential chain after the first call.
+    """
+
+    def __init__(self, credential=None, scope=SCOPE, refresh_margin=300):
+        self._credential = credential
+        self.scope = scope
+        self.refresh_margin = refresh_margin
+        self._token = None
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        token = self._token
+        if token is None or token.expires_on - time.time() < 30:
+            with self._lock:
+                if self._token is token:
+                    self._refresh()
+                token = self._token
+        return token.token
+
+    def _refresh(self):
+        if self._credential is None:
+            # azure.identity and openai are imported on first use; pages that never call Azure do not pay for them
+            from azure.identity import DefaultAzureCredential
+
+            self._credential = DefaultAzureCredential()
+        self._token = self._credential.get_token(self.scope)
+        if self._timer is not None:
+            self._timer.cancel()
+        lifetime = self._token.expires_on - time.time()
+        delay = max(lifetime - self.refresh_margin, lifetime / 2)
+        self._timer = threading.Timer(delay, self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self):
+        with self._lock:
+            try:
+                self._refresh()
+            except Exception:
+                # keep the current token; the next call refreshes synchronously if it has expired
+                pass
+
+    def __deepcopy__(self, memo):
+        # autogen deep-copies llm_config; all agents should share this provider
+        return self
+
+
+_open_streams = threading.local()
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """Response body that gives the request's scheduler slot back once it has been read or closed.
+
+    A consumer that stops reading without closing the body (a cancelled chat raises out of autogen's streaming loop)
+    would hold the slot and the pooled connection forever, so the body is also closed when it is garbage collected,
+    and close_thread_streams() closes the bodies still open in the current thread.
+    """
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+        if not hasattr(_open_streams, "streams"):
+            _open_streams.streams = weakref.WeakSet()
+        _open_streams.streams.add(self)
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        release, self._release = self._release, None
+        if release is None:
+            return
+        try:
+            self._stream.close()
+        finally:
+            release()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+def close_thread_streams():
+    """Close every response body the current thread opened and has not closed, releasing their scheduler slots."""
+    for stream in list(getattr(_open_streams, "streams", ())):
+        stream.close()
+    _open_streams.streams = weakref.WeakSet()
+
+
+class _CountingTransport(httpx.HTTPTransport):
+    """HTTP transport that counts requests and newly opened connections, to show pool reuse.
+
+    Every request is admitted by the process-wide LLMScheduler under this transport's priority class, and holds
+    its slot until the response body (possibly a stream) is closed.
+    """
+
+    def __init__(self, priority="interactive", **kwargs):
+        super().__init__(**kwargs)
+        self.priority = priority
+        self.requests = 0
+        self.connections_opened = 0
+        self._known = weakref.WeakSet()
+        self._stats_lock = threading.Lock()
+
+    def handle_request(self, request):
+        scheduler = get_scheduler()
+        admitted = scheduler.acquire(self.priority)
+        try:
+            response = super().handle_request(request)
+        except Exception:
+            scheduler.release(self.priority, admitted)
+            raise
+        latency = time.monotonic() - admitted
+        response.stream = _ReleasingStream(
+            response.stream, lambda: scheduler.release(self.priority, admitted, response.status_code, latency)
+        )
+        with self._stats_lock:
+            self.requests += 1
+            for connection in self._pool.connections:
+                if connection not in self._known:
+                    self._known.add(connection)
+                    self.connections_opened += 1
+        return response
+
+    def stats(self):
+        connections = self._pool.connections
+        return {
+            "requests": self.requests,
+            "connections_opened": self.connections_opened,
+            "requests_on_reused_connections": self.requests - self.connections_opened,
+            "open_connections": len(connections),
+            "idle_connections": sum(1 for connection in connections if connection.is_idle()),
+        }
+
+
+class PooledHttpClient(httpx.Client):
+    """httpx client with a keep-alive connection pool, shared by every Azure OpenAI client of one priority class."""
+
+    def __init__(self, priority="interactive", max_connections=100, max_keepalive_connections=20, keepalive_expiry=60.0,
+                 **kwargs):
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.pool_transport = _CountingTransport(priority=priority, limits=limits)
+        super().__init__(transport=self.pool_transport, timeout=httpx.Timeout(600.0, connect=10.0), **kwargs)
+
+    def __deepcopy__(self, memo):
+        # autogen deep-copies llm_config; copying the client would defeat the shared pool
+        return self
+
+
+_lock = threading.Lock()
+_token_provider = None
+_http_clients = {}
+_openai_clients = {}
+
+
+def get_token_provider():
+    global _token_provider
+    with _lock:
+        if _token_provider is None:
+            _token_provider = CachedTokenProvider()
+        return _token_provider
+
+
+def get_http_client(priority="interactive"):
+    """The shared HTTP client of a scheduler priority class: "interactive" for chats a user waits on, "batch" for
+    background work that should only use capacity interactive requests leave over."""
+    with _lock:
+        if priority not in _http_clients:
+            _http_clients[priority] = PooledHttpClient(priority=priority)
+        return _http_clients[priority]
+
+
+def get_openai_client(api_version=None, azure_endpoint=None, priority="interactive"):
+    """A ready AzureOpenAI client on the shared credential and connection pool, one per endpoint, API version and priority."""
+    api_version = api_version or os.getenv("AOAI_API_VERSION")
+    azure_endpoint = azure_endpoint or os.getenv("AOAI_API_BASE")
+    token_provider, http_client = get_token_provider(), get_http_client(priority)
+    with _lock:
+        key = (azure_endpoint, api_version, priority)
+        if key not in _openai_clients:
+            from openai import AzureOpenAI
+
+            _openai_clients[key] = AzureOpenAI(
+                azure_ad_token_provider=token_provider,
+                api_version=api_version,
+                azure_endpoint=azure_endpoint,
+                http_client=http_client,
+            )
+        return _openai_clients[key]
+
+
+def azure_config(model, max_tokens=1000, api_version=None, base_url=None, priority="interactive"):
+    """One autogen config_list entry for an Azure OpenAI deployment, using the shared credential and pool."""
+    return {
+        "model": model,
+        "base_url": base_url or os.getenv("AOAI_API_BASE"),
+        "api_type": "azure",
+        "api_version": api_version or os.getenv("AOAI_API_VERSION"),
+        "max_tokens": max_tokens,
+        "azure_ad_token_provider": get_token_provider(),
+        "http_client": get_http_client(priority),
+    }
+
+
+def pool_stats(priority="interactive"):
+    """Request and connection counts of the shared pool; requests_on_reused_connections > 0 confirms keep-alive reuse."""
+    return get_http_client(priority).pool_transport.stats()
+
+
+def scheduler_stats():
+    """Concurrency limit and per-priority queue depth and wait times of the LLM request scheduler."""
+    return get_scheduler().stats()
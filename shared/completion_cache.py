@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_PATH = os.getenv(
+    "COMPLETION_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "completions.sqlite"),
+)
+
+# Request parameters that change the completion. Everything else (endpoint, credentials, stream) is ignored.
+SAMPLING_PARAMS = (
+    "temperature", "top_p", "max_tokens", "n", "seed", "stop", "presence_penalty", "frequency_penalty",
+    "logit_bias", "response_format", "tools", "tool_choice", "functions", "function_call",
+)
+
+
+def completion_key(params):
+    """Hash of the model, the normalized messages and the sampling params of a chat completion request."""
+    messages = [
+        {k: v.strip() if k == "content" and isinstance(v, str) else v for k, v in message.items() if v is not None}
+        for message in params.get("messages", [])
+    ]
+    payload = {"model": params.get("model"), "messages": messages}
+    payload.update({k: params[k] for k in SAMPLING_PARAMS if params.get(k) is not None})
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class CompletionCache:
+    """Disk-backed chat completion cache shared by every agent and app in the repo.
+
+    Entries live in one SQLite database (WAL mode, one connection per thread, so several Streamlit sessions
+    and processes can use it at once). When the stored responses exceed `max_bytes`, the least recently used
+    entries are evicted. Hits and misses are counted per `app` in the database.
+
+    It implements autogen's cache protocol, so it can be given as "cache" in an llm_config; keys from autogen
+    are normalized with completion_key() like those from chat_completion(), so both paths share entries.
+    """
+
+    def __init__(self, app, path=DEFAULT_PATH, max_bytes=512 * 1024 * 1024):
+        self.app = app
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS completions "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS completions_last_access ON completions (last_access)")
+            db.execute("CREATE TABLE IF NOT EXISTS stats (app TEXT PRIMARY KEY, hits INTEGER NOT NULL, misses INTEGER NOT NULL)")
+
+    def _connect(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _normalize(self, key):
+        try:
+            return completion_key(json.loads(key))
+        except (TypeError, ValueError, AttributeError):
+            return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def _count(self, hit):
+        self._connect().execute(
+            "INSERT INTO stats (app, hits, misses) VALUES (?, ?, ?) "
+            "ON CONFLICT(app) DO UPDATE SET hits = hits + excluded.hits, misses = misses + excluded.misses",
+            (self.app, int(hit), int(not hit)),
+        )
+
+    def _get(self, key):
+        db = self._connect()
+        row = db.execute("SELECT value FROM completions WHERE key = ?", (key,)).fetchone()
+        self._count(row is not None)
+        if row is None:
+            return None
+        db.execute("UPDATE completions SET last_access = ? WHERE key = ?", (time.time(), key))
+        from openai.types.chat import ChatCompletion
+
+        return ChatCompletion.model_validate_json(row[0])
+
+    def _set(self, key, response):
+        # message_retrieval_function is a bound method autogen attaches to responses; it is not data
+        value = response.model_dump_json(exclude={"message_retrieval_function"})
+        db = self._connect()
+        db.execute(
+            "INSERT OR REPLACE INTO completions (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+            (key, value, len(value), time.time()),
+        )
+        self._evict(db)
+
+    def _evict(self, db):
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - int(self.max_bytes * 0.9)
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            freed = 0
+            for key, size in db.execute("SELECT key, size FROM completions ORDER BY last_access").fetchall():
+                if freed >= excess:
+                    break
+                db.execute("DELETE FROM completions WHERE key = ?", (key,))
+                freed += size
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    # autogen cache protocol
+    def get(self, key, default=None):
+        response = self._get(self._normalize(key))
+        return default if response is None else response
+
+    def set(self, key, value):
+        self._set(self._normalize(key), value)
+
+    def close(self):
+        # shared by many agents; autogen closes its cache after every call, so this is a no-op
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __deepcopy__(self, memo):
+        # autogen deep-copies llm_config; every agent should use this same cache
+        return self
+
+    def chat_completion(self, client, **params):
+        """client.chat.completions.create(**params), answered from the cache when the same request was made before."""
+        key = completion_key(params)
+        response = self._get(key)
+        if response is None:
+            response = client.chat.completions.create(**params)
+            self._set(key, response)
+        return response
+
+    def stats(self):
+        """Hits, misses and hit rate per app."""
+        rows = self._connect().execute("SELECT app, hits, misses FROM stats ORDER BY app").fetchall()
+        return {
+            app: {"hits": hits, "misses": misses, "hit_rate": hits / (hits + misses) if hits + misses else 0.0}
+            for app, hits, misses in rows
+        }
+
+
+_caches = {}
+_lock = threading.Lock()
+
+
+def get_completion_cache(app):
+    """The process-wide CompletionCache handle for `app`."""
+    with _lock:
+        if app not in _caches:
+            _caches[app] = CompletionCache(app)
+        return _caches[app]
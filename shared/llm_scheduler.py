@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import deque
+
+# Highest priority first
+PRIORITIES = ("interactive", "batch")
+
+
+class _ClassStats:
+    def __init__(self):
+        self.queued = 0
+        self.max_queued = 0
+        self.requests = 0
+        self.throttled = 0
+        self.waits = deque(maxlen=1000)
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class LLMScheduler:
+    """Process-wide admission control for Azure OpenAI requests, by priority class.
+
+    At most `limit` requests are in flight. Waiting interactive requests always go before batch ones, and batch
+    requests may only fill the slots above `interactive_reserve` of the limit, so an interactive request never
+    waits for a long batch request to finish. The limit adapts AIMD-style: +1 per limit successful requests,
+    halved on a 429 (at most once per `cooldown` seconds), and reduced by 10% while the median time to response
+    headers of the last `latency_window` requests exceeds `latency_factor` times the lowest such median seen.
+    Using medians keeps a single long completion from counting as congestion.
+    """
+
+    def __init__(self, initial_limit=16, min_limit=2, max_limit=64, interactive_reserve=0.25, latency_factor=3.0,
+                 latency_window=20, cooldown=1.0):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.interactive_reserve = interactive_reserve
+        self.latency_factor = latency_factor
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.decreases = 0
+        self._last_decrease = 0.0
+        self._latencies = deque(maxlen=latency_window)
+        self.baseline_latency = None
+        self._stats = {priority: _ClassStats() for priority in PRIORITIES}
+        self._condition = threading.Condition()
+
+    def _capacity(self, priority):
+        limit = int(self.limit)
+        if priority == PRIORITIES[0]:
+            return limit
+        return max(1, limit - max(1, int(limit * self.interactive_reserve)))
+
+    def _may_start(self, priority):
+        higher = PRIORITIES[:PRIORITIES.index(priority)]
+        if any(self._stats[other].queued for other in higher):
+            return False
+        return self.in_flight < self._capacity(priority)
+
+    def acquire(self, priority="interactive"):
+        """Block until the request may start. Returns the time it was admitted, for release()."""
+        stats = self._stats[priority]
+        start = time.monotonic()
+        with self._condition:
+            stats.queued += 1
+            stats.max_queued = max(stats.max_queued, stats.queued)
+            try:
+                while not self._may_start(priority):
+                    self._condition.wait()
+            finally:
+                stats.queued -= 1
+            self.in_flight += 1
+            stats.requests += 1
+            admitted = time.monotonic()
+            stats.waits.append(admitted - start)
+        return admitted
+
+    def release(self, priority, admitted, status=None, latency=None):
+        """A request finished. `status` is its HTTP status (None if it failed without one), `latency` the seconds
+        from admission to response headers."""
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if status == 429:
+                self._stats[priority].throttled += 1
+                self._decrease(now, 0.5)
+            elif status is not None and status < 500 and latency is not None:
+                self._latencies.append(latency)
+                if self._congested():
+                    self._decrease(now, 0.9)
+                else:
+                    self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._condition.notify_all()
+
+    def _congested(self):
+        if len(self._latencies) < self._latencies.maxlen:
+            return False
+        median = _percentile(self._latencies, 50)
+        if self.baseline_latency is None or median < self.baseline_latency:
+            self.baseline_latency = median
+        return median > self.latency_factor * self.baseline_latency
+
+    def _decrease(self, now, factor):
+        # one decrease per cooldown: a burst of 429s is one congestion signal, not many
+        if now - self._last_decrease >= self.cooldown:
+            self.limit = max(self.min_limit, self.limit * factor)
+            self._last_decrease = now
+            self.decreases += 1
+
+    def stats(self):
+        with self._condition:
+            return {
+                "limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "decreases": self.decreases,
+                "baseline_latency": self.baseline_latency and round(self.baseline_latency, 4),
+                "classes": {
+                    priority: {
+                        "queued": stats.queued,
+                        "max_queued": stats.max_queued,
+                        "requests": stats.requests,
+                        "throttled": stats.throttled,
+                        "wait_p50": round(_percentile(stats.waits, 50), 4),
+                        "wait_p95": round(_percentile(stats.waits, 95), 4),
+                    }
+                    for priority, stats in self._stats.items()
+                },
+            }
+
+
+_scheduler = None
+_lock = threading.Lock()
+
+
+def get_scheduler():
+    global _scheduler
+    with _lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler()
+        return _scheduler
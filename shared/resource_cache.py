@@ -0,0 +1,28 @@
+import hashlib
+import json
+
+
+def _stable(obj):
+    # Callables and clients (e.g. an azure_ad_token_provider) are identified by type, not by address,
+    # so an otherwise identical config hashes the same on every rerun.
+    return f"<{type(obj).__module__}.{type(obj).__qualname__}>"
+
+
+def fingerprint(*objects):
+    """A stable hash of JSON-like data, used as the cache key of resources built from it."""
+    payload = json.dumps(objects, sort_keys=True, default=_stable)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def session_resource(session_state, name, key, build):
+    """Return the resource stored under `name` in session_state if it was built for `key`, else rebuild it.
+
+    Only one entry is kept per name, so a resource built for stale inputs is dropped as soon as the inputs change.
+    Resources live in the session rather than in st.cache_resource because agents carry per-chat state and
+    must not be shared between users.
+    """
+    entry = session_state.get(name)
+    if entry is None or entry[0] != key:
+        entry = (key, build())
+        session_state[name] = entry
+    return entry[1]
@@ -0,0 +1,119 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+import weakref
+
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+
+class _ScriptContext:
+    """The ScriptRunContext of the script run that started the current chat.
+
+    Streamlit calls only work in threads attached to a run's context, and each rerun may have a new one, so the loop
+    thread and its worker threads attach to whichever run submitted the chat they are working on.
+    """
+
+    def __init__(self):
+        self.ctx = None
+
+    def attach(self):
+        if self.ctx is not None:
+            add_script_run_ctx(threading.current_thread(), self.ctx)
+
+    def call(self, fn, *args, **kwargs):
+        self.attach()
+        return fn(*args, **kwargs)
+
+
+class _AttachingExecutor(concurrent.futures.ThreadPoolExecutor):
+    # the loop's default executor, which autogen uses for LLM calls and human input inside async chats
+    def __init__(self, context):
+        super().__init__(thread_name_prefix="session-loop-worker")
+        self._context = context
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(self._context.call, fn, *args, **kwargs)
+
+
+def _run_loop(loop):
+    asyncio.set_event_loop(loop)
+    loop.run_forever()
+    loop.run_until_complete(loop.shutdown_default_executor())
+    loop.close()
+
+
+def _stop_loop(loop):
+    if not loop.is_closed():
+        loop.call_soon_threadsafe(loop.stop)
+
+
+class SessionLoop:
+    """A long-lived asyncio event loop in a daemon thread, one per Streamlit session.
+
+    Chats run on it with autogen's async API (a_initiate_chat) and render into the page from the loop through the
+    submitting run's context, so the script thread only waits and stays responsive to a Stop button. The loop
+    stops when the SessionLoop is garbage collected with its session.
+    """
+
+    def __init__(self):
+        self._context = _ScriptContext()
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_default_executor(_AttachingExecutor(self._context))
+        self.future = None
+        # the thread must not reference self, so that the session's SessionLoop can be collected
+        threading.Thread(target=_run_loop, args=(self.loop,), daemon=True, name="session-loop").start()
+        weakref.finalize(self, _stop_loop, self.loop)
+
+    @property
+    def busy(self):
+        return self.future is not None and not self.future.done()
+
+    def submit(self, coro):
+        """Schedule a coroutine on the loop; returns a concurrent.futures.Future for its result."""
+        if self.busy:
+            coro.close()
+            raise RuntimeError("a chat is already running in this session")
+        self._context.ctx = get_script_run_ctx()
+
+        async def attached():
+            self._context.attach()
+            return await coro
+
+        self.future = asyncio.run_coroutine_threadsafe(attached(), self.loop)
+        return self.future
+
+    def cancel(self):
+        """Cancel the running chat at its next await; safe to call from any thread."""
+        if self.future is not None:
+            self.future.cancel()
+
+    def run(self, coro, status=None, poll=0.5):
+        """Run a coroutine on the loop and wait for its result in the calling script thread.
+
+        `status` is an optional st.empty() placeholder that shows the elapsed time. Updating it every `poll`
+        seconds also gives Streamlit the chance to interrupt the waiting script when the user clicks a button or
+        sends a message; the chat is then cancelled instead of running on unseen.
+        """
+        future = self.submit(coro)
+        start = time.monotonic()
+        try:
+            while True:
+                try:
+                    return future.result(timeout=poll)
+                except concurrent.futures.TimeoutError:
+                    if status is not None:
+                        status.caption(f"Working... {time.monotonic() - start:.0f}s")
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            if status is not None:
+                status.empty()
+
+
+def get_session_loop(session_state):
+    """The session's SessionLoop, created on first use."""
+    if "session_loop" not in session_state:
+        session_state["session_loop"] = SessionLoop()
+    return session_state["session_loop"]
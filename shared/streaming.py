@@ -0,0 +1,126 @@
+import getpass
+from contextlib import contextmanager, nullcontext
+import streamlit as st
+
+# autogen prints streamed completions (llm_config "stream": True) to the default IOStream,
+# wrapped in these exact colour codes: "\033[32m", then one print per chunk, then "\033[0m\n".
+STREAM_START = "\033[32m"
+STREAM_END = "\033[0m\n"
+
+
+class ChatCancelled(Exception):
+    """Raised into a completion that is still streaming after its chat ended, to stop it early."""
+
+
+class StreamlitIOStream:
+    """An autogen IOStream that renders streamed completions token by token into Streamlit chat messages.
+
+    Everything that is not part of a streamed completion (speaker announcements, printed messages,
+    human input) still goes to the console, as with autogen's default IOConsole. It implements autogen's IOStream
+    protocol without subclassing IOConsole, so importing this module does not import autogen.
+    """
+
+    def __init__(self, template="{content}", container=None):
+        # template formats the text shown in the chat bubble; container is an optional callable that
+        # returns a context manager to draw each bubble in (e.g. a stylable_container).
+        self.template = template
+        self.container = container or nullcontext
+        self.speaker = None
+        self._placeholder = None
+        self._text = ""
+        self._streamed = {}
+        self.closed = False
+
+    def print(self, *objects, sep=" ", end="\n", flush=False):
+        if self.closed:
+            # a cancelled async chat leaves its LLM call running in a worker thread; abort it at the next token.
+            # autogen does not close the completion stream it is reading, so close it here to release its LLM slot
+            # and pooled connection
+            from shared.azure_clients import close_thread_streams
+
+            close_thread_streams()
+            raise ChatCancelled()
+        text = sep.join(str(o) for o in objects)
+        if text == STREAM_START and end == "":
+            self._start()
+        elif text == STREAM_END and self._placeholder is not None:
+            self._finish()
+        elif self._placeholder is not None:
+            self._text += text + end
+            self._placeholder.markdown(self.template.format(name=self.speaker, content=self._text) + "▌")
+        else:
+            print(*objects, sep=sep, end=end, flush=flush)
+
+    def input(self, prompt="", *, password=False):
+        if password:
+            return getpass.getpass(prompt if prompt != "" else "Password: ")
+        return input(prompt)
+
+    def _start(self):
+        self._text = ""
+        with self.container():
+            with st.chat_message(self.speaker or "assistant"):
+                self._placeholder = st.empty()
+
+    def _finish(self):
+        self._placeholder.markdown(self.template.format(name=self.speaker, content=self._text))
+        self._streamed[self.speaker] = self._text
+        self._placeholder = None
+
+    def render(self, name, message):
+        """Show a message received from `name`, unless it was already streamed onto the page."""
+        content = message.get("content") if isinstance(message, dict) else message
+        if isinstance(content, str) and self._streamed.get(name, "").strip() == content.strip():
+            del self._streamed[name]
+            return
+        with self.container():
+            with st.chat_message(name):
+                if isinstance(content, str):
+                    st.markdown(self.template.format(name=name, content=content))
+                else:
+                    st.markdown(message)
+
+
+def _set_speaker(agent):
+    from autogen.io import IOStream
+
+    def hook(messages):
+        iostream = IOStream.get_default()
+        if isinstance(iostream, StreamlitIOStream):
+            iostream.speaker = agent.name
+        return messages
+
+    return hook
+
+
+def track_speaker(*agents):
+    """Label streamed tokens with the name of the agent producing them. Safe to call again on the same agents."""
+    for agent in agents:
+        if not getattr(agent, "_streamlit_speaker_hook", False):
+            agent.register_hook("process_all_messages_before_reply", _set_speaker(agent))
+            agent._streamlit_speaker_hook = True
+
+
+@contextmanager
+def streamlit_iostream(template="{content}", container=None):
+    """Route autogen output through a StreamlitIOStream for the duration of a chat."""
+    from autogen.io import IOStream
+
+    iostream = StreamlitIOStream(template=template, container=container)
+    with IOStream.set_default(iostream):
+        try:
+            yield iostream
+        finally:
+            iostream.closed = True
+
+
+def render_message(name, message):
+    """Render a received message through the active StreamlitIOStream, or as a plain chat message."""
+    from autogen.io import IOStream
+
+    iostream = IOStream.get_default()
+    if isinstance(iostream, StreamlitIOStream):
+        iostream.render(name, message)
+    else:
+        with st.chat_message(name):
+            st.markdown(message)